@@ -3,9 +3,9 @@ import geopandas as gpd
 import pandas as pd
 import matplotlib.pyplot as plt
 from shapely.geometry import Point
-import numpy as np
 from matplotlib.colors import LinearSegmentedColormap
 import os
+from snt.basemap import base_map, load_boundaries
 
 st.set_page_config(layout="wide", page_title="Health Facilities Distribution")
 
@@ -14,7 +14,7 @@ st.write("Sierra Leone Health Facilities Map")
 
 try:
     # Read files directly
-    shapefile = gpd.read_file("Chiefdom 2021.shp")
+    shapefile = load_boundaries("Chiefdom 2021.shp").chiefdoms
     coordinates_data = pd.read_excel("master_hf_list.xlsx")
 
     # Display data preview
@@ -69,32 +69,15 @@ try:
     coordinates_gdf = gpd.GeoDataFrame(coordinates_data, geometry=geometry, crs="EPSG:4326")
 
     # Ensure consistent CRS
-    if shapefile.crs is None:
-        shapefile = shapefile.set_crs(epsg=4326)
-    else:
-        shapefile = shapefile.to_crs(epsg=4326)
+    coordinates_gdf = coordinates_gdf.to_crs(shapefile.crs)
 
     # Create the map with fixed aspect and centered
     fig = plt.figure(figsize=(15, 10))
     ax = fig.add_subplot(111)
 
-    # Plot shapefile with custom style
-    shapefile.plot(ax=ax, color=background_color, edgecolor=line_color, linewidth=line_width)
-
-    # Calculate and set appropriate aspect ratio
-    bounds = shapefile.total_bounds
-    mid_y = np.mean([bounds[1], bounds[3]])  # middle latitude
-    aspect = 1.0  # default aspect ratio
-    
-    if -90 < mid_y < 90:  # check if latitude is valid
-        try:
-            aspect = 1 / np.cos(np.radians(mid_y))
-            if not np.isfinite(aspect) or aspect <= 0:
-                aspect = 1.0
-        except:
-            aspect = 1.0
-    
-    ax.set_aspect(aspect)
+    # Chiefdoms in the custom style (cached base layer), with the aspect of the country's latitude
+    base_map({'chiefdoms': {'color': background_color, 'edgecolor': line_color, 'linewidth': line_width}}).draw(
+        ax, limits=False)
 
     # Plot points with custom style
     coordinates_gdf.plot(
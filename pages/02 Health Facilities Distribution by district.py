@@ -3,7 +3,8 @@ import geopandas as gpd
 import pandas as pd
 import matplotlib.pyplot as plt
 from shapely.geometry import Point
-import numpy as np
+
+from snt.basemap import base_map, load_boundaries
 
 st.set_page_config(layout="wide", page_title="Health Facility Map Generator")
 
@@ -17,7 +18,7 @@ st.toast('Hooray!', icon='🎉')
 
 try:
     # Read files directly
-    shapefile = gpd.read_file("Chiefdom 2021.shp")
+    shapefile = load_boundaries("Chiefdom 2021.shp").chiefdoms
     facility_data = pd.read_excel("master_hf_list.xlsx")
 
     # Customization options
@@ -84,8 +85,9 @@ try:
         # Filter shapefile for current chiefdom
         chiefdom_shapefile = district_shapefile[district_shapefile['FIRST_CHIE'] == chiefdom]
         
-        # Plot chiefdom boundary
-        chiefdom_shapefile.plot(ax=ax, color=background_color, edgecolor='black', linewidth=0.5)
+        # Plot chiefdom boundary, zoomed to the chiefdom
+        base_map({'chiefdoms': {'color': background_color, 'edgecolor': 'black', 'linewidth': 0.5}},
+                 district=selected_district, chiefdom=chiefdom).draw(ax)
         
         # Spatial join to get facilities within the chiefdom
         chiefdom_facilities = gpd.sjoin(
@@ -113,23 +115,6 @@ try:
         
         ax.set_title(title, fontsize=12, pad=10)
         ax.axis('off')
-        
-        # Calculate and set aspect ratio
-        bounds = chiefdom_shapefile.total_bounds
-        mid_y = np.mean([bounds[1], bounds[3]])
-        aspect = 1.0
-        if -90 < mid_y < 90:
-            try:
-                aspect = 1 / np.cos(np.radians(mid_y))
-                if not np.isfinite(aspect) or aspect <= 0:
-                    aspect = 1.0
-            except:
-                aspect = 1.0
-        ax.set_aspect(aspect)
-        
-        # Zoom to chiefdom bounds
-        ax.set_xlim(bounds[0], bounds[2])
-        ax.set_ylim(bounds[1], bounds[3])
 
     # Adjust layout
     plt.tight_layout()
@@ -171,7 +156,8 @@ try:
             
             # Copy the content from original plot
             chiefdom_shapefile = district_shapefile[district_shapefile['FIRST_CHIE'] == chiefdom]
-            chiefdom_shapefile.plot(ax=ax, color=background_color, edgecolor='black', linewidth=0.5)
+            base_map({'chiefdoms': {'color': background_color, 'edgecolor': 'black', 'linewidth': 0.5}},
+                     district=selected_district, chiefdom=chiefdom).draw(ax)
             
             chiefdom_facilities = gpd.sjoin(
                 facilities_gdf,
@@ -197,11 +183,6 @@ try:
             
             ax.set_title(title, fontsize=12, pad=10)
             ax.axis('off')
-            
-            # Set bounds
-            bounds = chiefdom_shapefile.total_bounds
-            ax.set_xlim(bounds[0], bounds[2])
-            ax.set_ylim(bounds[1], bounds[3])
 
         # Adjust layout for saving
         plt.tight_layout()
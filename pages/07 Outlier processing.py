@@ -1,89 +1,90 @@
 import streamlit as st
 from io import BytesIO
-import pandas as pd
-import numpy as np
 
-# Function to detect outliers using Scatterplot with Q1 and Q3 lines
-def detect_outliers_scatterplot(df, col):
-    Q1 = df[col].quantile(0.25)
-    Q3 = df[col].quantile(0.75)
-    IQR = Q3 - Q1
-    lower_bound = Q1 - 1.5 * IQR
-    upper_bound = Q3 + 1.5 * IQR
-    return lower_bound, upper_bound
-
-# Function to apply winsorization to a column
-def winsorize_series(series, lower_bound, upper_bound):
-    return series.clip(lower=lower_bound, upper=upper_bound)
-
-# Function to process and export the results for a single column using Winsorization
-def process_column_winsorization(df, column):
-    grouped = df.groupby(['hf_uid', 'year'])
-    results = []
-
-    for (hf_uid, year), group in grouped:
-        lower_bound, upper_bound = detect_outliers_scatterplot(group, column)
-        group[f'{column}_lower_bound'] = lower_bound
-        group[f'{column}_upper_bound'] = upper_bound
-        group[f'{column}_category'] = np.where(
-            (group[column] < lower_bound) | (group[column] > upper_bound), 'Outlier', 'Non-Outlier'
-        )
-        group[f'{column}_winsorized'] = winsorize_series(group[column], lower_bound, upper_bound)
-        results.append(group)
-
-    final_df = pd.concat(results)
-    export_columns = [
-        'adm1', 'adm2', 'adm3', 'hf', 'hf_uid', 'year', 'month', 'date', column,
-        f'{column}_category', f'{column}_lower_bound', f'{column}_upper_bound',
-        f'{column}_winsorized'
-    ]
-    export_columns = [col for col in export_columns if col in final_df.columns]
-    return final_df[export_columns]
+from snt.outliers import ID_COLUMNS, OUTLIER_COLUMNS, OUTLIER_METHODS, process_outliers
+from snt.outlier_store import OutlierStore, evict_stores, store_path
+from snt.imputation import IMPUTATION_METHODS, impute_missing_months
+from snt.cache import read_uploaded_file
 
 # Streamlit app setup
 st.title("Outlier Detection and Winsorization")
 
 uploaded_file = st.file_uploader("Upload key_variables.csv:", type=["csv", "xlsx"])
 
+method_labels = {
+    'iqr': "1.5 x IQR per facility-year",
+    'mad': "Median/MAD per facility-year",
+    'hampel': "Hampel filter (rolling 7-month window)",
+    'seasonal': "Seasonal baseline (same month across years)",
+}
+method = st.selectbox("Outlier detection method:", list(OUTLIER_METHODS),
+                      format_func=lambda name: method_labels.get(name, name))
+imputation_labels = {
+    None: "No (keep missing months as gaps)",
+    'seasonal_median': "Seasonal median (same month in other years)",
+    'linear': "Linear interpolation (gaps of up to 2 months)",
+    'ffill': "Carry forward (up to 2 months)",
+}
+impute = st.selectbox("Fill missing months before outlier detection:", [None] + IMPUTATION_METHODS,
+                      format_func=lambda name: imputation_labels.get(name, name))
+incremental = st.checkbox("Incremental (only recompute facility-years that changed since the last run)")
+if incremental:
+    dataset_name = st.text_input("Dataset name (each month's export of the same dataset uses the same name):",
+                                 value="key_variables")
+
 if uploaded_file:
     try:
-        if uploaded_file.name.endswith(".csv"):
-            df = pd.read_csv(uploaded_file)
-        else:
-            df = pd.read_excel(uploaded_file)
+        df = read_uploaded_file(uploaded_file)
     except Exception as e:
         st.error(f"Error loading file: {e}")
         st.stop()
 
+    if impute:
+        try:
+            df = impute_missing_months(df, method=impute)
+        except Exception as e:
+            st.error(f"Error filling missing months: {e}")
+            st.stop()
+        st.info(f"{int((df['imputed'] > 0).sum())} facility-months have imputed values "
+                "(flagged in the 'imputed' column; outlier fences use reported values only).")
+
     st.write("### Preview of the uploaded dataset:")
     st.write(df.head())
   
     st.snow()
     st.balloons()
 
-    columns_to_process = ['allout', 'susp', 'test', 'conf', 'maltreat', 'pres', 'maladm', 'maldth']
-    processed_dfs = []
+    columns_to_process = []
 
-    for column in columns_to_process:
+    for column in OUTLIER_COLUMNS:
         if column not in df.columns:
             st.warning(f"Skipping column {column} as it does not exist in the dataset.")
             continue
         if df[column].isnull().all():
             st.warning(f"Skipping column {column} as it contains only missing values.")
             continue
+        columns_to_process.append(column)
+
+    if columns_to_process:
+        st.write(f"Processing columns: {', '.join(columns_to_process)}")
+        if incremental:
+            # One store per dataset, shared by the sessions and uploads of that dataset
+            try:
+                store = OutlierStore(store_path(dataset_name))
+                final_combined_df = store.update(df, columns_to_process, method=method)
+            except ValueError as e:
+                st.error(f"Error updating the stored results: {e}")
+                st.stop()
+            evict_stores(keep=store.path)
+            st.info(f"Recomputed {store.last_update['recomputed']} of {store.last_update['groups']} facility-years.")
+        else:
+            final_combined_df = process_outliers(df, columns_to_process, method=method)
 
-        st.write(f"Processing column: {column}")
-        processed_df = process_column_winsorization(df, column)
-        processed_dfs.append(processed_df)
-
-        st.write(f"### Processed Data for {column}:")
-        st.write(processed_df.head())
-
-    if processed_dfs:
-        merge_keys = ['adm1', 'adm2', 'adm3', 'hf', 'hf_uid', 'year', 'month']
-        final_combined_df = processed_dfs[0]
-        for df_to_merge in processed_dfs[1:]:
-            final_combined_df = final_combined_df.merge(df_to_merge, on=merge_keys, how='outer')
+        for column in columns_to_process:
+            st.write(f"### Processed Data for {column}:")
+            block = [col for col in final_combined_df.columns
+                     if col in ID_COLUMNS or col == column or col.startswith(f'{column}_')]
+            st.write(final_combined_df[block].head())
 
         st.write("### Final Combined Data:")
         st.write(final_combined_df.head())
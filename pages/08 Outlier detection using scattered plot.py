@@ -1,84 +1,21 @@
 import streamlit as st
 from io import BytesIO
-import pandas as pd
-import numpy as np
-import matplotlib.pyplot as plt
-
-# Function to detect outliers using IQR method
-def detect_outliers_iqr(series):
-    Q1 = series.quantile(0.25)
-    Q3 = series.quantile(0.75)
-    IQR = Q3 - Q1
-    lower_bound = Q1 - 1.5 * IQR
-    upper_bound = Q3 + 1.5 * IQR
-    return lower_bound, upper_bound
+from snt.facility_index import indexed_upload
+from snt.outlier_plots import (EXPORT_FORMATS, PLOT_KINDS, export_outlier_plots, draw_scatter, new_figure,
+                               stored_fences)
 
 # Function to generate scatter plot for original and winsorized columns
-def generate_scatter_plot(df, column, hf_uid, year):
-    # Filter the data for the selected hf_uid and year
-    filtered_df = df[(df['hf_uid'] == hf_uid) & (df['year'] == year)]
+def generate_scatter_plot(index, column, hf_uid, year):
+    # Rows of the selected hf_uid and year, straight from the facility-year index
+    filtered_df = index.slice(hf_uid, year)
 
     if filtered_df.empty:
         st.write("No data to preview.")
         return
 
-    # Calculate outlier bounds for the original column
-    original_lower, original_upper = detect_outliers_iqr(filtered_df[column])
-
-    # Calculate outlier bounds for the winsorized column
-    winsorized_lower, winsorized_upper = detect_outliers_iqr(filtered_df[f'{column}_winsorized'])
-
-    # Create scatter plot
-    fig, axes = plt.subplots(1, 2, figsize=(15, 6), sharey=True)
-
-    # Add title
-    fig.suptitle("Outlier Detection and Correction", fontsize=16)
-
-    # Scatter plot for the original column
-    axes[0].scatter(
-        filtered_df['month'],
-        filtered_df[column],
-        c=np.where(
-            (filtered_df[column] < original_lower) | (filtered_df[column] > original_upper),
-            'red',
-            'blue'
-        ),
-        alpha=0.7
-    )
-    axes[0].axhline(original_lower, color='green', linestyle='--')
-    axes[0].axhline(original_upper, color='red', linestyle='--')
-    axes[0].set_title("Outlier Detection Before Correction")
-    axes[0].set_xlabel('Month')
-    axes[0].set_ylabel(column)
-
-    # Scatter plot for the winsorized column
-    axes[1].scatter(
-        filtered_df['month'],
-        filtered_df[f'{column}_winsorized'],
-        c=np.where(
-            (filtered_df[f'{column}_winsorized'] < winsorized_lower) |
-            (filtered_df[f'{column}_winsorized'] > winsorized_upper),
-            'red',
-            'blue'
-        ),
-        alpha=0.7
-    )
-    axes[1].axhline(winsorized_lower, color='green', linestyle='--')
-    axes[1].axhline(winsorized_upper, color='red', linestyle='--')
-    axes[1].set_title("Outlier Detection After Correction Using Winsorisation Method")
-    axes[1].set_xlabel('Month')
-    axes[1].set_ylabel(column)
-
-    # Add a single legend outside the plot
-    handles = [
-        plt.Line2D([0], [0], marker='o', color='w', markerfacecolor='red', markersize=10, label='Outliers'),
-        plt.Line2D([0], [0], marker='o', color='w', markerfacecolor='blue', markersize=10, label='Non-Outliers'),
-        plt.Line2D([0], [0], color='green', linestyle='--', linewidth=2, label='Lower Bound'),
-        plt.Line2D([0], [0], color='red', linestyle='--', linewidth=2, label='Upper Bound')
-    ]
-    fig.legend(handles=handles, loc='center left', bbox_to_anchor=(0.85, 0.5), fontsize=10)
-
-    plt.tight_layout(rect=[0, 0, 0.85, 1])
+    # Fences and flags stored by the outlier processing, whatever its method
+    fig = draw_scatter(new_figure(), filtered_df['month'], filtered_df[column],
+                       filtered_df[f'{column}_winsorized'], column, **stored_fences(filtered_df, column))
     st.pyplot(fig)
 
     st.balloons()
@@ -90,10 +27,8 @@ st.title("Scatter Plot for Original and Winsorized Columns")
 uploaded_file = st.file_uploader("Upload the outlier_corrected_data.csv:", type=["csv", "xlsx"])
 
 if uploaded_file:
-    if uploaded_file.name.endswith(".csv"):
-        df = pd.read_csv(uploaded_file)
-    else:
-        df = pd.read_excel(uploaded_file)
+    index = indexed_upload(uploaded_file)
+    df = index.frame
 
     if df.empty:
         st.write("No data to preview.")
@@ -102,11 +37,8 @@ if uploaded_file:
         st.write(df.head())
 
         # Allow user to select hf_uid, year, and column for visualization
-        unique_hf_uids = df['hf_uid'].unique()
-        unique_years = df['year'].unique()
-
-        selected_hf_uid = st.selectbox("Select hf_uid:", unique_hf_uids)
-        selected_year = st.selectbox("Select year:", unique_years)
+        selected_hf_uid = st.selectbox("Select hf_uid:", index.facilities)
+        selected_year = st.selectbox("Select year:", index.facility_years(selected_hf_uid))
 
         # Assume the dataset contains original columns and their corresponding winsorized columns
         numeric_columns = [col for col in df.columns if col.endswith('_winsorized')]
@@ -116,4 +48,35 @@ if uploaded_file:
         selected_column = st.selectbox("Select column to visualize:", original_columns)
 
         if st.button("Generate Scatter Plot"):
-            generate_scatter_plot(df, selected_column, selected_hf_uid, selected_year)
+            generate_scatter_plot(index, selected_column, selected_hf_uid, selected_year)
+
+        # Batch export of every facility-year flagged with an outlier
+        st.write("### Export plots for all flagged facilities")
+        export_columns = st.multiselect("Indicators to export:", original_columns, default=original_columns)
+        export_kinds = st.multiselect("Plots to export:", PLOT_KINDS, default=['scatter'])
+        export_format = st.radio("Export format:", EXPORT_FORMATS, format_func=str.upper, horizontal=True)
+
+        if st.button("Export Flagged Plots"):
+            progress_bar = st.progress(0.0, text="Rendering plots...")
+
+            def show_progress(done, total):
+                # Refresh about a hundred times, not once per plot
+                if done == total or done % max(total // 100, 1) == 0:
+                    progress_bar.progress(done / total, text=f"Rendered {done} of {total} plots")
+
+            export_buffer = BytesIO()
+            try:
+                plot_count = export_outlier_plots(index, export_buffer, export_columns, export_kinds,
+                                                  fmt=export_format, progress=show_progress)
+            except ValueError as e:
+                st.error(f"Error exporting plots: {e}")
+            else:
+                if plot_count == 0:
+                    st.info("No outliers flagged for the selected indicators.")
+                else:
+                    st.download_button(
+                        label=f"Download {plot_count} Plots",
+                        data=export_buffer.getvalue(),
+                        file_name=f"outlier_plots.{export_format}",
+                        mime="application/zip" if export_format == 'zip' else "application/pdf"
+                    )
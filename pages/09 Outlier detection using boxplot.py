@@ -1,12 +1,12 @@
 import streamlit as st
 from io import BytesIO
-import pandas as pd
-import matplotlib.pyplot as plt
+from snt.facility_index import indexed_upload
+from snt.outlier_plots import EXPORT_FORMATS, PLOT_KINDS, export_outlier_plots, draw_box, new_figure
 
 # Function to generate box plot for original and winsorized columns
-def generate_box_plot(df, column, hf_uid, year):
-    # Filter the data for the selected hf_uid and year
-    filtered_df = df[(df['hf_uid'] == hf_uid) & (df['year'] == year)]
+def generate_box_plot(index, column, hf_uid, year):
+    # Rows of the selected hf_uid and year, straight from the facility-year index
+    filtered_df = index.slice(hf_uid, year)
 
     if filtered_df.empty:
         st.write("No data to preview.")
@@ -18,25 +18,7 @@ def generate_box_plot(df, column, hf_uid, year):
         st.write(f"The winsorized column '{winsorized_column}' does not exist in the dataset.")
         return
 
-    # Create box plots for the selected column and its winsorized counterpart
-    fig, axes = plt.subplots(1, 2, figsize=(15, 6), sharey=True)
-
-    # Add title
-    fig.suptitle("Outlier Detection and Correction Using Box Plots", fontsize=16)
-
-    # Box plot for the original column
-    axes[0].boxplot(filtered_df[column], patch_artist=True, notch=False, boxprops=dict(facecolor="lightblue", edgecolor="black", linewidth=1.5))
-    axes[0].set_title(f"Box Plot for {column} (Original)")
-    axes[0].set_ylabel(column)
-    axes[0].tick_params(axis='y', which='both', labelsize=10)
-
-    # Box plot for the winsorized column
-    axes[1].boxplot(filtered_df[winsorized_column], patch_artist=True, notch=False, boxprops=dict(facecolor="lightblue", edgecolor="black", linewidth=1.5))
-    axes[1].set_title(f"Box Plot for {winsorized_column} (Winsorized)")
-    axes[1].set_ylabel(column)
-    axes[1].tick_params(axis='y', which='both', labelsize=10)
-
-    plt.tight_layout()
+    fig = draw_box(new_figure(), filtered_df[column], filtered_df[winsorized_column], column)
     st.pyplot(fig)
 
 # Streamlit app setup
@@ -45,10 +27,8 @@ st.title("Box Plot for Original and Winsorized Columns")
 uploaded_file = st.file_uploader("Upload the outlier_corrected_data.csv:", type=["csv", "xlsx"])
 
 if uploaded_file:
-    if uploaded_file.name.endswith(".csv"):
-        df = pd.read_csv(uploaded_file)
-    else:
-        df = pd.read_excel(uploaded_file)
+    index = indexed_upload(uploaded_file)
+    df = index.frame
 
     if df.empty:
         st.write("No data to preview.")
@@ -57,11 +37,8 @@ if uploaded_file:
         st.write(df.head())
 
         # Allow user to select hf_uid, year, and column for visualization
-        unique_hf_uids = df['hf_uid'].unique()
-        unique_years = df['year'].unique()
-
-        selected_hf_uid = st.selectbox("Select hf_uid:", unique_hf_uids)
-        selected_year = st.selectbox("Select year:", unique_years)
+        selected_hf_uid = st.selectbox("Select hf_uid:", index.facilities)
+        selected_year = st.selectbox("Select year:", index.facility_years(selected_hf_uid))
 
         # Assume the dataset contains original columns and their corresponding winsorized columns
         numeric_columns = [col for col in df.columns if col.endswith('_winsorized')]
@@ -71,4 +48,35 @@ if uploaded_file:
         selected_column = st.selectbox("Select column to visualize:", original_columns)
 
         if st.button("Generate Box Plot"):
-            generate_box_plot(df, selected_column, selected_hf_uid, selected_year)
+            generate_box_plot(index, selected_column, selected_hf_uid, selected_year)
+
+        # Batch export of every facility-year flagged with an outlier
+        st.write("### Export plots for all flagged facilities")
+        export_columns = st.multiselect("Indicators to export:", original_columns, default=original_columns)
+        export_kinds = st.multiselect("Plots to export:", PLOT_KINDS, default=['box'])
+        export_format = st.radio("Export format:", EXPORT_FORMATS, format_func=str.upper, horizontal=True)
+
+        if st.button("Export Flagged Plots"):
+            progress_bar = st.progress(0.0, text="Rendering plots...")
+
+            def show_progress(done, total):
+                # Refresh about a hundred times, not once per plot
+                if done == total or done % max(total // 100, 1) == 0:
+                    progress_bar.progress(done / total, text=f"Rendered {done} of {total} plots")
+
+            export_buffer = BytesIO()
+            try:
+                plot_count = export_outlier_plots(index, export_buffer, export_columns, export_kinds,
+                                                  fmt=export_format, progress=show_progress)
+            except ValueError as e:
+                st.error(f"Error exporting plots: {e}")
+            else:
+                if plot_count == 0:
+                    st.info("No outliers flagged for the selected indicators.")
+                else:
+                    st.download_button(
+                        label=f"Download {plot_count} Plots",
+                        data=export_buffer.getvalue(),
+                        file_name=f"outlier_plots.{export_format}",
+                        mime="application/zip" if export_format == 'zip' else "application/pdf"
+                    )
@@ -1,90 +1,74 @@
 import streamlit as st
-import pandas as pd
+import math
 import matplotlib.pyplot as plt
+from snt.cache import derived_from_upload
+from snt.outlier_summary import OutlierSummaryCube, category_columns
 
-def generate_summary_stats(df, category_columns):
-    summary_stats = {}
-    for col in category_columns:
-        total_outliers = (df[col] == 'Outlier').sum()
-        total_non_outliers = (df[col] == 'Non-Outlier').sum()
-        total = total_outliers + total_non_outliers
-        summary_stats[col] = {
-            'Total Outliers': total_outliers,
-            'Total Non-Outliers': total_non_outliers,
-            'Total Records': total,
-            'Outlier Percentage': f"{(total_outliers/total)*100:.2f}%",
-            'Non-Outlier Percentage': f"{(total_non_outliers/total)*100:.2f}%"
-        }
-    return pd.DataFrame(summary_stats).T
+def generate_summary_stats(cube, level=None, value=None):
+    return cube.summary(level, value)
 
-def generate_outlier_charts(df, column, chart_type):
-    if 'year' not in df.columns:
+def _chart_grid(fig, n_charts, ncols=3):
+    # As many rows of up to three charts as there are years
+    ncols = max(min(ncols, n_charts), 1)
+    nrows = max(math.ceil(n_charts / ncols), 1)
+    gs = fig.add_gridspec(nrows, ncols, hspace=0.5, wspace=0.3)
+    return [fig.add_subplot(gs[i // ncols, i % ncols]) for i in range(n_charts)]
+
+def generate_outlier_charts(cube, column, chart_type, level=None, value=None):
+    grouped = cube.by_year(column, level, value)
+    if grouped.empty:
         st.write("The dataset must contain a 'year' column for this analysis.")
         return
-        
-    grouped = df.groupby(['year', column]).size().unstack(fill_value=0)
+
     years = grouped.index.tolist()
     categories = grouped.columns.tolist()
     
     colors = {'Outlier': 'lightpink', 'Non-Outlier': '#47B5FF'}
     colors_list = [colors[cat] for cat in categories]
+
+    height = 5 * math.ceil(len(years) / 3)
+    fig = plt.figure(figsize=(15, height))
+    legend_elements = [plt.Rectangle((0,0),1,1, facecolor=color) for color in colors_list]
+    # Title and legend take the top 1.5 inches whatever the number of rows
+    title_y, legend_y, top = 1 - 0.3 / height, 1 - 0.6 / height, 1 - 1.5 / height
     
     if chart_type == "Bar Chart":
-        fig = plt.figure(figsize=(15, 15))
-        
-        fig.suptitle("Outliers and Non-Outliers Bar Chart by Year after correction\n", fontsize=16, y=0.98)
-        legend_elements = [plt.Rectangle((0,0),1,1, facecolor=color) for color in colors_list]
+        fig.suptitle("Outliers and Non-Outliers Bar Chart by Year after correction\n", fontsize=16, y=title_y)
         fig.legend(legend_elements, categories, 
-                  loc='upper center', bbox_to_anchor=(0.5, 0.96),
+                  loc='upper center', bbox_to_anchor=(0.5, legend_y),
                   ncol=len(categories), title="Categories")
         
-        gs = fig.add_gridspec(3, 3, hspace=0.5, wspace=0.3)
-        axes = [fig.add_subplot(gs[i//3, i%3]) for i in range(9)]
+        axes = _chart_grid(fig, len(years))
+        for ax, year in zip(axes, years):
+            year_data = grouped.loc[year]
+            bars = ax.bar(categories, year_data, color=colors_list)
+            ax.set_title(f"Year: {year}")
+            ax.set_ylabel("Count", labelpad=10)
+            ax.set_xlabel("Categories")
+            ax.set_xticks(range(len(categories)))
+            ax.set_xticklabels(categories, rotation=0, ha='right')
             
-        for i, year in enumerate(years):
-            if i < len(axes):
-                ax = axes[i]
-                year_data = grouped.loc[year]
-                bars = ax.bar(categories, year_data, color=colors_list)
-                ax.set_title(f"Year: {year}")
-                ax.set_ylabel("Count", labelpad=10)
-                ax.set_xlabel("Categories")
-                ax.set_xticklabels(categories, rotation=0, ha='right')
-                
-                for bar in bars:
-                    height = bar.get_height()
-                    ax.text(bar.get_x() + bar.get_width()/2., height + 1,
-                           f'{int(height)}', ha='center', va='bottom')
-                           
-        for j in range(len(years), len(axes)):
-            fig.delaxes(axes[j])
+            for bar in bars:
+                height = bar.get_height()
+                ax.text(bar.get_x() + bar.get_width()/2., height + 1,
+                       f'{int(height)}', ha='center', va='bottom')
         
-        plt.tight_layout(rect=[0, 0.03, 1, 0.90])
+        plt.tight_layout(rect=[0, 0.03, 1, top])
         
     elif chart_type == "Pie Chart":
-        fig = plt.figure(figsize=(15, 15))
-        
-        fig.suptitle("Outliers and Non-Outliers Pie Chart by Year\n", fontsize=16, y=0.98)
-        legend_elements = [plt.Rectangle((0,0),1,1, facecolor=color) for color in colors_list]
+        fig.suptitle("Outliers and Non-Outliers Pie Chart by Year\n", fontsize=16, y=title_y)
         fig.legend(legend_elements, categories, 
-                  loc='upper center', bbox_to_anchor=(0.5, 0.96),
+                  loc='upper center', bbox_to_anchor=(0.5, legend_y),
                   ncol=len(categories), title="Categories")
         
-        gs = fig.add_gridspec(3, 3, hspace=0.5, wspace=0.3)
-        axes = [fig.add_subplot(gs[i//3, i%3]) for i in range(9)]
-            
-        for i, year in enumerate(years):
-            if i < len(axes):
-                ax = axes[i]
-                year_data = grouped.loc[year]
-                wedges, _, autotexts = ax.pie(year_data, colors=colors_list,
-                                            autopct='%1.2f%%')
-                ax.set_title(f"Year: {year}")
-                
-        for j in range(len(years), len(axes)):
-            fig.delaxes(axes[j])
+        axes = _chart_grid(fig, len(years))
+        for ax, year in zip(axes, years):
+            year_data = grouped.loc[year]
+            wedges, _, autotexts = ax.pie(year_data, colors=colors_list,
+                                        autopct='%1.2f%%')
+            ax.set_title(f"Year: {year}")
             
-        plt.tight_layout(rect=[0, 0.03, 1, 0.90])
+        plt.tight_layout(rect=[0, 0.03, 1, top])
     
     st.pyplot(fig)
 
@@ -94,29 +78,40 @@ def main():
     
     if uploaded_file:
         try:
-            df = pd.read_csv(uploaded_file) if uploaded_file.name.endswith(".csv") else pd.read_excel(uploaded_file)
+            # Counts by indicator, year, admin unit and category, built once per file
+            cube = derived_from_upload(
+                uploaded_file, 'outlier_summary',
+                lambda df: OutlierSummaryCube(df, category_columns(df, suffix='winsorized_category')))
             
-            if not df.empty:
-                category_columns = [col for col in df.columns 
-                                  if 'winsorized_category' in col and 
-                                  df[col].isin(['Outlier', 'Non-Outlier']).any()]
+            if cube.rows:
+                area_level, area = None, None
+                if 'adm1' in cube.levels:
+                    area_options = ["All"] + sorted(cube.units['adm1'].dropna().unique().tolist())
+                    selected_area = st.selectbox("Select adm1:", area_options)
+                    if selected_area != "All":
+                        area_level, area = 'adm1', selected_area
                 
                 analysis_type = st.radio("Select Analysis Type:", 
                                        ["Charts", "Summary Statistics"])
                 
                 if analysis_type == "Charts":
-                    if category_columns:
+                    if cube.indicators:
                         selected_column = st.selectbox("Select column for analysis:", 
-                                                     category_columns)
+                                                     cube.indicators)
                         chart_type = st.radio("Select chart type:", 
                                             ["Bar Chart", "Pie Chart"])
-                        generate_outlier_charts(df, selected_column, chart_type)
+                        generate_outlier_charts(cube, selected_column, chart_type, area_level, area)
                     else:
                         st.write("No suitable category columns found.")
                 else:
                     st.write("### Summary Statistics for All Variables")
-                    summary_df = generate_summary_stats(df, category_columns)
+                    summary_df = generate_summary_stats(cube, area_level, area)
                     st.dataframe(summary_df)
+                    
+                    breakdown_levels = [level for level in cube.levels if level != area_level]
+                    if cube.indicators and breakdown_levels:
+                        breakdown_level = st.selectbox("Break down by:", breakdown_levels)
+                        st.dataframe(cube.by_level(breakdown_level, area_level, area))
             else:
                 st.write("Empty dataset.")
                 
@@ -1,45 +1,44 @@
+import math
 import streamlit as st
+import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
-import seaborn as sns
 from matplotlib.colors import ListedColormap
 from matplotlib.patches import Patch
+from snt.reporting import REPORTING_VARIABLES, ReportingMatrix
 
 def generate_heatmaps(df):
-    # Define the specific variables we want to analyze
-    selected_variables = ['allout', 'susp', 'test', 'conf', 'maltreat']
-    
-    df['Status'] = df[selected_variables].sum(axis=1).apply(lambda x: 1 if x > 1 else 0).astype(int)
+    # Facility x month reporting status of the whole country, facilities grouped by adm1
+    reporting = ReportingMatrix(df, REPORTING_VARIABLES, group_col='adm1')
     
     custom_cmap = ListedColormap(['pink', 'lightblue'])
-    adm1_groups = df['adm1'].unique()
+    adm1_groups = reporting.groups
     
-    n_rows, n_cols = 4, 4
-    fig, axes = plt.subplots(n_rows, n_cols, figsize=(20, 20))
+    # Up to four panels per row, as many rows as the regions need
+    n_cols = min(4, max(len(adm1_groups), 1))
+    n_rows = max(math.ceil(len(adm1_groups) / n_cols), 1)
+    fig, axes = plt.subplots(n_rows, n_cols, figsize=(5 * n_cols, 5 * n_rows + 1), squeeze=False)
     axes = axes.flatten()
     
-    for i, adm1 in enumerate(adm1_groups):
-        subset = df[df['adm1'] == adm1]
-        
-        hf_order = subset.groupby('hf_uid')['Status'].sum().sort_values(ascending=False).index
-        subset['hf_uid'] = pd.Categorical(subset['hf_uid'], categories=hf_order, ordered=True)
-        subset = subset.sort_values('hf_uid')
-        
-        heatmap_data = subset.pivot(index='hf_uid', columns='Date', values='Status')
-        heatmap_data.fillna(0, inplace=True)
-        
-        sns.heatmap(
-            heatmap_data,
+    # Label about two dozen months per panel
+    tick_step = max(len(reporting.labels) // 24, 1)
+    ticks = np.arange(0, len(reporting.labels), tick_step)
+    
+    for ax, adm1 in zip(axes, adm1_groups):
+        ax.imshow(
+            reporting.block(adm1),
             cmap=custom_cmap,
-            linewidths=0,
-            cbar=False,
-            yticklabels=False,
-            annot=False,
-            ax=axes[i]
+            vmin=0,
+            vmax=1,
+            aspect='auto',
+            interpolation='nearest'
         )
-        axes[i].set_title(f'{adm1}', fontsize=14)
-        axes[i].set_xlabel('Date', fontsize=10)
-        axes[i].tick_params(axis='x', labelrotation=90)
+        ax.set_title(f'{adm1}', fontsize=14)
+        ax.set_xlabel('Date', fontsize=10)
+        ax.set_xticks(ticks)
+        ax.set_xticklabels(reporting.labels[ticks])
+        ax.tick_params(axis='x', labelrotation=90)
+        ax.set_yticks([])
     
     for j in range(len(adm1_groups), len(axes)):
         axes[j].axis('off')
@@ -49,18 +48,20 @@ def generate_heatmaps(df):
     legend_patches = [Patch(color=color, label=label) 
                      for color, label in zip(legend_colors, legend_labels)]
     
+    # Title and legend keep the top 1.6 inches whatever the number of rows
+    height = fig.get_figheight()
     fig.legend(
         handles=legend_patches,
         loc='upper center',
-        bbox_to_anchor=(0.5, 0.95),
+        bbox_to_anchor=(0.5, 1 - 0.5 / height),
         ncol=2,
         title='Reporting status',
         fontsize=12,
         title_fontsize=14
     )
     
-    plt.suptitle('Health Facility Reporting Status by ADM1', fontsize=18, y=0.98)
-    plt.tight_layout(rect=[0, 0, 1, 0.92])
+    plt.suptitle('Health Facility Reporting Status by ADM1', fontsize=18, y=1 - 0.2 / height)
+    plt.tight_layout(rect=[0, 0, 1, 1 - 1.6 / height])
     return fig
 
 def main():
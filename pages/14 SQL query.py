@@ -0,0 +1,60 @@
+import io
+import time
+import streamlit as st
+from snt.sql import MAX_ROWS, PIPELINE_DIR, SQLEngine
+
+DEFAULT_QUERY = """SELECT adm1, year, sum(conf) AS conf, sum(test) AS test
+FROM computed
+GROUP BY ALL
+ORDER BY ALL"""
+
+st.title("SQL Query on the Processed Routine Data")
+st.write(
+    "Query the pipeline outputs (`python -m snt.pipeline`) with SQL. Available tables: "
+    "`combined`, `renamed`, `computed`, `outliers` and `rollup` (monthly totals per admin level)."
+)
+
+# Only the configured directory is opened; queries cannot read files outside it
+checkpoint_dir = PIPELINE_DIR
+st.caption(f"Pipeline checkpoint directory: `{checkpoint_dir}` (set `SNT_PIPELINE_DIR` to change it)")
+
+try:
+    engine = SQLEngine(checkpoint_dir)
+except ImportError as e:
+    st.error(str(e))
+    st.stop()
+except FileNotFoundError as e:
+    st.error(f"{e}. Run the pipeline first with --checkpoint-dir set to this directory.")
+    st.stop()
+
+with st.expander("Tables and columns"):
+    for table in engine.tables:
+        st.write(f"**{table}**")
+        st.dataframe(engine.schema(table), hide_index=True)
+
+sql = st.text_area("SQL query (SELECT only):", value=DEFAULT_QUERY, height=180)
+max_rows = st.number_input("Maximum rows to return:", min_value=1, max_value=MAX_ROWS * 10, value=MAX_ROWS)
+
+if st.button("Run query"):
+    try:
+        start = time.perf_counter()
+        result = engine.query(sql, limit=int(max_rows))
+        elapsed = time.perf_counter() - start
+    except Exception as e:
+        st.error(f"Query failed: {e}")
+    else:
+        st.write(f"{len(result):,} rows in {elapsed:.2f} s")
+        if len(result) == max_rows:
+            st.warning(f"Only the first {max_rows:,} rows are shown; add filters or raise the limit.")
+        st.dataframe(result)
+
+        csv_buffer = io.StringIO()
+        result.to_csv(csv_buffer, index=False)
+        st.download_button(
+            label="Download result as CSV",
+            data=csv_buffer.getvalue(),
+            file_name="query_result.csv",
+            mime="text/csv"
+        )
+
+engine.close()
@@ -3,6 +3,7 @@ import pandas as pd
 import io
 import os
 from typing import List, Dict, Tuple, Set
+from snt.cache import read_uploaded_file
 
 st.set_page_config(page_title="Dataset Merger", layout="wide")
 
@@ -40,10 +41,8 @@ def read_file(uploaded_file):
     file_extension = os.path.splitext(uploaded_file.name)[1].lower()
     
     try:
-        if file_extension in ['.xlsx', '.xls']:
-            return pd.read_excel(uploaded_file)
-        elif file_extension == '.csv':
-            return pd.read_csv(uploaded_file)
+        if file_extension in ['.xlsx', '.xls', '.csv']:
+            return read_uploaded_file(uploaded_file)
         else:
             st.error(f"Unsupported file format: {file_extension}. Please upload .xlsx, .xls, or .csv files.")
             return None
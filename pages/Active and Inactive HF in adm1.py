@@ -1,15 +1,17 @@
 import streamlit as st
-import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
+from snt.activity import activity_for_file
 
 class HealthFacilityProcessor:
     def __init__(self):
-        self.df = None
+        self.activity = None
+        self.level = 'adm1'
     
     def load_data(self):
         try:
-            self.df = pd.read_csv("key_variables (2).csv")
+            # Facility-level activity, computed once per version of the file
+            self.activity = activity_for_file("key_variables (2).csv")
             st.success("Data successfully loaded!")
             return True
         except Exception as e:
@@ -17,35 +19,19 @@ class HealthFacilityProcessor:
             return False
     
     def process_data(self):
-        # Calculate report column
-        self.df['report'] = (self.df[['allout', 'susp', 'test', 'conf', 'maltreat']] > 0).sum(axis=1, min_count=1)
-        
-        # Create date column and calculate first month reported
-        self.df['month'] = self.df['month'].astype(int).astype(str).str.zfill(2)
-        self.df['year'] = self.df['year'].astype(int).astype(str)
-        self.df['date'] = pd.to_datetime(self.df['year'] + '-' + self.df['month'], format='%Y-%m')
-        
-        # Calculate first month reported
-        report_positive = self.df[self.df['report'] > 0]
-        first_months = report_positive.groupby('hf_uid')['date'].min()
-        self.df['First_month_hf_reported'] = self.df['hf_uid'].map(first_months)
-        
-        # Split active and inactive
-        active_df = self.df[self.df['First_month_hf_reported'].notna()]
-        inactive_df = self.df[self.df['First_month_hf_reported'].isna()]
-        
-        return active_df, inactive_df
+        # Active/inactive facility counts per region
+        return self.activity.counts(self.level)
 
-    def plot_counts_by_adm1(self, active_df, inactive_df):
+    def plot_counts_by_adm1(self, counts):
         """
         Create a horizontal stacked bar chart showing facility counts by region.
         """
         # Get unique adm1 values and sort them
-        adm1_values = sorted(self.df['adm1'].unique())
+        adm1_values = counts.index.tolist()
 
         # Calculate counts for each region
-        active_counts = active_df.groupby('adm1')['hf_uid'].nunique()
-        inactive_counts = inactive_df.groupby('adm1')['hf_uid'].nunique()
+        active_counts = counts['Active']
+        inactive_counts = counts['Inactive']
 
         # Create figure
         fig, ax = plt.subplots(figsize=(12, 10))
@@ -83,16 +69,16 @@ class HealthFacilityProcessor:
         plt.tight_layout()
         return fig
 
-    def plot_percentages_by_adm1(self, active_df, inactive_df):
+    def plot_percentages_by_adm1(self, counts):
         """
         Create a horizontal stacked bar chart showing facility percentages by region.
         """
         # Get unique adm1 values and sort them
-        adm1_values = sorted(self.df['adm1'].unique())
+        adm1_values = counts.index.tolist()
         
         # Calculate counts and percentages
-        active_counts = active_df.groupby('adm1')['hf_uid'].nunique()
-        inactive_counts = inactive_df.groupby('adm1')['hf_uid'].nunique()
+        active_counts = counts['Active']
+        inactive_counts = counts['Inactive']
 
         fig, ax = plt.subplots(figsize=(12, 10))
         y = np.arange(len(adm1_values))
@@ -147,11 +133,11 @@ def main():
     if processor.load_data():
         with st.spinner("Processing data..."):
             try:
-                active_df, inactive_df = processor.process_data()
+                counts = processor.process_data()
                 
                 # Show count visualization
                 st.subheader("Facility Counts by Region")
-                fig_counts = processor.plot_counts_by_adm1(active_df, inactive_df)
+                fig_counts = processor.plot_counts_by_adm1(counts)
                 st.pyplot(fig_counts)
                 
                 # Add download button for counts visualization
@@ -165,7 +151,7 @@ def main():
                 
                 # Show percentage visualization
                 st.subheader("Facility Distribution by Region (%)")
-                fig_percentages = processor.plot_percentages_by_adm1(active_df, inactive_df)
+                fig_percentages = processor.plot_percentages_by_adm1(counts)
                 st.pyplot(fig_percentages)
                 
                 # Add download button for percentages visualization
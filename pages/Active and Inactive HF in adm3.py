@@ -1,58 +1,35 @@
 import streamlit as st
-import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
+from snt.activity import activity_for_file
 
 class HealthFacilityProcessor:
     def __init__(self):
-        self.df = None
+        self.activity = None
     
     def load_data(self):
         try:
-            self.df = pd.read_csv("key_variables (2).csv")
+            # Facility-level activity, computed once per version of the file
+            self.activity = activity_for_file("key_variables (2).csv")
             st.success("Data successfully loaded!")
             return True
         except Exception as e:
             st.error(f"Error loading file: {str(e)}")
             return False
     
-    def process_data(self):
-        # Calculate report column
-        self.df['report'] = (self.df[['allout', 'susp', 'test', 'conf', 'maltreat']] > 0).sum(axis=1, min_count=1)
-        
-        # Create date column and calculate first month reported
-        self.df['month'] = self.df['month'].astype(int).astype(str).str.zfill(2)
-        self.df['year'] = self.df['year'].astype(int).astype(str)
-        self.df['date'] = pd.to_datetime(self.df['year'] + '-' + self.df['month'], format='%Y-%m')
-        
-        # Calculate first month reported
-        report_positive = self.df[self.df['report'] > 0]
-        first_months = report_positive.groupby('hf_uid')['date'].min()
-        self.df['First_month_hf_reported'] = self.df['hf_uid'].map(first_months)
-        
-        # Split active and inactive
-        active_df = self.df[self.df['First_month_hf_reported'].notna()]
-        inactive_df = self.df[self.df['First_month_hf_reported'].isna()]
-        
-        return active_df, inactive_df
-
-    def plot_by_adm3_for_each_adm1(self, active_df, inactive_df, selected_adm1):
+    def plot_by_adm3_for_each_adm1(self, selected_adm1):
         """
         Create plot for selected adm1, showing adm3 distributions.
         """
-        # Filter data for this adm1
-        active_adm1 = active_df[active_df['adm1'] == selected_adm1]
-        inactive_adm1 = inactive_df[inactive_df['adm1'] == selected_adm1]
-        
-        # Get adm3 values for this adm1
-        adm3_values = sorted(set(active_adm1['adm3'].unique()) | set(inactive_adm1['adm3'].unique()))
+        # Active/inactive facility counts of the adm3 areas in this adm1
+        counts = self.activity.counts('adm3', within='adm1', value=selected_adm1)
+        adm3_values = counts.index.tolist()
         
         if not adm3_values:
             return None
             
-        # Calculate counts for each adm3
-        active_counts = active_adm1.groupby('adm3')['hf_uid'].nunique()
-        inactive_counts = inactive_adm1.groupby('adm3')['hf_uid'].nunique()
+        active_counts = counts['Active']
+        inactive_counts = counts['Inactive']
         
         # Create figure
         fig, ax = plt.subplots(figsize=(15, max(8, len(adm3_values) * 0.4)))
@@ -115,13 +92,11 @@ def main():
     if processor.load_data():
         with st.spinner("Processing data..."):
             try:
-                active_df, inactive_df = processor.process_data()
-                
                 # Add district-level analysis section
                 st.header("District-Level Distribution")
                 
                 # Get unique regions
-                regions = sorted(processor.df['adm1'].unique())
+                regions = processor.activity.counts('adm1').index.tolist()
                 
                 # Create region selector
                 selected_region = st.selectbox(
@@ -131,7 +106,7 @@ def main():
                 
                 # Show district distribution for selected region
                 st.subheader(f"Facility Distribution in {selected_region} by District")
-                fig_district = processor.plot_by_adm3_for_each_adm1(active_df, inactive_df, selected_region)
+                fig_district = processor.plot_by_adm3_for_each_adm1(selected_region)
                 
                 if fig_district is not None:
                     st.pyplot(fig_district)
@@ -4,6 +4,7 @@ import pandas as pd
 import matplotlib.pyplot as plt
 from matplotlib.patches import Patch
 import io
+from snt.cache import read_uploaded_file
 
 # Title
 st.title("MAP GENERATOR")
@@ -47,7 +48,7 @@ for i, (color_name, hex_code) in enumerate(nice_colors.items()):
 # File upload
 uploaded_file = st.file_uploader("Upload Excel or CSV file", type=["xlsx", "csv"])
 if uploaded_file is not None:
-    df = pd.read_excel(uploaded_file) if uploaded_file.name.endswith('.xlsx') else pd.read_csv(uploaded_file)
+    df = read_uploaded_file(uploaded_file)
     available_columns = [col for col in df.columns if col not in ['FIRST_DNAM', 'FIRST_CHIE', 'adm3']]
     
     map_column = st.selectbox("Select Map Column:", available_columns)
@@ -3,6 +3,7 @@ import streamlit as st
 import pandas as pd
 import io
 from datetime import datetime
+from snt.cache import read_uploaded_file
 
 # Set page config for better layout
 st.set_page_config(
@@ -99,10 +100,7 @@ with st.sidebar:
     if uploaded_file is not None:
         try:
             # Read the file
-            if uploaded_file.name.endswith('.csv'):
-                df = pd.read_csv(uploaded_file)
-            else:
-                df = pd.read_excel(uploaded_file)
+            df = read_uploaded_file(uploaded_file)
             
             # Store in session state
             st.session_state.df = df
@@ -1,5 +1,4 @@
 import streamlit as st
-import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
 import os
@@ -7,19 +6,43 @@ import zipfile
 import tempfile
 from pathlib import Path
 import io
+from snt.cache import read_uploaded_file
+from snt.reporting import reporting_rates
+from snt.rollup import RollupStore, cube_for_file
 
 class DistrictTrendAnalyzer:
     def __init__(self):
         """Initialize analyzer"""
         self.df = None
-        self.years = list(range(2015, 2024))  # 2015 to 2023
-        self.year_cols = [f'conf_rr_{year}' for year in self.years]
+        self.years = []
+        self.year_cols = []
         self.temp_dir = tempfile.mkdtemp()
 
-    def load_data(self):
+    def load_data(self, uploaded_file=None):
         """Load and prepare the data"""
         try:
-            self.df = pd.read_excel("reporting_rate_by_adm3.xlsx")
+            cube = None
+            if uploaded_file is not None:
+                # Rollup of the upload, built once per version of the dataset
+                cube = cube_for_file(uploaded_file)
+            elif RollupStore().exists():
+                # Rollup kept up to date by the pipeline
+                cube = RollupStore().load()
+            if cube is not None:
+                # Yearly reporting rates per adm3 from the facility level of the rollup
+                rates = reporting_rates(cube.facility_months(), level='adm3', grain='year')
+                wide = rates.pivot_table(index=['adm1', 'adm3'], columns='year', values='reporting_rate')
+                wide.columns = [f'conf_rr_{int(year)}' for year in wide.columns]
+                self.df = wide.reset_index()
+            else:
+                # Rates shipped with the app
+                self.df = read_uploaded_file("reporting_rate_by_adm3.xlsx")
+                if 'adm1' not in self.df.columns:
+                    # The shipped workbook has no regions
+                    self.df.insert(0, 'adm1', 'All regions')
+            # Every year present in the data
+            self.year_cols = [col for col in self.df.columns if str(col).startswith('conf_rr_')]
+            self.years = [int(col[len('conf_rr_'):]) for col in self.year_cols]
             st.success("Data successfully loaded!")
             return True
         except Exception as e:
@@ -99,7 +122,10 @@ def main():
 
     analyzer = DistrictTrendAnalyzer()
 
-    if analyzer.load_data():
+    uploaded_file = st.file_uploader("Upload key_variables.csv (optional, the pipeline rollup or the shipped rates are shown otherwise):",
+                                     type=["csv", "xlsx"])
+
+    if analyzer.load_data(uploaded_file):
         with st.spinner("Generating plots..."):
             try:
                 # Group data by region
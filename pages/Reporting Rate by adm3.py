@@ -1,12 +1,13 @@
 import streamlit as st
 import seaborn as sns
 import matplotlib.pyplot as plt
-import pandas as pd
 import numpy as np
 import zipfile
 import io
 import os
 import tempfile
+from snt.reporting import reporting_rates
+from snt.rollup import RollupStore, cube_for_file
 
 class HealthFacilityReportingProcessor:
     def __init__(self):
@@ -14,9 +15,12 @@ class HealthFacilityReportingProcessor:
         self.grouped = None
         self.temp_dir = tempfile.mkdtemp()
 
-    def load_data(self):
+    def load_data(self, uploaded_file=None):
         try:
-            self.df = pd.read_excel("active_health_facilities.xlsx")
+            # Rollup of the upload (built once per version of the dataset), or the pipeline's
+            cube = cube_for_file(uploaded_file) if uploaded_file is not None else RollupStore().load()
+            # Monthly reporting rates per adm3 from the facility level of the rollup
+            self.df = reporting_rates(cube.facility_months(), level='adm3', grain='month')
             st.success("Data successfully loaded!")
             return True
         except Exception as e:
@@ -24,18 +28,7 @@ class HealthFacilityReportingProcessor:
             return False
 
     def calculate_reporting_rate(self):
-        self.grouped = (
-            self.df.groupby(['adm1', 'adm3', 'date'])
-            .agg(
-                report_conf_sum=('report_conf', 'sum'),
-                hf_expected_sum=('hf_expected_to_report_month', 'sum')
-            )
-            .reset_index()
-        )
-
-        self.grouped['reporting_rate'] = (
-            self.grouped['report_conf_sum'].div(self.grouped['hf_expected_sum']) * 100
-        ).round(2)
+        self.grouped = self.df.rename(columns={'period': 'date'})
 
     def pivot_heatmap_data(self, data):
         heatmap_data = data.pivot(index='adm3', columns='date', values='reporting_rate')
@@ -161,8 +154,14 @@ def main():
     st.balloons()
     
     processor = HealthFacilityReportingProcessor()
-    
-    if processor.load_data():
+
+    uploaded_file = st.file_uploader("Upload key_variables.csv (optional, the pipeline rollup is used otherwise):",
+                                     type=["csv", "xlsx"])
+    if uploaded_file is None and not RollupStore().exists():
+        st.info("Upload the key variables (or run the pipeline) to compute the monthly reporting rates.")
+        return
+
+    if processor.load_data(uploaded_file):
         with st.spinner("Processing data..."):
             try:
                 processor.calculate_reporting_rate()
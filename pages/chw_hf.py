@@ -8,6 +8,8 @@ import io
 import zipfile
 import numpy as np
 
+from snt.basemap import base_map, load_boundaries
+
 st.set_page_config(layout="wide", page_title="Sierra Leone District Maps")
 st.title("Sierra Leone District-Chiefdom Static Maps Generator")
 
@@ -21,12 +23,8 @@ TYPE_COLORS = {
 
 try:
     # Read files directly
-    shapefile = gpd.read_file("Chiefdom 2021.shp")
+    shapefile = load_boundaries("Chiefdom 2021.shp").chiefdoms
     facility_data = pd.read_excel("CHW Geo (1).xlsx")
-
-    # Set the CRS for the shapefile if not already set
-    if shapefile.crs is None:
-        shapefile = shapefile.set_crs(epsg=4326)
     
     # Clean the facility data - remove rows with missing coordinates
     clean_facility_data = facility_data.dropna(subset=['w_long', 'w_lat']).copy()
@@ -93,12 +91,11 @@ try:
                     ax = axes[row, col]
                     
                     # Filter data for this chiefdom
-                    chiefdom_shape = district_shapefile[district_shapefile['FIRST_CHIE'] == chiefdom]
                     chiefdom_facilities = district_facilities[district_facilities['FIRST_CHIE'] == chiefdom]
                     
                     # Plot chiefdom boundary
-                    chiefdom_shape.boundary.plot(ax=ax, color='black', linewidth=1)
-                    chiefdom_shape.plot(ax=ax, color='lightgray', alpha=0.3)
+                    base_map('chiefdom_panel', district=district, chiefdom=chiefdom, aspect=1.0).draw(
+                        ax, limits=False)
                     
                     # Plot facilities by type
                     for facility_type in chiefdom_facilities['type'].unique():
@@ -118,7 +115,6 @@ try:
                     # Set title and formatting
                     ax.set_title(f'{chiefdom}\n({len(chiefdom_facilities)} hf/chw)', 
                                fontsize=9, fontweight='bold')
-                    ax.set_aspect('equal')
                     ax.axis('off')  # Turn off axes
                     
                     # Add legend if there are facilities - with bold text
@@ -155,18 +151,8 @@ try:
             # Summary map with PowerPoint dimensions
             fig, ax = plt.subplots(1, 1, figsize=(13.33, 7.5))
             
-            # Plot all districts with different colors
-            district_colors = plt.cm.Set3(np.linspace(0, 1, len(districts)))
-            
-            for idx, district in enumerate(districts):
-                district_shape = shapefile[shapefile['FIRST_DNAM'] == district]
-                district_shape.plot(ax=ax, color=district_colors[idx], alpha=0.6, 
-                                  edgecolor='black', linewidth=0.5)
-                
-                # Add district label at centroid
-                centroid = district_shape.geometry.centroid.iloc[0]
-                ax.annotate(district, xy=(centroid.x, centroid.y), 
-                          fontsize=8, ha='center', va='center', fontweight='bold')
+            # Plot all districts with different colors and their labels
+            base_map('district_summary', aspect=1.0).draw(ax, limits=False)
             
             # Plot all facilities
             for facility_type in facilities_with_admin['type'].unique():
@@ -185,7 +171,6 @@ try:
             
             ax.set_title('Sierra Leone - All Districts and Health Facilities', 
                         fontsize=16, fontweight='bold')
-            ax.set_aspect('equal')
             ax.axis('off')  # Turn off axes
             
             # Add legend with bold text for summary map
@@ -260,12 +245,11 @@ try:
             ax = axes[row, col]
             
             # Filter data for this chiefdom
-            chiefdom_shape = district_shapefile[district_shapefile['FIRST_CHIE'] == chiefdom]
             chiefdom_facilities = district_facilities[district_facilities['FIRST_CHIE'] == chiefdom]
             
             # Plot chiefdom boundary
-            chiefdom_shape.boundary.plot(ax=ax, color='black', linewidth=1)
-            chiefdom_shape.plot(ax=ax, color='lightgray', alpha=0.3)
+            base_map('chiefdom_panel', district=selected_district, chiefdom=chiefdom, aspect=1.0).draw(
+                ax, limits=False)
             
             # Plot facilities by type
             for facility_type in chiefdom_facilities['type'].unique():
@@ -285,7 +269,6 @@ try:
             # Set title and formatting
             ax.set_title(f'{chiefdom}\n({len(chiefdom_facilities)} hf/chw)', 
                        fontsize=9, fontweight='bold')
-            ax.set_aspect('equal')
             ax.axis('off')  # Turn off axes
             
             # Add legend if there are facilities - with bold text
@@ -2,6 +2,7 @@ import streamlit as st
 import pandas as pd
 import numpy as np
 import io
+from snt.cache import read_uploaded_file
 
 st.set_page_config(layout="wide", page_title="DataFrame Condition Builder")
 
@@ -15,10 +16,8 @@ if uploaded_file is not None:
     # Load the data based on file type
     file_extension = uploaded_file.name.split('.')[-1].lower()
     
-    if file_extension == 'csv':
-        df = pd.read_csv(uploaded_file)
-    elif file_extension in ['xlsx', 'xls']:
-        df = pd.read_excel(uploaded_file)
+    if file_extension in ['csv', 'xlsx', 'xls']:
+        df = read_uploaded_file(uploaded_file)
     
     # Display original dataframe
     st.subheader("Original DataFrame")
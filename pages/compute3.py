@@ -2,6 +2,8 @@ import streamlit as st
 import pandas as pd
 import io
 from datetime import datetime
+from snt.cache import read_uploaded_file
+from snt.indicators import IndicatorEngine
 
 # Set page config
 st.set_page_config(
@@ -159,14 +161,13 @@ def validate_computation(new_var_name, selected_vars, operation):
     
     return errors
 
-def compute_variable(df, selected_vars, operation):
-    """Compute new variable based on operation"""
+def indicator_definition(selected_vars, operation):
+    """Translate a variable config into an indicator engine definition"""
     if operation == "Addition":
-        return df[selected_vars].sum(axis=1)
+        return {'sum': selected_vars, 'min_count': 0}
     elif operation == "Subtraction":
-        result = df[selected_vars[0]] - df[selected_vars[1]]
         # Replace negative values with 0
-        return result.clip(lower=0)
+        return {'positive_difference': selected_vars[:2], 'fill_missing': False}
     return None
 
 def apply_all_computations():
@@ -176,16 +177,20 @@ def apply_all_computations():
     
     computed_df = st.session_state.df.copy()
     
+    spec = {}
     for config in st.session_state.variable_configs:
         if not config['new_variable'] or not config['variables'] or not config['operation']:
             continue
             
-        new_var = config['new_variable']
-        selected_vars = config['variables']
-        operation = config['operation']
-        
-        # Compute the new variable
-        computed_df[new_var] = compute_variable(computed_df, selected_vars, operation)
+        definition = indicator_definition(config['variables'], config['operation'])
+        if definition is None:
+            computed_df[config['new_variable']] = None
+        else:
+            spec[config['new_variable']] = definition
+    
+    # All new variables are computed together in one pass
+    if spec:
+        computed_df = IndicatorEngine(spec).apply(computed_df)
     
     return computed_df
 
@@ -212,10 +217,7 @@ with st.sidebar:
     if uploaded_file is not None:
         try:
             # Read the file
-            if uploaded_file.name.endswith('.csv'):
-                df = pd.read_csv(uploaded_file)
-            else:
-                df = pd.read_excel(uploaded_file)
+            df = read_uploaded_file(uploaded_file)
             
             # Store in session state
             st.session_state.df = df
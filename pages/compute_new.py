@@ -2,6 +2,8 @@ import streamlit as st
 import pandas as pd
 import io
 from datetime import datetime
+from snt.cache import read_uploaded_file
+from snt.indicators import IndicatorEngine
 
 # Set page config
 st.set_page_config(
@@ -117,16 +119,15 @@ def get_available_columns(exclude_used=True):
     else:
         return numeric_cols
 
-def compute_variable(df, selected_vars, operation):
-    """Compute new variable based on operation"""
+def indicator_definition(selected_vars, operation):
+    """Translate a computation into an indicator engine definition"""
     if operation == "Addition":
-        return df[selected_vars].sum(axis=1)
+        return {'sum': selected_vars, 'min_count': 0}
     elif operation == "Subtraction":
         if len(selected_vars) != 2:
             return None
-        result = df[selected_vars[0]] - df[selected_vars[1]]
         # Replace negative values with 0
-        return result.clip(lower=0)
+        return {'positive_difference': selected_vars, 'fill_missing': False}
     return None
 
 def apply_all_computations():
@@ -136,13 +137,18 @@ def apply_all_computations():
     
     computed_df = st.session_state.df.copy()
     
+    spec = {}
     for computation in st.session_state.computations:
         new_var = computation['new_variable']
-        selected_vars = computation['variables']
-        operation = computation['operation']
-        
-        # Compute the new variable
-        computed_df[new_var] = compute_variable(computed_df, selected_vars, operation)
+        definition = indicator_definition(computation['variables'], computation['operation'])
+        if definition is None:
+            computed_df[new_var] = None
+        else:
+            spec[new_var] = definition
+    
+    # All new variables are computed together in one pass
+    if spec:
+        computed_df = IndicatorEngine(spec).apply(computed_df)
     
     return computed_df
 
@@ -159,10 +165,7 @@ with st.sidebar:
     if uploaded_file is not None:
         try:
             # Read the file
-            if uploaded_file.name.endswith('.csv'):
-                df = pd.read_csv(uploaded_file)
-            else:
-                df = pd.read_excel(uploaded_file)
+            df = read_uploaded_file(uploaded_file)
             
             # Store in session state
             st.session_state.df = df
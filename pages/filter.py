@@ -1,9 +1,9 @@
 import streamlit as st
-import pandas as pd
 import geopandas as gpd
 import plotly.express as px
 import tempfile
 import os
+from snt.cache import read_uploaded_file
 
 # Set page configuration
 st.set_page_config(
@@ -57,10 +57,7 @@ def load_shapefile_from_components(shp_file, shx_file, dbf_file):
 # Function to load data file
 def load_data_file(file):
     """Load data from Excel or CSV file."""
-    if file.name.endswith('.csv'):
-        return pd.read_csv(file)
-    else:  # Excel file
-        return pd.read_excel(file)
+    return read_uploaded_file(file)
 
 # Function to create filter controls based on column type
 def create_filter_control(df, col_name, filter_state):
@@ -1,6 +1,7 @@
 import streamlit as st
 import pandas as pd
 import matplotlib.pyplot as plt
+from snt.cache import read_uploaded_file
 
 # Streamlit App Title
 st.title("Health Facility (HF) Grouping & Summary")
@@ -11,10 +12,8 @@ uploaded_file = st.file_uploader("Upload a CSV or Excel file", type=["csv", "xls
 if uploaded_file:
     # Read file based on extension
     file_extension = uploaded_file.name.split(".")[-1]
-    if file_extension in ["xls", "xlsx"]:
-        df = pd.read_excel(uploaded_file)
-    elif file_extension == "csv":
-        df = pd.read_csv(uploaded_file)
+    if file_extension in ["xls", "xlsx", "csv"]:
+        df = read_uploaded_file(uploaded_file)
 
     # Ensure required columns exist
     required_columns = {'adm1', 'adm2', 'adm3', 'hf'}
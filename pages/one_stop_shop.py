@@ -4,6 +4,7 @@ import plotly.graph_objects as go
 import numpy as np
 import geopandas as gpd
 from shapely.geometry import Point
+from snt.cache import read_uploaded_file
 
 st.set_page_config(layout="wide", page_title="Chiefdom Center Points Map")
 st.title("🗺️ Interactive Chiefdom Center Points Map")
@@ -67,7 +68,7 @@ uploaded_file = st.file_uploader(
 if uploaded_file is not None:
     try:
         # Load the data
-        df = pd.read_excel(uploaded_file)
+        df = read_uploaded_file(uploaded_file)
         st.session_state.data = df
         
         st.success(f"✅ File uploaded successfully! Found {len(df)} rows and {len(df.columns)} columns.")
@@ -1,15 +1,16 @@
 import streamlit as st
-import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
+from snt.activity import activity_for_file
 
 class HealthFacilityProcessor:
     def __init__(self):
-        self.df = None
+        self.activity = None
 
     def load_data(self):
         try:
-            self.df = pd.read_csv("key_variables (2).csv")
+            # Facility-level activity, computed once per version of the file
+            self.activity = activity_for_file("key_variables (2).csv")
             st.success("Data successfully loaded!")
             return True
         except Exception as e:
@@ -17,24 +18,8 @@ class HealthFacilityProcessor:
             return False
 
     def process_data(self):
-        # Calculate report column
-        self.df['report'] = (self.df[['allout', 'susp', 'test', 'conf', 'maltreat']] > 0).sum(axis=1, min_count=1)
-
-        # Create date column
-        self.df['month'] = self.df['month'].astype(int).astype(str).str.zfill(2)
-        self.df['year'] = self.df['year'].astype(int).astype(str)
-        self.df['date'] = pd.to_datetime(self.df['year'] + '-' + self.df['month'], format='%Y-%m')
-
-        # Determine first month reported per facility
-        report_positive = self.df[self.df['report'] > 0]
-        first_months = report_positive.groupby('hf_uid')['date'].min()
-        self.df['First_month_hf_reported'] = self.df['hf_uid'].map(first_months)
-
-        # Split active and inactive
-        active_df = self.df[self.df['First_month_hf_reported'].notna()]
-        inactive_df = self.df[self.df['First_month_hf_reported'].isna()]
-
-        return active_df, inactive_df
+        # Overall active/inactive facility counts
+        return self.activity.counts().iloc[0]
 
     def plot_overall_counts(self, active_count, inactive_count):
         fig, ax = plt.subplots(figsize=(6, 4))
@@ -81,12 +66,12 @@ def main():
     if processor.load_data():
         with st.spinner("Processing data..."):
             try:
-                active_df, inactive_df = processor.process_data()
+                counts = processor.process_data()
 
                 # Overall summary
-                total_hfs = processor.df['hf_uid'].nunique()
-                active_hfs = active_df['hf_uid'].nunique()
-                inactive_hfs = inactive_df['hf_uid'].nunique()
+                total_hfs = int(counts['Total'])
+                active_hfs = int(counts['Active'])
+                inactive_hfs = int(counts['Inactive'])
 
                 active_pct = active_hfs / total_hfs * 100 if total_hfs > 0 else 0
                 inactive_pct = inactive_hfs / total_hfs * 100 if total_hfs > 0 else 0
@@ -1,5 +1,6 @@
 import streamlit as st
 import pandas as pd
+from snt import facilities
 
 def rename_columns(df):
     try:
@@ -36,23 +37,13 @@ def create_hfid(df):
         
         if missing_cols:
             st.warning(f"Missing columns for facility ID creation: {', '.join(missing_cols)}. Using available columns.")
-            # Use only available columns for grouping
-            group_cols = [col for col in required_cols if col in df.columns]
-            if not group_cols:
+            if len(missing_cols) == len(required_cols):
                 st.error("No location columns available for facility ID creation.")
                 df['hf_uid'] = [f'hf_{i:04d}' for i in range(len(df))]
                 return df
-                
-            df['hf_uid'] = df.groupby(group_cols).ngroup().apply(
-                lambda x: f'hf_{x:04d}'
-            )
-        else:
-            # All columns exist, proceed as planned
-            df['hf_uid'] = df.groupby(['adm1', 'adm2', 'adm3', 'hf']).ngroup().apply(
-                lambda x: f'hf_{x:04d}'
-            )
         
-        return df
+        # Stable IDs from the shared facility registry
+        return facilities.create_hfid(df)
     except Exception as e:
         st.error(f"Error creating facility IDs: {str(e)}")
         # Add a simple sequential ID as fallback
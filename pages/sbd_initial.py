@@ -4,6 +4,7 @@ import re
 import numpy as np
 import matplotlib.pyplot as plt
 import geopandas as gpd
+from snt.qr_payload import extract_qr_fields
 
 # Custom CSS with blue and white theme and zoom functionality
 st.markdown("""
@@ -271,48 +272,8 @@ if uploaded_file:
         st.error(f"❌ Could not load shapefile: {e}")
         gdf = None
     
-    # Create empty lists to store extracted data
-    districts, chiefdoms, phu_names, community_names, school_names = [], [], [], [], []
-    
-    # Process each row in the "Scan QR code" column
-    for qr_text in df_original["Scan QR code"]:
-        if pd.isna(qr_text):
-            districts.append(None)
-            chiefdoms.append(None)
-            phu_names.append(None)
-            community_names.append(None)
-            school_names.append(None)
-            continue
-            
-        # Extract values using regex patterns
-        district_match = re.search(r"District:\s*([^\n]+)", str(qr_text))
-        districts.append(district_match.group(1).strip() if district_match else None)
-        
-        chiefdom_match = re.search(r"Chiefdom:\s*([^\n]+)", str(qr_text))
-        chiefdoms.append(chiefdom_match.group(1).strip() if chiefdom_match else None)
-        
-        phu_match = re.search(r"PHU name:\s*([^\n]+)", str(qr_text))
-        phu_names.append(phu_match.group(1).strip() if phu_match else None)
-        
-        community_match = re.search(r"Community name:\s*([^\n]+)", str(qr_text))
-        community_names.append(community_match.group(1).strip() if community_match else None)
-        
-        school_match = re.search(r"Name of school:\s*([^\n]+)", str(qr_text))
-        school_names.append(school_match.group(1).strip() if school_match else None)
-    
-    # Create a new DataFrame with extracted values
-    extracted_df = pd.DataFrame({
-        "District": districts,
-        "Chiefdom": chiefdoms,
-        "PHU Name": phu_names,
-        "Community Name": community_names,
-        "School Name": school_names
-    })
-    
-    # Add all other columns from the original DataFrame
-    for column in df_original.columns:
-        if column != "Scan QR code":  # Skip the QR code column since we've already processed it
-            extracted_df[column] = df_original[column]
+    # District, chiefdom, PHU, community and school from the QR payloads, in place of the QR column
+    extracted_df = extract_qr_fields(df_original)
     
     # Create sidebar filters early so they're available for all sections
     st.sidebar.header("Filter Options")
@@ -795,7 +756,7 @@ if uploaded_file:
                 agg_dict[girls_col] = "sum"
         
         # Group by District and aggregate
-        district_summary = extracted_df.groupby("District").agg(agg_dict).reset_index()
+        district_summary = extracted_df.groupby("District", observed=True).agg(agg_dict).reset_index()
         
         # Calculate total enrollment
         district_summary["Total Enrollment"] = 0
@@ -847,7 +808,7 @@ if uploaded_file:
                 agg_dict[girls_col] = "sum"
         
         # Group by District and Chiefdom and aggregate
-        chiefdom_summary = extracted_df.groupby(["District", "Chiefdom"]).agg(agg_dict).reset_index()
+        chiefdom_summary = extracted_df.groupby(["District", "Chiefdom"], observed=True).agg(agg_dict).reset_index()
         
         # Calculate total enrollment
         chiefdom_summary["Total Enrollment"] = 0
@@ -869,7 +830,7 @@ if uploaded_file:
         )
         
         # Create a temporary label for the chart
-        chiefdom_summary['Label'] = chiefdom_summary['District'] + '\n' + chiefdom_summary['Chiefdom']
+        chiefdom_summary['Label'] = chiefdom_summary['District'].astype(str) + '\n' + chiefdom_summary['Chiefdom'].astype(str)
         
         # Create a bar chart for chiefdom summary
         fig, ax = plt.subplots(figsize=(14, 10))
@@ -915,7 +876,7 @@ if uploaded_file:
                 agg_dict[girls_col] = "sum"
         
         # Group by the selected hierarchical columns
-        grouped_data = filtered_df.groupby(group_columns).agg(agg_dict).reset_index()
+        grouped_data = filtered_df.groupby(group_columns, observed=True).agg(agg_dict).reset_index()
         
         # Calculate total enrollment
         grouped_data["Total Enrollment"] = 0
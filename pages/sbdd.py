@@ -1,10 +1,14 @@
 import streamlit as st
 import pandas as pd
-import re
 import numpy as np
 import matplotlib.pyplot as plt
-import geopandas as gpd
+from snt.qr_payload import extract_qr_fields
+from snt.sbd_summary import SBDRollup
+from snt.school_locations import LATITUDE, LONGITUDE, MISMATCH_COLUMN, add_school_locations
+from snt.basemap import base_map, load_boundaries
+from snt.sbd_maps import render_district_maps
 from io import BytesIO
+import zipfile
 import base64
 
 # Custom CSS with blue and white theme and zoom functionality
@@ -217,111 +221,6 @@ def save_map_as_png(fig, filename_prefix):
     
     return buffer
 
-# Function to generate comprehensive summaries
-def generate_summaries(df):
-    """Generate District, Chiefdom, and Gender summaries"""
-    summaries = {}
-    
-    # Overall Summary
-    overall_summary = {
-        'total_schools': len(df),
-        'total_districts': len(df['District'].dropna().unique()),
-        'total_chiefdoms': len(df['Chiefdom'].dropna().unique()),
-        'total_boys': 0,
-        'total_girls': 0,
-        'total_enrollment': 0,
-        'total_itn': 0
-    }
-    
-    for class_num in range(1, 6):
-        boys_col = f"Number of boys in class {class_num}"
-        girls_col = f"Number of girls in class {class_num}"
-        itn_col = f"Number of ITN distributed to class {class_num}"
-        
-        if boys_col in df.columns:
-            overall_summary['total_boys'] += df[boys_col].fillna(0).sum()
-        if girls_col in df.columns:
-            overall_summary['total_girls'] += df[girls_col].fillna(0).sum()
-        if itn_col in df.columns:
-            overall_summary['total_itn'] += df[itn_col].fillna(0).sum()
-    
-    overall_summary['total_enrollment'] = overall_summary['total_boys'] + overall_summary['total_girls']
-    overall_summary['coverage'] = (overall_summary['total_itn'] / overall_summary['total_enrollment'] * 100) if overall_summary['total_enrollment'] > 0 else 0
-    overall_summary['gender_ratio'] = (overall_summary['total_girls'] / overall_summary['total_boys'] * 100) if overall_summary['total_boys'] > 0 else 0
-    
-    summaries['overall'] = overall_summary
-    
-    # District Summary
-    district_summary = []
-    for district in df['District'].dropna().unique():
-        district_data = df[df['District'] == district]
-        district_stats = {
-            'district': district,
-            'schools': len(district_data),
-            'chiefdoms': len(district_data['Chiefdom'].dropna().unique()),
-            'boys': 0,
-            'girls': 0,
-            'enrollment': 0,
-            'itn': 0
-        }
-        
-        for class_num in range(1, 6):
-            boys_col = f"Number of boys in class {class_num}"
-            girls_col = f"Number of girls in class {class_num}"
-            itn_col = f"Number of ITN distributed to class {class_num}"
-            
-            if boys_col in district_data.columns:
-                district_stats['boys'] += district_data[boys_col].fillna(0).sum()
-            if girls_col in district_data.columns:
-                district_stats['girls'] += district_data[girls_col].fillna(0).sum()
-            if itn_col in district_data.columns:
-                district_stats['itn'] += district_data[itn_col].fillna(0).sum()
-        
-        district_stats['enrollment'] = district_stats['boys'] + district_stats['girls']
-        district_stats['coverage'] = (district_stats['itn'] / district_stats['enrollment'] * 100) if district_stats['enrollment'] > 0 else 0
-        district_stats['gender_ratio'] = (district_stats['girls'] / district_stats['boys'] * 100) if district_stats['boys'] > 0 else 0
-        
-        district_summary.append(district_stats)
-    
-    summaries['district'] = district_summary
-    
-    # Chiefdom Summary
-    chiefdom_summary = []
-    for district in df['District'].dropna().unique():
-        district_data = df[df['District'] == district]
-        for chiefdom in district_data['Chiefdom'].dropna().unique():
-            chiefdom_data = district_data[district_data['Chiefdom'] == chiefdom]
-            chiefdom_stats = {
-                'district': district,
-                'chiefdom': chiefdom,
-                'schools': len(chiefdom_data),
-                'boys': 0,
-                'girls': 0,
-                'enrollment': 0,
-                'itn': 0
-            }
-            
-            for class_num in range(1, 6):
-                boys_col = f"Number of boys in class {class_num}"
-                girls_col = f"Number of girls in class {class_num}"
-                itn_col = f"Number of ITN distributed to class {class_num}"
-                
-                if boys_col in chiefdom_data.columns:
-                    chiefdom_stats['boys'] += chiefdom_data[boys_col].fillna(0).sum()
-                if girls_col in chiefdom_data.columns:
-                    chiefdom_stats['girls'] += chiefdom_data[girls_col].fillna(0).sum()
-                if itn_col in chiefdom_data.columns:
-                    chiefdom_stats['itn'] += chiefdom_data[itn_col].fillna(0).sum()
-            
-            chiefdom_stats['enrollment'] = chiefdom_stats['boys'] + chiefdom_stats['girls']
-            chiefdom_stats['coverage'] = (chiefdom_stats['itn'] / chiefdom_stats['enrollment'] * 100) if chiefdom_stats['enrollment'] > 0 else 0
-            chiefdom_stats['gender_ratio'] = (chiefdom_stats['girls'] / chiefdom_stats['boys'] * 100) if chiefdom_stats['boys'] > 0 else 0
-            
-            chiefdom_summary.append(chiefdom_stats)
-    
-    summaries['chiefdom'] = chiefdom_summary
-    
-    return summaries
 ### part 2-----------------------------------------------------------------------------------------------------------------
 
 # Logo Section - Clean 4 Logo Layout
@@ -396,54 +295,19 @@ if uploaded_file:
     
     # Load shapefile
     try:
-        gdf = gpd.read_file("Chiefdom 2021.shp")
+        # Read once per process, with the district dissolve and label points
+        gdf = load_boundaries("Chiefdom 2021.shp").chiefdoms
         st.success("✅ Shapefile loaded successfully!")
     except Exception as e:
         st.error(f"❌ Could not load shapefile: {e}")
         gdf = None
     
-    # Create empty lists to store extracted data
-    districts, chiefdoms, phu_names, community_names, school_names = [], [], [], [], []
-    
-    # Process each row in the "Scan QR code" column
-    for qr_text in df_original["Scan QR code"]:
-        if pd.isna(qr_text):
-            districts.append(None)
-            chiefdoms.append(None)
-            phu_names.append(None)
-            community_names.append(None)
-            school_names.append(None)
-            continue
-            
-        # Extract values using regex patterns
-        district_match = re.search(r"District:\s*([^\n]+)", str(qr_text))
-        districts.append(district_match.group(1).strip() if district_match else None)
-        
-        chiefdom_match = re.search(r"Chiefdom:\s*([^\n]+)", str(qr_text))
-        chiefdoms.append(chiefdom_match.group(1).strip() if chiefdom_match else None)
-        
-        phu_match = re.search(r"PHU name:\s*([^\n]+)", str(qr_text))
-        phu_names.append(phu_match.group(1).strip() if phu_match else None)
-        
-        community_match = re.search(r"Community name:\s*([^\n]+)", str(qr_text))
-        community_names.append(community_match.group(1).strip() if community_match else None)
-        
-        school_match = re.search(r"Name of school:\s*([^\n]+)", str(qr_text))
-        school_names.append(school_match.group(1).strip() if school_match else None)
-    
-    # Create a new DataFrame with extracted values
-    extracted_df = pd.DataFrame({
-        "District": districts,
-        "Chiefdom": chiefdoms,
-        "PHU Name": phu_names,
-        "Community Name": community_names,
-        "School Name": school_names
-    })
-    
-    # Add all other columns from the original DataFrame
-    for column in df_original.columns:
-        if column != "Scan QR code":  # Skip the QR code column since we've already processed it
-            extracted_df[column] = df_original[column]
+    # District, chiefdom, PHU, community and school from the QR payloads, in place of the QR column
+    extracted_df = extract_qr_fields(df_original)
+    
+    # School coordinates parsed once for every map, checked against the claimed chiefdom
+    if "GPS Location" in extracted_df.columns:
+        extracted_df = add_school_locations(extracted_df, gdf)
     
     # Create sidebar filters early so they're available for all sections
     st.sidebar.header("Filter Options")
@@ -485,6 +349,7 @@ if uploaded_file:
     
     # Store map images for report
     map_images = {}
+    district_maps = {}
     
     # Display Dual Maps at the top
     st.subheader("🗺️ Geographic Distribution Maps")
@@ -496,55 +361,18 @@ if uploaded_file:
         # Create overall Sierra Leone map
         fig_overall, ax_overall = plt.subplots(figsize=(16, 10))
         
-        # Plot all chiefdoms with gray edges (base layer)
-        gdf.plot(ax=ax_overall, color='white', edgecolor='gray', alpha=0.8, linewidth=0.5)
+        # Chiefdoms with gray edges, district boundaries and labels (cached base layers)
+        base_map('sbd_overview', pad=0.1, aspect=1.0).draw(ax_overall)
         
-        # Plot district boundaries with thick black lines
-        # Get district boundaries by dissolving chiefdoms by FIRST_DNAM
-        if 'FIRST_DNAM' in gdf.columns:
-            district_boundaries = gdf.dissolve(by='FIRST_DNAM')
-            district_boundaries.plot(ax=ax_overall, facecolor='none', edgecolor='black', linewidth=3, alpha=1.0)
-            
-            # Add district labels at centroids
-            for idx, row in district_boundaries.iterrows():
-                centroid = row.geometry.centroid
-                ax_overall.annotate(
-                    idx,  # District name
-                    (centroid.x, centroid.y),
-                    fontsize=12,
-                    fontweight='bold',
-                    ha='center',
-                    va='center',
-                    color='black',
-                    bbox=dict(boxstyle='round,pad=0.3', facecolor='white', alpha=0.8, edgecolor='black')
-                )
-        
-        # Extract and plot ALL GPS coordinates from entire dataset
+        # School coordinates of the entire dataset
         all_coords_extracted = []
-        if "GPS Location" in extracted_df.columns:
-            all_gps_data = extracted_df["GPS Location"].dropna()
-            
-            st.write(f"**Debug: Processing {len(all_gps_data)} GPS entries for overall map**")
-            
-            for idx, gps_val in enumerate(all_gps_data):
-                if pd.notna(gps_val):
-                    gps_str = str(gps_val).strip()
-                    
-                    # Handle the specific format: 8.6103181,-12.2029534
-                    if ',' in gps_str:
-                        try:
-                            parts = gps_str.split(',')
-                            if len(parts) == 2:
-                                lat = float(parts[0].strip())
-                                lon = float(parts[1].strip())
-                                
-                                # Check if coordinates are in valid range for Sierra Leone
-                                if 6.0 <= lat <= 11.0 and -14.0 <= lon <= -10.0:
-                                    all_coords_extracted.append([lat, lon])
-                        except ValueError:
-                            continue
-            
+        if LATITUDE in extracted_df.columns:
+            all_coords_extracted = extracted_df[[LATITUDE, LONGITUDE]].dropna().to_numpy().tolist()
             st.write(f"**Total valid coordinates for overall map: {len(all_coords_extracted)}**")
+            if MISMATCH_COLUMN in extracted_df.columns:
+                mismatches = int(extracted_df[MISMATCH_COLUMN].sum())
+                if mismatches:
+                    st.warning(f"{mismatches} school locations fall outside the chiefdom given in their QR code")
         
         # Plot GPS points on the overall map
         if all_coords_extracted:
@@ -577,10 +405,6 @@ if uploaded_file:
         # Add grid for reference
         ax_overall.grid(True, alpha=0.3, linestyle='--')
         
-        # Set axis limits to show full country
-        ax_overall.set_xlim(gdf.total_bounds[0] - 0.1, gdf.total_bounds[2] + 0.1)
-        ax_overall.set_ylim(gdf.total_bounds[1] - 0.1, gdf.total_bounds[3] + 0.1)
-        
         plt.tight_layout()
         st.pyplot(fig_overall)
         
@@ -589,270 +413,45 @@ if uploaded_file:
         
         st.divider()
         
-        # NOW THE INDIVIDUAL DISTRICT MAPS
-        # Define specific districts for left and right maps
-        left_district = "BO"
-        right_district = "BOMBALI"
+        # DISTRICT MAPS - every district of the shapefile, rendered in parallel
+        st.write("**District Maps - All Chiefdoms**")
+        districts = list(load_boundaries("Chiefdom 2021.shp").districts.index)
+        map_progress = st.progress(0.0, text="Rendering district maps...")
+        district_zip = BytesIO()
+        failed_districts = []
+        with zipfile.ZipFile(district_zip, 'w', zipfile.ZIP_STORED) as zip_file:
+            for done, (district, png) in enumerate(render_district_maps(extracted_df, districts), start=1):
+                map_progress.progress(done / len(districts), text=f"Rendered {district} ({done}/{len(districts)})")
+                if png is None:
+                    failed_districts.append(district)
+                    continue
+                district_maps[district] = BytesIO(png)
+                zip_file.writestr(f"{district}_District_Map.png", png)
+        map_progress.empty()
+        if failed_districts:
+            st.warning(f"Could not render the map of {', '.join(sorted(failed_districts))}; "
+                       "the other district maps are shown below.")
         
-        # BO DISTRICT MAP - Full width
-        st.write(f"**{left_district} District - All Chiefdoms**")
-        
-        # Filter shapefile for BO district
-        bo_gdf = gdf[gdf['FIRST_DNAM'] == left_district].copy()
+        st.download_button(
+            label="📦 Download All District Maps (ZIP)",
+            data=district_zip.getvalue(),
+            file_name="SBD_District_Maps.zip",
+            mime="application/zip"
+        )
         
-        if len(bo_gdf) > 0:
-            # Filter data for BO district to get GPS coordinates
-            bo_data = extracted_df[extracted_df["District"] == left_district].copy()
-            
-            # Create the BO district plot
-            fig_bo, ax_bo = plt.subplots(figsize=(14, 8))
-            
-            # Plot chiefdom boundaries in white with black edges
-            bo_gdf.plot(ax=ax_bo, color='white', edgecolor='black', alpha=0.8, linewidth=2)
-            
-            # Extract and plot GPS coordinates FIRST
-            coords_extracted = []
-            if len(bo_data) > 0 and "GPS Location" in bo_data.columns:
-                gps_data = bo_data["GPS Location"].dropna()
-                
-                st.write(f"**Debug: Found {len(gps_data)} GPS entries for BO District**")
-                
-                for idx, gps_val in enumerate(gps_data):
-                    if pd.notna(gps_val):
-                        gps_str = str(gps_val).strip()
-                        st.write(f"GPS {idx+1}: {gps_str}")
-                        
-                        # Handle the specific format: 8.6103181,-12.2029534
-                        if ',' in gps_str:
-                            try:
-                                parts = gps_str.split(',')
-                                if len(parts) == 2:
-                                    lat = float(parts[0].strip())
-                                    lon = float(parts[1].strip())
-                                    
-                                    # Check if coordinates are in valid range for Sierra Leone
-                                    if 6.0 <= lat <= 11.0 and -14.0 <= lon <= -10.0:
-                                        coords_extracted.append([lat, lon])
-                                        st.write(f"✅ Valid coordinates: {lat}, {lon}")
-                                    else:
-                                        st.write(f"❌ Invalid coordinates (outside Sierra Leone): {lat}, {lon}")
-                            except ValueError as e:
-                                st.write(f"❌ Could not parse coordinates: {gps_str} - Error: {e}")
-                
-                st.write(f"**Total valid coordinates extracted: {len(coords_extracted)}**")
-            
-            # Plot GPS points on the shapefile
-            if coords_extracted:
-                lats, lons = zip(*coords_extracted)
-                
-                # Plot GPS points with high visibility
-                scatter = ax_bo.scatter(
-                    lons, lats,
-                    c='red',
-                    s=150,
-                    alpha=1.0,
-                    edgecolors='white',
-                    linewidth=3,
-                    zorder=100,  # Very high z-order to ensure visibility
-                    label=f'Schools ({len(coords_extracted)})',
-                    marker='o'
-                )
-                
-                # Add text labels for each point
-                for i, (lat, lon) in enumerate(coords_extracted):
-                    ax_bo.annotate(f'S{i+1}', 
-                                  (lon, lat),
-                                  xytext=(5, 5), 
-                                  textcoords='offset points',
-                                  fontsize=10,
-                                  fontweight='bold',
-                                  color='red',
-                                  bbox=dict(boxstyle='round,pad=0.2', facecolor='white', alpha=0.8))
-                
-                # Show coordinate range for verification
-                st.write(f"**Coordinate range:** Lat: {min(lats):.4f} to {max(lats):.4f}, Lon: {min(lons):.4f} to {max(lons):.4f}")
-                
-                # Set map extent to include all points with padding
-                margin = 0.05
-                ax_bo.set_xlim(min(lons) - margin, max(lons) + margin)
-                ax_bo.set_ylim(min(lats) - margin, max(lats) + margin)
-                
-            # Add chiefdom labels
-            for idx, row in bo_gdf.iterrows():
-                if 'FIRST_CHIE' in row and pd.notna(row['FIRST_CHIE']):
-                    centroid = row.geometry.centroid
-                    ax_bo.annotate(
-                        row['FIRST_CHIE'], 
-                        (centroid.x, centroid.y),
-                        xytext=(5, 5), 
-                        textcoords='offset points',
-                        fontsize=9,
-                        ha='left',
-                        bbox=dict(boxstyle='round,pad=0.3', facecolor='lightblue', alpha=0.7)
-                    )
-            
-            # Customize plot
-            title_text = f'{left_district} District - Chiefdoms: {len(bo_gdf)}'
-            if coords_extracted:
-                title_text += f' | GPS Points: {len(coords_extracted)}'
-            ax_bo.set_title(title_text, fontsize=16, fontweight='bold')
-            ax_bo.set_xlabel('Longitude', fontsize=12)
-            ax_bo.set_ylabel('Latitude', fontsize=12)
-            
-            # Add legend if GPS points exist
-            if coords_extracted:
-                ax_bo.legend(fontsize=12, loc='best')
-            
-            # Add grid for reference
-            ax_bo.grid(True, alpha=0.3, linestyle='--')
-            
-            plt.tight_layout()
-            st.pyplot(fig_bo)
-            
-            # Save BO district map
-            map_images['bo_district'] = save_map_as_png(fig_bo, f"{left_district}_District_Map")
+        # Show the maps in shapefile order, whatever order they finished in
+        district_maps = {district: district_maps[district] for district in districts if district in district_maps}
+        for district, png in district_maps.items():
+            st.write(f"**{district} District - All Chiefdoms**")
+            st.image(png.getvalue())
             
             # Display chiefdoms list
-            if 'FIRST_CHIE' in bo_gdf.columns:
-                chiefdoms = bo_gdf['FIRST_CHIE'].dropna().tolist()
-                st.write(f"**Chiefdoms in {left_district} District ({len(chiefdoms)}):**")
+            chiefdoms = gdf.loc[gdf['FIRST_DNAM'] == district, 'FIRST_CHIE'].dropna().tolist()
+            with st.expander(f"Chiefdoms in {district} District ({len(chiefdoms)})"):
                 chiefdom_cols = st.columns(3)
                 for i, chiefdom in enumerate(chiefdoms):
                     with chiefdom_cols[i % 3]:
                         st.write(f"• {chiefdom}")
-        else:
-            st.warning(f"No chiefdoms found for {left_district} district in shapefile")
-        
-        st.divider()
-        
-        # BOMBALI DISTRICT MAP - Full width
-        st.write(f"**{right_district} District - All Chiefdoms**")
-        
-        # Filter shapefile for BOMBALI district
-        bombali_gdf = gdf[gdf['FIRST_DNAM'] == right_district].copy()
-        
-        if len(bombali_gdf) > 0:
-            # Filter data for BOMBALI district to get GPS coordinates
-            bombali_data = extracted_df[extracted_df["District"] == right_district].copy()
-            
-            # Create the BOMBALI district plot
-            fig_bombali, ax_bombali = plt.subplots(figsize=(14, 8))
-            
-            # Plot chiefdom boundaries in white with black edges
-            bombali_gdf.plot(ax=ax_bombali, color='white', edgecolor='black', alpha=0.8, linewidth=2)
-            
-            # Extract and plot GPS coordinates FIRST
-            coords_extracted = []
-            if len(bombali_data) > 0 and "GPS Location" in bombali_data.columns:
-                gps_data = bombali_data["GPS Location"].dropna()
-                
-                st.write(f"**Debug: Found {len(gps_data)} GPS entries for BOMBALI District**")
-                
-                for idx, gps_val in enumerate(gps_data):
-                    if pd.notna(gps_val):
-                        gps_str = str(gps_val).strip()
-                        st.write(f"GPS {idx+1}: {gps_str}")
-                        
-                        # Handle the specific format: 8.6103181,-12.2029534
-                        if ',' in gps_str:
-                            try:
-                                parts = gps_str.split(',')
-                                if len(parts) == 2:
-                                    lat = float(parts[0].strip())
-                                    lon = float(parts[1].strip())
-                                    
-                                    # Check if coordinates are in valid range for Sierra Leone
-                                    if 6.0 <= lat <= 11.0 and -14.0 <= lon <= -10.0:
-                                        coords_extracted.append([lat, lon])
-                                        st.write(f"✅ Valid coordinates: {lat}, {lon}")
-                                    else:
-                                        st.write(f"❌ Invalid coordinates (outside Sierra Leone): {lat}, {lon}")
-                            except ValueError as e:
-                                st.write(f"❌ Could not parse coordinates: {gps_str} - Error: {e}")
-                
-                st.write(f"**Total valid coordinates extracted: {len(coords_extracted)}**")
-            
-            # Plot GPS points on the shapefile
-            if coords_extracted:
-                lats, lons = zip(*coords_extracted)
-                
-                # Plot GPS points with high visibility
-                scatter = ax_bombali.scatter(
-                    lons, lats,
-                    c='red',
-                    s=150,
-                    alpha=1.0,
-                    edgecolors='white',
-                    linewidth=3,
-                    zorder=100,  # Very high z-order to ensure visibility
-                    label=f'Schools ({len(coords_extracted)})',
-                    marker='o'
-                )
-                
-                # Add text labels for each point
-                for i, (lat, lon) in enumerate(coords_extracted):
-                    ax_bombali.annotate(f'S{i+1}', 
-                                       (lon, lat),
-                                       xytext=(5, 5), 
-                                       textcoords='offset points',
-                                       fontsize=10,
-                                       fontweight='bold',
-                                       color='red',
-                                       bbox=dict(boxstyle='round,pad=0.2', facecolor='white', alpha=0.8))
-                
-                # Show coordinate range for verification
-                st.write(f"**Coordinate range:** Lat: {min(lats):.4f} to {max(lats):.4f}, Lon: {min(lons):.4f} to {max(lons):.4f}")
-                
-                # Set map extent to include all points with padding
-                margin = 0.05
-                ax_bombali.set_xlim(min(lons) - margin, max(lons) + margin)
-                ax_bombali.set_ylim(min(lats) - margin, max(lats) + margin)
-                
-            # Add chiefdom labels
-            for idx, row in bombali_gdf.iterrows():
-                if 'FIRST_CHIE' in row and pd.notna(row['FIRST_CHIE']):
-                    centroid = row.geometry.centroid
-                    ax_bombali.annotate(
-                        row['FIRST_CHIE'], 
-                        (centroid.x, centroid.y),
-                        xytext=(5, 5), 
-                        textcoords='offset points',
-                        fontsize=9,
-                        ha='left',
-                        bbox=dict(boxstyle='round,pad=0.3', facecolor='lightblue', alpha=0.7)
-                    )
-            
-            # Customize plot
-            title_text = f'{right_district} District - Chiefdoms: {len(bombali_gdf)}'
-            if coords_extracted:
-                title_text += f' | GPS Points: {len(coords_extracted)}'
-            ax_bombali.set_title(title_text, fontsize=16, fontweight='bold')
-            ax_bombali.set_xlabel('Longitude', fontsize=12)
-            ax_bombali.set_ylabel('Latitude', fontsize=12)
-            
-            # Add legend if GPS points exist
-            if coords_extracted:
-                ax_bombali.legend(fontsize=12, loc='best')
-            
-            # Add grid for reference
-            ax_bombali.grid(True, alpha=0.3, linestyle='--')
-            
-            plt.tight_layout()
-            st.pyplot(fig_bombali)
-            
-            # Save BOMBALI district map
-            map_images['bombali_district'] = save_map_as_png(fig_bombali, f"{right_district}_District_Map")
-            
-            # Display chiefdoms list
-            if 'FIRST_CHIE' in bombali_gdf.columns:
-                chiefdoms = bombali_gdf['FIRST_CHIE'].dropna().tolist()
-                st.write(f"**Chiefdoms in {right_district} District ({len(chiefdoms)}):**")
-                chiefdom_cols = st.columns(3)
-                for i, chiefdom in enumerate(chiefdoms):
-                    with chiefdom_cols[i % 3]:
-                        st.write(f"• {chiefdom}")
-        else:
-            st.warning(f"No chiefdoms found for {right_district} district in shapefile")
     else:
         st.error("Shapefile not loaded. Cannot display map.")
     
@@ -873,8 +472,9 @@ if uploaded_file:
         mime="text/csv"
     )
     
-    # Generate comprehensive summaries
-    summaries = generate_summaries(extracted_df)
+    # Generate comprehensive summaries (one rollup shared by the charts, tables and report)
+    sbd_rollup = SBDRollup(extracted_df)
+    summaries = sbd_rollup.summaries()
     
     # Display Overall Summary
     st.subheader("📊 Overall Summary")
@@ -964,39 +564,10 @@ if uploaded_file:
     # Enrollment and ITN Distribution Analysis
     st.subheader("📊 Enrollment and ITN Distribution Analysis")
     
-    # Calculate total enrollment and ITN distribution by district
-    district_analysis = []
-    
-    for district in extracted_df['District'].dropna().unique():
-        district_data = extracted_df[extracted_df['District'] == district]
-        
-        total_enrollment = 0
-        total_itn = 0
-        
-        # Sum enrollments and ITN by class
-        for class_num in range(1, 6):
-            boys_col = f"Number of boys in class {class_num}"
-            girls_col = f"Number of girls in class {class_num}"
-            itn_col = f"Number of ITN distributed to class {class_num}"
-            
-            if boys_col in district_data.columns:
-                total_enrollment += district_data[boys_col].fillna(0).sum()
-            if girls_col in district_data.columns:
-                total_enrollment += district_data[girls_col].fillna(0).sum()
-            if itn_col in district_data.columns:
-                total_itn += district_data[itn_col].fillna(0).sum()
-        
-        # Calculate coverage percentage
-        coverage = (total_itn / total_enrollment * 100) if total_enrollment > 0 else 0
-        
-        district_analysis.append({
-            'District': district,
-            'Total_Enrollment': total_enrollment,
-            'Total_ITN': total_itn,
-            'Coverage': coverage
-        })
-    
-    district_df = pd.DataFrame(district_analysis)
+    # Total enrollment and ITN distribution by district
+    district_df = sbd_rollup.table('district').rename(columns={
+        'district': 'District', 'enrollment': 'Total_Enrollment', 'itn': 'Total_ITN', 'coverage': 'Coverage'})
+    district_df = district_df[['District', 'Total_Enrollment', 'Total_ITN', 'Coverage']]
     
     # Create individual bar charts for district analysis
     
@@ -1105,49 +676,19 @@ if uploaded_file:
 # Chiefdoms Analysis by District
     st.subheader("📊 Chiefdoms Analysis by District")
     
-    # Get all unique districts that have chiefdom data
-    districts_with_chiefdoms = extracted_df[extracted_df['Chiefdom'].notna()]['District'].unique()
+    # Chiefdom totals from the shared rollup, grouped by district
+    chiefdom_table = sbd_rollup.table('chiefdom').rename(columns={
+        'chiefdom': 'Chiefdom', 'enrollment': 'Total_Enrollment', 'itn': 'Total_ITN', 'coverage': 'Coverage'})
+    chiefdom_table['Chiefdom'] = chiefdom_table['Chiefdom'].astype(str)
+    districts_with_chiefdoms = chiefdom_table['district'].unique()
     
     for district in districts_with_chiefdoms:
         st.write(f"### {district} District - Chiefdoms Analysis")
         
-        # Filter data for this district
-        district_data = extracted_df[extracted_df['District'] == district]
-        district_chiefdoms = district_data['Chiefdom'].dropna().unique()
+        district_chiefdom_df = chiefdom_table[chiefdom_table['district'] == district]
         
-        if len(district_chiefdoms) > 0:
-            # Calculate by chiefdom for this district
-            district_chiefdom_analysis = []
-            
-            for chiefdom in district_chiefdoms:
-                chiefdom_data = district_data[district_data['Chiefdom'] == chiefdom]
-                
-                total_enrollment = 0
-                total_itn = 0
-                
-                for class_num in range(1, 6):
-                    boys_col = f"Number of boys in class {class_num}"
-                    girls_col = f"Number of girls in class {class_num}"
-                    itn_col = f"Number of ITN distributed to class {class_num}"
-                    
-                    if boys_col in chiefdom_data.columns:
-                        total_enrollment += chiefdom_data[boys_col].fillna(0).sum()
-                    if girls_col in chiefdom_data.columns:
-                        total_enrollment += chiefdom_data[girls_col].fillna(0).sum()
-                    if itn_col in chiefdom_data.columns:
-                        total_itn += chiefdom_data[itn_col].fillna(0).sum()
-                
-                # Calculate coverage percentage
-                coverage = (total_itn / total_enrollment * 100) if total_enrollment > 0 else 0
-                
-                district_chiefdom_analysis.append({
-                    'Chiefdom': chiefdom,
-                    'Total_Enrollment': total_enrollment,
-                    'Total_ITN': total_itn,
-                    'Coverage': coverage
-                })
-            
-            district_chiefdom_df = pd.DataFrame(district_chiefdom_analysis)
+        if len(district_chiefdom_df) > 0:
+            district_chiefdom_df = district_chiefdom_df[['Chiefdom', 'Total_Enrollment', 'Total_ITN', 'Coverage']].reset_index(drop=True)
             district_chiefdom_df = district_chiefdom_df.sort_values('Total_Enrollment', ascending=False)
             
             if len(district_chiefdom_df) > 0:
@@ -1257,31 +798,8 @@ if uploaded_file:
     if district_summary_button:
         st.subheader("📈 Summary by District")
         
-        # Create aggregation dictionary
-        agg_dict = {}
-        
-        # Add enrollment columns to aggregation
-        for class_num in range(1, 6):
-            total_col = f"Number of enrollments in class {class_num}"
-            boys_col = f"Number of boys in class {class_num}"
-            girls_col = f"Number of girls in class {class_num}"
-            
-            if total_col in extracted_df.columns:
-                agg_dict[total_col] = "sum"
-            if boys_col in extracted_df.columns:
-                agg_dict[boys_col] = "sum"
-            if girls_col in extracted_df.columns:
-                agg_dict[girls_col] = "sum"
-        
-        # Group by District and aggregate
-        district_summary = extracted_df.groupby("District").agg(agg_dict).reset_index()
-        
-        # Calculate total enrollment
-        district_summary["Total Enrollment"] = 0
-        for class_num in range(1, 6):
-            total_col = f"Number of enrollments in class {class_num}"
-            if total_col in district_summary.columns:
-                district_summary["Total Enrollment"] += district_summary[total_col]
+        # Per-class enrollment totals from the shared rollup
+        district_summary = sbd_rollup.class_table('district').sort_values("District").reset_index(drop=True)
         
         # Display summary table
         st.dataframe(district_summary)
@@ -1309,31 +827,8 @@ if uploaded_file:
     if chiefdom_summary_button:
         st.subheader("📈 Summary by Chiefdom")
         
-        # Create aggregation dictionary
-        agg_dict = {}
-        
-        # Add enrollment columns to aggregation
-        for class_num in range(1, 6):
-            total_col = f"Number of enrollments in class {class_num}"
-            boys_col = f"Number of boys in class {class_num}"
-            girls_col = f"Number of girls in class {class_num}"
-            
-            if total_col in extracted_df.columns:
-                agg_dict[total_col] = "sum"
-            if boys_col in extracted_df.columns:
-                agg_dict[boys_col] = "sum"
-            if girls_col in extracted_df.columns:
-                agg_dict[girls_col] = "sum"
-        
-        # Group by District and Chiefdom and aggregate
-        chiefdom_summary = extracted_df.groupby(["District", "Chiefdom"]).agg(agg_dict).reset_index()
-        
-        # Calculate total enrollment
-        chiefdom_summary["Total Enrollment"] = 0
-        for class_num in range(1, 6):
-            total_col = f"Number of enrollments in class {class_num}"
-            if total_col in chiefdom_summary.columns:
-                chiefdom_summary["Total Enrollment"] += chiefdom_summary[total_col]
+        # Per-class enrollment totals from the shared rollup
+        chiefdom_summary = sbd_rollup.class_table('chiefdom').sort_values(["District", "Chiefdom"]).reset_index(drop=True)
         
         # Display summary table
         st.dataframe(chiefdom_summary)
@@ -1348,7 +843,7 @@ if uploaded_file:
         )
         
         # Create a temporary label for the chart
-        chiefdom_summary['Label'] = chiefdom_summary['District'] + '\n' + chiefdom_summary['Chiefdom']
+        chiefdom_summary['Label'] = chiefdom_summary['District'].astype(str) + '\n' + chiefdom_summary['Chiefdom'].astype(str)
         
         # Create a bar chart for chiefdom summary
         fig, ax = plt.subplots(figsize=(14, 10))
@@ -1394,7 +889,7 @@ if uploaded_file:
                 agg_dict[girls_col] = "sum"
         
         # Group by the selected hierarchical columns
-        grouped_data = filtered_df.groupby(group_columns).agg(agg_dict).reset_index()
+        grouped_data = filtered_df.groupby(group_columns, observed=True).agg(agg_dict).reset_index()
         
         # Calculate total enrollment
         grouped_data["Total Enrollment"] = 0
@@ -1557,27 +1052,16 @@ if uploaded_file:
                 chart_run.add_picture(map_images['sierra_leone_overall'], width=Inches(6.5))
                 doc.add_paragraph()  # Add spacing
             
-            # Add BO District map
-            if 'bo_district' in map_images:
-                doc.add_heading('BO District Map', level=2)
-                doc.add_paragraph("Geographic distribution of schools and chiefdoms in BO District:")
-                chart_para = doc.add_paragraph()
-                chart_para.alignment = WD_ALIGN_PARAGRAPH.CENTER
-                chart_run = chart_para.add_run()
-                map_images['bo_district'].seek(0)
-                chart_run.add_picture(map_images['bo_district'], width=Inches(6))
-                doc.add_paragraph()  # Add spacing after BO map
-            
-            # Add BOMBALI District map
-            if 'bombali_district' in map_images:
-                doc.add_heading('BOMBALI District Map', level=2)
-                doc.add_paragraph("Geographic distribution of schools and chiefdoms in BOMBALI District:")
+            # Add the map of every district
+            for district, district_map in district_maps.items():
+                doc.add_heading(f'{district} District Map', level=2)
+                doc.add_paragraph(f"Geographic distribution of schools and chiefdoms in {district} District:")
                 chart_para = doc.add_paragraph()
                 chart_para.alignment = WD_ALIGN_PARAGRAPH.CENTER
                 chart_run = chart_para.add_run()
-                map_images['bombali_district'].seek(0)
-                chart_run.add_picture(map_images['bombali_district'], width=Inches(6))
-                doc.add_paragraph()  # Add spacing after BOMBALI map
+                district_map.seek(0)
+                chart_run.add_picture(district_map, width=Inches(6))
+                doc.add_paragraph()  # Add spacing after the district map
             
             # Add page break before charts
             doc.add_page_break()
@@ -1943,7 +1427,8 @@ if uploaded_file:
     
     # Display map files saved notification
     if map_images:
-        st.success(f"✅ **Maps Saved**: {len(map_images)} visualization maps have been saved as PNG files")
+        st.success(f"✅ **Maps Saved**: {len(map_images)} visualization maps have been saved as PNG files "
+                   f"(the {len(district_maps)} district maps are in the ZIP download)")
         
         # Show list of saved maps
         with st.expander("📁 View Saved Map Files"):
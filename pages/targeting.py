@@ -3,15 +3,14 @@ import pandas as pd
 import numpy as np
 import base64
 from io import BytesIO
+from snt.cache import read_uploaded_file
 
 st.set_page_config(page_title="Multi-Dataset Merger", layout="wide")
 
 def read_file(file):
     """Read uploaded file into a dataframe."""
-    if file.name.endswith('.csv'):
-        return pd.read_csv(file)
-    elif file.name.endswith(('.xlsx', '.xls')):
-        return pd.read_excel(file)
+    if file.name.endswith(('.csv', '.xlsx', '.xls')):
+        return read_uploaded_file(file)
     else:
         st.error(f"Unsupported file format: {file.name}")
         return None
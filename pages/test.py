@@ -3,6 +3,8 @@ import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
 from io import BytesIO
+from snt.cache import read_uploaded_file
+from snt.activity import activity_for_file
 
 class HealthFacilityProcessor:
     def __init__(self):
@@ -10,33 +12,23 @@ class HealthFacilityProcessor:
     
     def load_data(self, uploaded_file):
         try:
-            self.df = pd.read_csv(uploaded_file)
+            self.df = read_uploaded_file(uploaded_file)
             st.success("Data successfully loaded!")
             return True
         except Exception as e:
             st.error(f"Error loading file: {str(e)}")
             return False
     
-    def process_data(self):
-        # Calculate report column
-        self.df['report'] = (self.df[['allout', 'susp', 'test', 'conf', 'maltreat']] > 0).sum(axis=1, min_count=1)
-        
-        # Create date column and calculate first month reported
-        self.df['month'] = self.df['month'].astype(int).astype(str).str.zfill(2)
-        self.df['year'] = self.df['year'].astype(int).astype(str)
-        self.df['date'] = pd.to_datetime(self.df['year'] + '-' + self.df['month'], format='%Y-%m')
-        
-        # Calculate first month reported
-        report_positive = self.df[self.df['report'] > 0]
-        first_months = report_positive.groupby('hf_uid')['date'].min()
+    def process_data(self, uploaded_file):
+        # Facility-level activity, computed once per uploaded file
+        activity = activity_for_file(uploaded_file)
+        first_months = activity.facilities.set_index('hf_uid')['first_month_reported'].dt.strftime('%Y-%m')
         self.df['First_month_hf_reported'] = self.df['hf_uid'].map(first_months)
         
-        # Split active and inactive
-        active_df = self.df[self.df['First_month_hf_reported'].notna()]
-        inactive_df = self.df[self.df['First_month_hf_reported'].isna()]
-        
-        return (active_df['hf_uid'].nunique(), inactive_df['hf_uid'].nunique(), 
-                active_df, inactive_df, self.df)
+        # Row split only for the Excel downloads
+        active = activity.row_mask(self.df)
+        return (activity.active_count, activity.inactive_count,
+                self.df[active], self.df[~active], self.df)
     
     def plot_overall_distribution(self, active_count, inactive_count):
         fig, ax = plt.subplots(figsize=(8, 6))
@@ -90,7 +82,7 @@ def main():
         if processor.load_data(uploaded_file):
             with st.spinner("Processing data..."):
                 try:
-                    active_count, inactive_count, active_df, inactive_df, full_df = processor.process_data()
+                    active_count, inactive_count, active_df, inactive_df, full_df = processor.process_data(uploaded_file)
                     
                     # Display metrics
                     col1, col2 = st.columns(2)
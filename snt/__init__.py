@@ -0,0 +1,6 @@
+"""Shared data processing for the SNT routine malaria pages.
+
+The Streamlit pages under ``pages/`` keep their UI code and delegate the
+actual data work to the modules in this package, so the same functions can
+be chained headlessly by :mod:`snt.pipeline`.
+"""
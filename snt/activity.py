@@ -0,0 +1,113 @@
+"""Active/inactive health facility classification.
+
+A facility is active once it has reported: its first month with any of
+``ACTIVITY_VARIABLES`` above zero. Inactive facilities never reported.
+:class:`FacilityActivity` reduces the monthly rows once to one row per
+facility (first and last reporting month, active flag, admin names) and
+answers the questions of the activity pages from that small table:
+active/inactive counts overall or per adm1/adm2/adm3, and the number of
+facilities active in each month.
+
+:func:`activity_for_file` keeps the result per file content (see
+:func:`snt.cache.derived_from_upload`), so every activity page reading the
+same dataset shares one computation.
+"""
+import numpy as np
+import pandas as pd
+
+from snt.cache import derived_from_upload
+from snt.imputation import reported_values
+from snt.periods import periods_from_ordinals, row_ordinals
+
+ACTIVITY_VARIABLES = ['allout', 'susp', 'test', 'conf', 'maltreat']
+ADMIN_LEVELS = ['adm1', 'adm2', 'adm3']
+STATUSES = ['Active', 'Inactive']
+
+NAT = np.iinfo('int64').min
+
+
+class FacilityActivity:
+    """First/last reporting month and active status of every ``hf_uid``."""
+
+    def __init__(self, df, columns=ACTIVITY_VARIABLES):
+        df = df.dropna(subset=['hf_uid'])
+        values = reported_values(df, columns)
+        reported = (values > 0).any(axis=1)
+
+        codes, facilities = pd.factorize(df['hf_uid'], sort=True)
+        ordinals = row_ordinals(df)
+        n = len(facilities)
+        first = np.full(n, np.iinfo('int64').max)
+        last = np.full(n, NAT)
+        np.minimum.at(first, codes[reported], ordinals[reported])
+        np.maximum.at(last, codes[reported], ordinals[reported])
+        active = first != np.iinfo('int64').max
+
+        self.start = int(ordinals.min()) if len(ordinals) else 0
+        self.end = int(ordinals.max()) if len(ordinals) else -1
+        # The smallest int64 is NaT in a PeriodArray
+        self.facilities = pd.DataFrame({
+            'hf_uid': facilities,
+            'first_month_reported': periods_from_ordinals(np.where(active, first, NAT)),
+            'last_month_reported': periods_from_ordinals(np.where(active, last, NAT)),
+            'active': active,
+        })
+        self._first = np.where(active, first, -1)
+
+        # Admin areas a facility appears in (normally exactly one)
+        levels = [level for level in ADMIN_LEVELS if level in df.columns]
+        self.levels = levels
+        self.areas = (pd.DataFrame({'facility': codes, **{level: df[level].to_numpy() for level in levels}})
+                      .drop_duplicates(ignore_index=True))
+
+    @property
+    def active_count(self):
+        return int(self.facilities['active'].sum())
+
+    @property
+    def inactive_count(self):
+        return len(self.facilities) - self.active_count
+
+    def row_mask(self, df, active=True):
+        """Rows of ``df`` that belong to active (or inactive) facilities."""
+        active_ids = self.facilities.loc[self.facilities['active'], 'hf_uid']
+        return df['hf_uid'].isin(active_ids).to_numpy() == active
+
+    def counts(self, level=None, within=None, value=None):
+        """Active, inactive and total facilities, overall or per ``level`` area.
+
+        ``within``/``value`` (e.g. ``'adm1', 'Bo'``) restrict the areas to
+        one higher-level area. Returns a DataFrame indexed by area, sorted.
+        """
+        if level is None:
+            active = self.active_count
+            return pd.DataFrame({'Active': [active], 'Inactive': [self.inactive_count],
+                                 'Total': [len(self.facilities)]}, index=['Total'])
+        if level not in self.levels:
+            raise KeyError(f"Column '{level}' not found for the facility activity")
+
+        areas = self.areas
+        if within is not None:
+            areas = areas[areas[within] == value]
+        pairs = areas[[level, 'facility']].drop_duplicates()
+        active = self.facilities['active'].to_numpy()[pairs['facility'].to_numpy()]
+        table = (pd.DataFrame({level: pairs[level].to_numpy(), 'Active': active})
+                 .groupby(level)['Active'].agg(['sum', 'size']))
+        table.columns = ['Active', 'Total']
+        table.insert(1, 'Inactive', table['Total'] - table['Active'])
+        return table.sort_index()
+
+    def active_by_period(self):
+        """Number of facilities active (reported at least once so far) in each month."""
+        n_months = self.end - self.start + 1
+        if n_months <= 0:
+            return pd.Series(dtype='int64', name='active')
+        first = self._first[self._first >= 0] - self.start
+        active = np.cumsum(np.bincount(first, minlength=n_months))
+        index = pd.PeriodIndex(periods_from_ordinals(np.arange(self.start, self.end + 1)), name='period')
+        return pd.Series(active, index=index, name='active')
+
+
+def activity_for_file(file):
+    """:class:`FacilityActivity` of a dataset file or upload, computed once per content."""
+    return derived_from_upload(file, 'facility_activity', FacilityActivity)
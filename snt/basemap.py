@@ -0,0 +1,297 @@
+"""Cached boundary layers for the static maps.
+
+The map pages used to read ``Chiefdom 2021.shp``, dissolve the chiefdoms
+into districts, place labels with ``iterrows`` and convert every polygon to
+a matplotlib patch with ``GeoDataFrame.plot`` on each Streamlit rerun,
+before drawing any of their own points. Here the shapefile is read once
+(:func:`load_boundaries`), with the district dissolve and the label points
+computed once and vectorized.
+
+:func:`base_map` returns a :class:`BaseMap`: the boundary layers of an area
+(the country, a district or one chiefdom) in one style. The layers are kept
+as matplotlib paths simplified to the pixel size they are drawn at, so a
+preview and a 300 dpi export of the same figure each draw about as many
+vertices as they have pixels along the borders; the simplified paths are
+built once per level of detail (pixel sizes are rounded down to powers of
+two) and shared by every style and area. :meth:`BaseMap.draw` adds one
+collection per layer and the labels to an axes, and the page only draws its
+own points on top.
+
+A style maps layer names to matplotlib keyword arguments, drawn in order:
+
+* ``chiefdoms`` - chiefdom polygons (collection arguments such as
+  ``color``, ``edgecolor``, ``linewidth``, ``alpha``; ``column`` and
+  ``cmap`` colour them by a shapefile column, as ``GeoDataFrame.plot``).
+* ``boundaries`` - chiefdom outlines only (``color``, ``linewidth``).
+* ``districts`` - district polygons dissolved from the chiefdoms.
+* ``district_labels`` / ``chiefdom_labels`` - names at the centroids
+  (``Axes.annotate`` arguments).
+
+``STYLES`` has the named styles of the pages; widgets that change colours
+pass their own dict. The last ``MAX_BASEMAPS`` base maps are kept in memory.
+"""
+import json
+import logging
+import os
+import threading
+import warnings
+from collections import OrderedDict
+
+import matplotlib
+import numpy as np
+import pandas as pd
+from matplotlib.collections import PathCollection
+from matplotlib.path import Path
+
+logger = logging.getLogger(__name__)
+
+SHAPEFILE = 'Chiefdom 2021.shp'
+DISTRICT_FIELD = 'FIRST_DNAM'
+CHIEFDOM_FIELD = 'FIRST_CHIE'
+
+MAX_BASEMAPS = 64
+
+POLYGON_LAYERS = ['chiefdoms', 'boundaries', 'districts']
+LABEL_LAYERS = ['district_labels', 'chiefdom_labels']
+
+STYLES = {
+    # sbdd.py, country overview
+    'sbd_overview': {
+        'chiefdoms': {'color': 'white', 'edgecolor': 'gray', 'alpha': 0.8, 'linewidth': 0.5},
+        'districts': {'facecolor': 'none', 'edgecolor': 'black', 'linewidth': 3, 'alpha': 1.0},
+        'district_labels': {'fontsize': 12, 'fontweight': 'bold', 'ha': 'center', 'va': 'center',
+                            'color': 'black',
+                            'bbox': {'boxstyle': 'round,pad=0.3', 'facecolor': 'white', 'alpha': 0.8,
+                                     'edgecolor': 'black'}},
+    },
+    # sbdd.py, one district with its chiefdoms
+    'sbd_district': {
+        'chiefdoms': {'color': 'white', 'edgecolor': 'black', 'alpha': 0.8, 'linewidth': 2},
+        'chiefdom_labels': {'xytext': [5, 5], 'textcoords': 'offset points', 'fontsize': 9, 'ha': 'left',
+                            'bbox': {'boxstyle': 'round,pad=0.3', 'facecolor': 'lightblue', 'alpha': 0.7}},
+    },
+    # chw_hf.py, one chiefdom per panel
+    'chiefdom_panel': {
+        'boundaries': {'color': 'black', 'linewidth': 1},
+        'chiefdoms': {'color': 'lightgray', 'alpha': 0.3},
+    },
+    # chw_hf.py, districts in distinct colours
+    'district_summary': {
+        'chiefdoms': {'column': DISTRICT_FIELD, 'cmap': 'Set3', 'alpha': 0.6, 'edgecolor': 'black',
+                      'linewidth': 0.5},
+        'district_labels': {'fontsize': 8, 'ha': 'center', 'va': 'center', 'fontweight': 'bold'},
+    },
+}
+
+_boundaries = {}
+_basemaps = OrderedDict()
+_lock = threading.Lock()
+
+
+def geometry_path(geometry):
+    """One compound path with every ring of a (multi)polygon."""
+    rings = []
+    for polygon in getattr(geometry, 'geoms', [geometry]):
+        if polygon.is_empty:
+            continue
+        rings.append(Path(np.asarray(polygon.exterior.coords)[:, :2]))
+        rings += [Path(np.asarray(ring.coords)[:, :2]) for ring in polygon.interiors]
+    return Path.make_compound_path(*rings) if rings else Path(np.empty((0, 2)))
+
+
+def detail_level(pixel_size):
+    """Power-of-two exponent of the simplification tolerance for ``pixel_size`` map units."""
+    return int(np.floor(np.log2(pixel_size / 2)))
+
+
+class Boundaries:
+    """Chiefdom polygons with their district dissolve, label points and paths.
+
+    A shapefile without CRS is taken to be in longitude/latitude.
+    """
+
+    def __init__(self, chiefdoms, key=None):
+        # Identifies the file version in the base map cache, see load_boundaries()
+        self.key = key
+        if chiefdoms.crs is None:
+            chiefdoms = chiefdoms.set_crs(epsg=4326)
+        self.chiefdoms = chiefdoms
+        self.districts = chiefdoms[[DISTRICT_FIELD, 'geometry']].dissolve(by=DISTRICT_FIELD)
+        with warnings.catch_warnings():
+            # Centroids in degrees are fine for placing labels
+            warnings.simplefilter('ignore', UserWarning)
+            self.chiefdom_points = chiefdoms.geometry.centroid
+            self.district_points = self.districts.geometry.centroid
+        # (layer geometries, detail level) -> paths
+        self._paths = {}
+        self._lock = threading.Lock()
+
+    def area(self, district=None, chiefdom=None):
+        """Row mask of the chiefdoms of ``district`` (and ``chiefdom``)."""
+        mask = np.ones(len(self.chiefdoms), dtype=bool)
+        if district is not None:
+            mask &= (self.chiefdoms[DISTRICT_FIELD] == district).to_numpy()
+        if chiefdom is not None:
+            mask &= (self.chiefdoms[CHIEFDOM_FIELD] == chiefdom).to_numpy()
+        if not mask.any():
+            raise KeyError(f"No chiefdoms found for district={district!r}, chiefdom={chiefdom!r}")
+        return mask
+
+    def paths(self, geometries, level):
+        """Paths of every chiefdom or district (``geometries``) simplified to ``2 ** level``."""
+        import shapely
+
+        key = (geometries, level)
+        with self._lock:
+            if key not in self._paths:
+                source = self.chiefdoms if geometries == 'chiefdoms' else self.districts
+                simplified = shapely.simplify(np.asarray(source.geometry.values), 2.0 ** level,
+                                              preserve_topology=True)
+                self._paths[key] = np.array([geometry_path(geometry) for geometry in simplified], dtype=object)
+                logger.debug("Built %s paths at detail level %d", geometries, level)
+            return self._paths[key]
+
+
+def load_boundaries(path=SHAPEFILE):
+    """:class:`Boundaries` of a shapefile, read once per file version."""
+    import geopandas as gpd
+
+    stat = os.stat(path)
+    key = (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+    with _lock:
+        if key not in _boundaries:
+            _boundaries.clear()
+            _boundaries[key] = Boundaries(gpd.read_file(path), key)
+        return _boundaries[key]
+
+
+def geographic_aspect(bounds):
+    """Aspect geopandas uses for longitude/latitude data: 1 / cos(middle latitude)."""
+    aspect = 1 / np.cos(np.radians((bounds[1] + bounds[3]) / 2))
+    return aspect if np.isfinite(aspect) and aspect > 0 else 1.0
+
+
+class BaseMap:
+    """Boundary layers and labels of one area in one style."""
+
+    def __init__(self, boundaries, style, district=None, chiefdom=None, pad=0.0, aspect=None):
+        unknown = [layer for layer in style if layer not in POLYGON_LAYERS + LABEL_LAYERS]
+        if unknown:
+            raise ValueError(f"Unknown map layers {unknown}, expected {POLYGON_LAYERS + LABEL_LAYERS}")
+        self.boundaries = boundaries
+        self.style = style
+        self.district = district
+        self.mask = boundaries.area(district, chiefdom)
+        self.district_mask = (boundaries.districts.index == district if district is not None
+                              else np.ones(len(boundaries.districts), dtype=bool))
+
+        x0, y0, x1, y1 = boundaries.chiefdoms[self.mask].total_bounds
+        self.extent = (x0 - pad, x1 + pad, y0 - pad, y1 + pad)
+        self.aspect = geographic_aspect((x0, y0, x1, y1)) if aspect is None else aspect
+        self.labels = self._labels()
+
+    def _labels(self):
+        """(text, (x, y), annotate kwargs) of the label layers."""
+        labels = []
+        for layer, kwargs in self.style.items():
+            if layer == 'chiefdom_labels':
+                names = self.boundaries.chiefdoms[CHIEFDOM_FIELD][self.mask]
+                points = self.boundaries.chiefdom_points[self.mask]
+            elif layer == 'district_labels':
+                names = self.boundaries.districts.index[self.district_mask]
+                points = self.boundaries.district_points[self.district_mask]
+            else:
+                continue
+            labels += [(name, (x, y), kwargs) for name, x, y in zip(names, points.x, points.y) if pd.notna(name)]
+        return labels
+
+    def paths(self, layer, level):
+        """Paths of the area's shapes of ``layer`` at a detail level."""
+        if layer == 'districts':
+            return list(self.boundaries.paths('districts', level)[self.district_mask])
+        return list(self.boundaries.paths('chiefdoms', level)[self.mask])
+
+    def _properties(self, layer, kwargs):
+        """Collection keyword arguments of a layer's style."""
+        props = dict(kwargs)
+        column = props.pop('column', None)
+        cmap = props.pop('cmap', None)
+        if layer == 'boundaries':
+            return {'facecolor': 'none', 'edgecolor': props.pop('color', props.pop('edgecolor', 'black')), **props}
+        if column is not None:
+            source = self.boundaries.districts.reset_index() if layer == 'districts' else self.boundaries.chiefdoms
+            mask = self.district_mask if layer == 'districts' else self.mask
+            # Categories over the whole shapefile, so an area keeps its colour on every map
+            codes, uniques = pd.factorize(source[column], sort=True)
+            colors = matplotlib.colormaps[cmap or 'viridis'](np.linspace(0, 1, len(uniques)))
+            props['facecolor'] = colors[codes[mask]]
+        return props
+
+    def draw(self, ax, limits=True):
+        """Add the layers and labels of the map to ``ax``.
+
+        Sets the axes aspect and, with ``limits``, the limits to the map's
+        extent (otherwise the axes autoscale around the map and whatever is
+        already on them).
+        """
+        for layer, kwargs in self.style.items():
+            if layer in POLYGON_LAYERS:
+                ax.add_collection(BaseMapCollection(self, layer, ax, **self._properties(layer, kwargs)),
+                                  autolim=not limits)
+        ax.set_aspect(self.aspect)
+        if limits:
+            ax.set_xlim(self.extent[0], self.extent[1])
+            ax.set_ylim(self.extent[2], self.extent[3])
+        else:
+            ax.autoscale_view()
+        for text, xy, kwargs in self.labels:
+            ax.annotate(text, xy, **kwargs)
+
+
+class BaseMapCollection(PathCollection):
+    """Paths of a base map layer, simplified to the pixel size of the axes when drawn."""
+
+    def __init__(self, basemap, layer, ax, **kwargs):
+        self.basemap = basemap
+        self.layer = layer
+        x0, x1, y0, y1 = basemap.extent
+        super().__init__(basemap.paths(layer, self._level(ax, (x0, x1), (y0, y1))), **kwargs)
+
+    @staticmethod
+    def _level(ax, xlim, ylim):
+        """Detail level of the pixel size of ``ax`` showing ``xlim`` x ``ylim``."""
+        bbox = ax.bbox
+        if bbox.width <= 0 or bbox.height <= 0:
+            return detail_level(1e-9)
+        return detail_level(min(abs(xlim[1] - xlim[0]) / bbox.width, abs(ylim[1] - ylim[0]) / bbox.height))
+
+    def draw(self, renderer):
+        # The axes limits and size (and the renderer's dpi) are final here
+        self.set_paths(self.basemap.paths(self.layer, self._level(self.axes, self.axes.get_xlim(),
+                                                                   self.axes.get_ylim())))
+        super().draw(renderer)
+
+
+def base_map(style, district=None, chiefdom=None, pad=0.0, aspect=None, path=SHAPEFILE):
+    """Cached :class:`BaseMap` of ``style`` (a ``STYLES`` name or a layer dict).
+
+    ``district`` and ``chiefdom`` restrict the map to one area; ``pad`` widens
+    its extent, in map units; ``aspect`` defaults to the geographic aspect of
+    the area.
+    """
+    if isinstance(style, str):
+        if style not in STYLES:
+            raise KeyError(f"Unknown map style '{style}', expected one of {list(STYLES)}")
+        style = STYLES[style]
+    boundaries = load_boundaries(path)
+    key = (boundaries.key, json.dumps(style), district, chiefdom, pad, aspect)
+    with _lock:
+        if key in _basemaps:
+            _basemaps.move_to_end(key)
+            return _basemaps[key]
+    basemap = BaseMap(boundaries, style, district, chiefdom, pad, aspect)
+    with _lock:
+        _basemaps[key] = basemap
+        while len(_basemaps) > MAX_BASEMAPS:
+            _basemaps.popitem(last=False)
+    return basemap
@@ -0,0 +1,160 @@
+"""Content-addressed Parquet cache for uploaded spreadsheets.
+
+Streamlit re-runs a page on every widget interaction, and each rerun used to
+parse the uploaded workbook again. :func:`read_uploaded_file` hashes the
+uploaded bytes, stores the parsed frame as Parquet under that hash and serves
+later reads (same page or any other page given the same file) from it. The
+cache directory is trimmed least-recently-used first once it grows past
+``SNT_CACHE_MAX_MB``.
+
+State that must outlive the cache (the facility registry, the outlier
+stores, the rollup) lives under ``PIPELINE_DIR`` instead, and is written
+under a :func:`file_lock`.
+"""
+import contextlib
+import hashlib
+import logging
+import os
+import tempfile
+from collections import OrderedDict
+
+import pandas as pd
+import pyarrow.parquet as pq
+
+from snt.ingest import file_name, to_arrow_table
+
+logger = logging.getLogger(__name__)
+
+CACHE_DIR = os.environ.get('SNT_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'snt_cache'))
+CACHE_MAX_BYTES = int(os.environ.get('SNT_CACHE_MAX_MB', '2048')) * 1024 * 1024
+# Persistent outputs and state of the pipeline and the pages
+PIPELINE_DIR = os.environ.get('SNT_PIPELINE_DIR', 'snt_pipeline')
+
+# Objects kept in memory by derived_from_upload()
+MAX_DERIVED = 8
+
+_derived = OrderedDict()
+
+
+@contextlib.contextmanager
+def file_lock(path):
+    """Exclusive lock on the file ``path`` (created if missing) across processes."""
+    with open(path, 'a+b') as f:
+        try:
+            import fcntl
+        except ImportError:
+            # Windows
+            import msvcrt
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+            try:
+                yield
+            finally:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def file_bytes(file):
+    if hasattr(file, 'getvalue'):
+        return file.getvalue()
+    with open(file, 'rb') as f:
+        return f.read()
+
+
+def content_key(data, name, read_kwargs):
+    """Hash of the file bytes, its extension and the reader options."""
+    digest = hashlib.blake2b(data, digest_size=20)
+    digest.update(name.split('.')[-1].lower().encode())
+    digest.update(repr(sorted(read_kwargs.items())).encode())
+    return digest.hexdigest()
+
+
+def parse_spreadsheet(file, **read_kwargs):
+    """``pd.read_csv`` or ``pd.read_excel`` depending on the file extension."""
+    name = file_name(file)
+    if name.lower().endswith('.csv'):
+        return pd.read_csv(file, **read_kwargs)
+    if name.lower().endswith(('.xlsx', '.xls')):
+        return pd.read_excel(file, **read_kwargs)
+    raise ValueError(f"Unsupported file type: {name.split('.')[-1]}")
+
+
+def evict(cache_dir=CACHE_DIR, max_bytes=CACHE_MAX_BYTES):
+    """Delete the least recently used entries until the cache fits ``max_bytes``."""
+    entries = []
+    for entry in os.scandir(cache_dir):
+        if entry.name.endswith('.parquet'):
+            stat = entry.stat()
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+
+
+def read_uploaded_file(file, cache_dir=CACHE_DIR, **read_kwargs):
+    """Read an uploaded CSV/Excel file, reusing the Parquet copy of the same bytes.
+
+    ``read_kwargs`` go to the pandas reader and are part of the cache key.
+    Columns mixing numbers and text are stored (and returned) as text.
+    """
+    data = file_bytes(file)
+    key = content_key(data, file_name(file), read_kwargs)
+    path = os.path.join(cache_dir, f'{key}.parquet')
+
+    if os.path.exists(path):
+        try:
+            df = pd.read_parquet(path)
+            os.utime(path)
+            return df
+        except Exception as e:
+            logger.warning("Discarding unreadable cache entry %s: %s", path, e)
+            os.remove(path)
+
+    if hasattr(file, 'seek'):
+        file.seek(0)
+    df = parse_spreadsheet(file, **read_kwargs)
+
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        table = to_arrow_table(df)
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        pq.write_table(table, tmp_path)
+        os.replace(tmp_path, path)
+        evict(cache_dir)
+        df = table.to_pandas()
+    except Exception as e:
+        # The cache is only an accelerator, never a reason to fail a page
+        logger.warning("Could not cache %s: %s", file_name(file), e)
+    return df
+
+
+def derived_from_upload(file, name, build):
+    """``build(df)`` of an uploaded file, built once per file content.
+
+    For indexes and summaries the pages would otherwise rebuild on every
+    rerun; the last ``MAX_DERIVED`` results are kept in memory, keyed by the
+    content hash and ``name``.
+    """
+    key = (content_key(file_bytes(file), file_name(file), {}), name)
+    if key in _derived:
+        _derived.move_to_end(key)
+        return _derived[key]
+
+    result = build(read_uploaded_file(file))
+    _derived[key] = result
+    while len(_derived) > MAX_DERIVED:
+        _derived.popitem(last=False)
+    return result
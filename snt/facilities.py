@@ -0,0 +1,182 @@
+"""Column renaming and facility identifiers for the routine data (page 05)."""
+import hashlib
+import os
+
+import pandas as pd
+
+from snt.cache import PIPELINE_DIR, file_lock
+
+FACILITY_KEY_COLUMNS = ['adm1', 'adm2', 'adm3', 'hf']
+REGISTRY_COLUMNS = ['facility_key', 'hf_uid'] + FACILITY_KEY_COLUMNS + ['first_registered']
+REGISTRY_PATH = os.environ.get('SNT_FACILITY_REGISTRY', os.path.join(PIPELINE_DIR, 'facility_registry.csv'))
+
+ORGUNIT_RENAME = {
+    'orgunitlevel1': 'adm0',
+    'orgunitlevel2': 'adm1',
+    'orgunitlevel3': 'adm2',
+    'orgunitlevel4': 'adm3',
+    'organisationunitname': 'hf'
+}
+
+COLUMN_RENAME = {
+    "OPD (New and follow-up curative) 0-59m": "allout_u5",
+    "OPD (New and follow-up curative) 05+y": "allout_ov5",
+    "Admission - Child with malaria 0-59 months": "maladm_u5",
+    "Admission - Child with malaria 5-14 years": "maladm_5_14",
+    "Admission - Malaria 15+ years": "maladm_ov15",
+
+    "Child death - Malaria 01-59m": "maldth_1_59m",
+    "Child death - Malaria 05-09y": "maldth_5_9",
+    "Child death - Malaria 10-14y": "maldth_10_14",
+
+    "Death malaria 15+ years Female": "maldth_fem_ov15",
+    "Death malaria 15+ years Male": "maldth_mal_ov15",
+
+    "Separation - Child with malaria 0-59 months Death": "maldth_u5",
+    "Separation - Child with malaria 5-14 years Death": "maldth_5_14",
+    "Separation - Malaria 15+ years Death": "maldth_ov15",
+    "Fever case - suspected Malaria 0-59m": "susp_u5_hf",
+    "Fever case - suspected Malaria 05-14y": "susp_5_14_hf",
+    "Fever case - suspected Malaria 15+y": "susp_ov15_hf",
+    "Fever case (suspected malaria) in HTR and ETR 02-59m": "susp_u5_com",
+    "Fever case (suspected malaria) in HTR and ETR 05-14y": "susp_5_14_com",
+    "Fever case (suspected malaria) in HTR and ETR 15+y": "susp_ov15_com",
+    "Fever case tested for Malaria (RDT) in HTR - Negative 02-59m": "tes_neg_rdt_u5_com",
+    "Fever case tested for Malaria (RDT) in HTR - Positive 02-59m": "tes_pos_rdt_u5_com",
+    "Fever case tested for Malaria (RDT) in HTR - Negative 05-14y": "tes_neg_rdt_5_14_com",
+    "Fever case tested for Malaria (RDT) in HTR - Positive 05-14y": "tes_pos_rdt_5_14_com",
+    "Fever case tested for Malaria (RDT) in HTR - Negative 15+y": "tes_neg_rdt_ov15_com",
+    "Fever case tested for Malaria (RDT) in HTR - Positive 15+y": "tes_pos_rdt_ov15_com",
+    "Fever case tested for Malaria (Microscopy) - Negative 0-59m": "test_neg_mic_u5_hf",
+    "Fever case tested for Malaria (Microscopy) - Positive 0-59m": "test_pos_mic_u5_hf",
+    "Fever case tested for Malaria (Microscopy) - Negative 05-14y": "test_neg_mic_5_14_hf",
+    "Fever case tested for Malaria (Microscopy) - Positive 05-14y": "test_pos_mic_5_14_hf",
+    "Fever case tested for Malaria (Microscopy) - Negative 15+y": "test_neg_mic_ov15_hf",
+    "Fever case tested for Malaria (Microscopy) - Positive 15+y": "test_pos_mic_ov15_hf",
+    "Fever case tested for Malaria (RDT) - Negative 0-59m": "tes_neg_rdt_u5_hf",
+    "Fever case tested for Malaria (RDT) - Positive 0-59m": "tes_pos_rdt_u5_hf",
+    "Fever case tested for Malaria (RDT) - Negative 05-14y": "tes_neg_rdt_5_14_hf",
+    "Fever case tested for Malaria (RDT) - Positive 05-14y": "tes_pos_rdt_5_14_hf",
+    "Fever case tested for Malaria (RDT) - Negative 15+y": "tes_neg_rdt_ov15_hf",
+    "Fever case tested for Malaria (RDT) - Positive 15+y": "tes_pos_rdt_ov15_hf",
+    "Malaria treated with ACT in HTR <24 hours 02-59m": "maltreat_u24_u5_com",
+    "Malaria treated with ACT in HTR >24 hours 02-59m": "maltreat_ov24_u5_com",
+    "Malaria treated with ACT in HTR <24 hours 05-14y": "maltreat_u24_5_14_com",
+    "Malaria treated with ACT in HTR >24 hours 05-14y": "maltreat_ov24_5_14_com",
+    "Malaria treated with ACT in HTR <24 hours 15+y": "maltreat_u24_ov15_com",
+    "Malaria treated with ACT in HTR >24 hours 15+y": "maltreat_ov24_ov15_com",
+    "Malaria treated with ACT <24 hours 0-59m": "maltreat_u24_u5_hf",
+    "Malaria treated with ACT >24 hours 0-59m": "maltreat_ov24_u5_hf",
+    "Malaria treated with ACT <24 hours 05-14y": "maltreat_u24_5_14_hf",
+    "Malaria treated with ACT >24 hours 05-14y": "maltreat_ov24_5_14_hf",
+    "Malaria treated with ACT <24 hours 15+y": "maltreat_u24_ov15_hf",
+    "Malaria treated with ACT >24 hours 15+y": "maltreat_ov24_ov15_hf"
+}
+
+
+def rename_columns(df):
+    """Rename DHIS2 org units and data elements to the short SNT names."""
+    rename_dict = {**ORGUNIT_RENAME, **COLUMN_RENAME}
+    return df.rename(columns=rename_dict)
+
+
+def normalize_names(values):
+    """Case-fold and collapse whitespace so spelling noise keeps the same facility key."""
+    return (values.fillna('').astype(str).str.strip()
+            .str.replace(r'\s+', ' ', regex=True).str.casefold())
+
+
+def facility_uid(facility_key, salt=0):
+    """Deterministic ``hf_`` ID derived from the normalized admin path and name."""
+    key = facility_key if salt == 0 else f'{facility_key}#{salt}'
+    return 'hf_' + hashlib.blake2b(key.encode('utf-8'), digest_size=5).hexdigest()
+
+
+class FacilityRegistry:
+    """Persistent facility key -> ``hf_uid`` table.
+
+    IDs are hashes of the normalized ``adm1|adm2|adm3|hf`` path, so the same
+    facility gets the same ID in every upload whatever else is in the file.
+    The registry records each facility the first time it is seen (and the
+    rare hash collision, which is resolved with a salt), so lookups are a
+    join against it and new facilities are appended incrementally.
+    The file is rewritten through a temporary name and ``os.replace``;
+    :func:`create_hfid` holds ``<path>.lock`` from reading it to saving it, so
+    sessions registering facilities at the same time do not lose entries.
+    """
+
+    def __init__(self, path=REGISTRY_PATH):
+        self.path = path
+        self.changed = False
+        if path and os.path.exists(path):
+            self.table = pd.read_csv(path, dtype=str, keep_default_na=False)
+        else:
+            self.table = pd.DataFrame(columns=REGISTRY_COLUMNS, dtype=str)
+
+    def lookup(self, df):
+        """Return the ``hf_uid`` of every row of ``df``, registering new facilities."""
+        key_columns = [col for col in FACILITY_KEY_COLUMNS if col in df.columns]
+        if not key_columns:
+            raise ValueError(f"None of the facility columns {FACILITY_KEY_COLUMNS} are present")
+
+        # One code per distinct facility; only the distinct rows are normalized and joined
+        codes, uniques = pd.MultiIndex.from_frame(df[key_columns]).factorize()
+        facilities = uniques.to_frame(index=False)
+        facilities.columns = key_columns
+        for col in FACILITY_KEY_COLUMNS:
+            if col not in facilities.columns:
+                facilities[col] = ''
+        parts = [normalize_names(facilities[col]) for col in FACILITY_KEY_COLUMNS]
+        facilities['facility_key'] = parts[0].str.cat(parts[1:], sep='|')
+
+        facilities = facilities.merge(self.table[['facility_key', 'hf_uid']], on='facility_key', how='left')
+        new = facilities['hf_uid'].isna()
+        if new.any():
+            taken = set(self.table['hf_uid'])
+            uids = []
+            for facility_key in facilities.loc[new, 'facility_key']:
+                salt = 0
+                uid = facility_uid(facility_key)
+                while uid in taken:
+                    salt += 1
+                    uid = facility_uid(facility_key, salt)
+                taken.add(uid)
+                uids.append(uid)
+            facilities.loc[new, 'hf_uid'] = uids
+
+            added = facilities.loc[new, ['facility_key', 'hf_uid'] + FACILITY_KEY_COLUMNS].astype(str)
+            added['first_registered'] = pd.Timestamp.now().strftime('%Y-%m-%d')
+            self.table = pd.concat([self.table, added[REGISTRY_COLUMNS]], ignore_index=True)
+            self.changed = True
+
+        return pd.Series(facilities['hf_uid'].to_numpy().take(codes), index=df.index, name='hf_uid')
+
+    def save(self):
+        if not self.path or not self.changed:
+            return
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f'{self.path}.{os.getpid()}.tmp'
+        self.table.to_csv(tmp_path, index=False)
+        os.replace(tmp_path, self.path)
+        self.changed = False
+
+
+def create_hfid(df, registry_path=REGISTRY_PATH):
+    """Add the stable ``hf_uid`` of each facility, see :class:`FacilityRegistry`.
+
+    Pass ``registry_path=None`` to compute the IDs without recording them.
+    """
+    if not registry_path:
+        df['hf_uid'] = FacilityRegistry(None).lookup(df)
+        return df
+    directory = os.path.dirname(registry_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    # Read, extend and write the registry as one step
+    with file_lock(f'{registry_path}.lock'):
+        registry = FacilityRegistry(registry_path)
+        df['hf_uid'] = registry.lookup(df)
+        registry.save()
+    return df
@@ -0,0 +1,78 @@
+"""Facility-year lookups on the outlier results (pages 08, 09 and 11).
+
+The review pages show one facility and year at a time. Filtering the
+national table with ``(df['hf_uid'] == hf_uid) & (df['year'] == year)``
+scans every row on each click. :class:`FacilityYearIndex` sorts the table
+once by ``(hf_uid, year)`` (a no-op for :func:`snt.outliers.process_outliers`
+output, which is already in that order) and keeps an offset array with the
+first row of every facility-year, so a slice is two array lookups and an
+``iloc``. The selectbox options come from the same index.
+
+:func:`indexed_upload` keeps the index of recently uploaded files in memory
+(see :func:`snt.cache.derived_from_upload`), so Streamlit reruns do not
+rebuild it.
+"""
+import numpy as np
+import pandas as pd
+
+from snt.cache import derived_from_upload
+from snt.outliers import GROUP_KEYS
+
+
+class FacilityYearIndex:
+    """``df`` sorted by ``(hf_uid, year)`` with the row range of every facility-year.
+
+    Rows with a missing ``hf_uid`` or ``year`` are left out.
+    """
+
+    def __init__(self, df):
+        missing = [col for col in GROUP_KEYS if col not in df.columns]
+        if missing:
+            raise KeyError(f"Columns not found for the facility-year index: {missing}")
+
+        df = df.dropna(subset=GROUP_KEYS)
+        facility_codes, facilities = pd.factorize(df['hf_uid'], sort=True)
+        year_codes, years = pd.factorize(df['year'], sort=True)
+        groups = facility_codes.astype('int64') * len(years) + year_codes
+
+        if len(groups) and (np.diff(groups) < 0).any():
+            order = np.argsort(groups, kind='stable')
+            df = df.iloc[order]
+            groups = groups[order]
+
+        self.frame = df.reset_index(drop=True)
+        self.facilities = pd.Index(facilities)
+        self.years = pd.Index(years)
+        counts = np.bincount(groups, minlength=len(facilities) * len(years))
+        # Rows of group g are frame.iloc[offsets[g]:offsets[g + 1]]
+        self.offsets = np.concatenate([[0], np.cumsum(counts)])
+        self.counts = counts.reshape(len(facilities), len(years))
+
+    def __len__(self):
+        return len(self.frame)
+
+    def _group(self, hf_uid, year):
+        try:
+            return self.facilities.get_loc(hf_uid) * len(self.years) + self.years.get_loc(year)
+        except KeyError:
+            return None
+
+    def slice(self, hf_uid, year):
+        """Rows of one facility-year (empty if there are none)."""
+        group = self._group(hf_uid, year)
+        if group is None:
+            return self.frame.iloc[:0]
+        return self.frame.iloc[self.offsets[group]:self.offsets[group + 1]]
+
+    def facility_years(self, hf_uid):
+        """Years with data for ``hf_uid``."""
+        try:
+            row = self.counts[self.facilities.get_loc(hf_uid)]
+        except KeyError:
+            return self.years[:0]
+        return self.years[row > 0]
+
+
+def indexed_upload(file):
+    """:class:`FacilityYearIndex` of an uploaded file, built once per file content."""
+    return derived_from_upload(file, 'facility_index', FacilityYearIndex)
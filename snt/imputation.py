@@ -0,0 +1,190 @@
+"""Missing-month detection and imputation of the facility series.
+
+A facility is expected to report every month from its first to its last
+month with any indicator value (the reporting span :mod:`snt.activity`
+records), so nothing is made up for the months after a facility stopped
+reporting. :func:`impute_missing_months`
+adds the months missing in between with a single ``reindex`` of the
+``(hf_uid, month)`` MultiIndex onto that grid, copies the facility's admin
+names to the new rows, and fills the gaps of each indicator on the facility
+x month matrix (see :class:`snt.panel.FacilityMonthPanel`) with one of
+``IMPUTATION_METHODS``:
+
+* ``seasonal_median`` - median of the same calendar month in the facility's
+  other years.
+* ``linear`` - linear interpolation between the reported months around the
+  gap (gaps at the end of a series stay missing).
+* ``ffill`` - last reported value carried forward.
+
+``limit`` caps the number of consecutive missing months ``linear`` and
+``ffill`` fill. The ``imputed`` column is a bitmask of the indicators that
+were filled on each row (bit ``i`` is ``IMPUTE_COLUMNS[i]``), so reporting
+rates, reporting status and outlier fences can use the reported values only
+(:func:`reported_values`) and tell real zeros from filled gaps.
+"""
+import logging
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from snt.panel import FacilityMonthPanel
+from snt.periods import MONTH_NAMES, periods_from_ordinals, row_ordinals
+
+logger = logging.getLogger(__name__)
+
+IMPUTE_COLUMNS = ['allout', 'susp', 'test', 'conf', 'maltreat', 'pres', 'maladm', 'maldth']
+IMPUTATION_METHODS = ['seasonal_median', 'linear', 'ffill']
+FLAG_COLUMN = 'imputed'
+
+# Facility columns copied to the added months
+FACILITY_COLUMNS = ['adm0', 'adm1', 'adm2', 'adm3', 'hf']
+
+FFILL_LIMIT = 2
+
+
+def imputed_mask(df, column):
+    """Rows of ``df`` where ``column`` holds an imputed value."""
+    if FLAG_COLUMN not in df.columns:
+        return np.zeros(len(df), dtype=bool)
+    flags = df[FLAG_COLUMN].to_numpy(dtype='uint8')
+    return (flags >> np.uint8(IMPUTE_COLUMNS.index(column))) & 1 == 1
+
+
+def reported_values(df, columns):
+    """``df[columns]`` as a float array, with the imputed values set to NaN."""
+    values = df[columns].to_numpy(dtype='float64', na_value=np.nan, copy=True)
+    if FLAG_COLUMN in df.columns:
+        for j, column in enumerate(columns):
+            if column in IMPUTE_COLUMNS:
+                values[imputed_mask(df, column), j] = np.nan
+    return values
+
+
+def _previous_next(valid):
+    """Column of the last valid month at or before, and the next at or after, each month."""
+    n_months = valid.shape[1]
+    month = np.arange(n_months)
+    previous = np.maximum.accumulate(np.where(valid, month, -1), axis=1)
+    following = np.minimum.accumulate(np.where(valid, month, n_months)[:, ::-1], axis=1)[:, ::-1]
+    return month, previous, following
+
+
+def fill_values(matrix, panel, method, limit=None):
+    """Values ``method`` proposes for every cell of a facility x month ``matrix``."""
+    if method == 'seasonal_median':
+        years = panel.by_year(matrix)
+        with warnings.catch_warnings():
+            # Calendar months never reported have no median
+            warnings.simplefilter('ignore', RuntimeWarning)
+            median = np.nanmedian(years, axis=1, keepdims=True)
+        return np.broadcast_to(median, years.shape).reshape(matrix.shape)
+
+    valid = ~np.isnan(matrix)
+    month, previous, following = _previous_next(valid)
+    before = np.take_along_axis(matrix, np.clip(previous, 0, None), axis=1)
+    if method == 'ffill':
+        usable = previous >= 0
+        if limit is not None:
+            usable &= month - previous <= limit
+        return np.where(usable, before, np.nan)
+    if method == 'linear':
+        after = np.take_along_axis(matrix, np.clip(following, None, matrix.shape[1] - 1), axis=1)
+        usable = (previous >= 0) & (following < matrix.shape[1])
+        if limit is not None:
+            usable &= following - previous - 1 <= limit
+        with np.errstate(invalid='ignore', divide='ignore'):
+            share = np.where(following > previous, (month - previous) / (following - previous), 0.0)
+        return np.where(usable, before + (after - before) * share, np.nan)
+    raise ValueError(f"Unknown imputation method '{method}', expected one of {IMPUTATION_METHODS}")
+
+
+def complete_months(df, columns=IMPUTE_COLUMNS):
+    """``df`` reindexed so every facility has a row for each expected month.
+
+    A facility's expected months run from its first to its last month with
+    a value. Returns the completed frame (sorted by facility and month) and
+    a boolean array marking the rows inside each facility's expected range.
+    """
+    df = df.dropna(subset=['hf_uid'])
+    ordinals = row_ordinals(df)
+    codes, facilities = pd.factorize(df['hf_uid'], sort=True)
+    has_value = df[columns].notna().any(axis=1).to_numpy()
+
+    first = np.full(len(facilities), np.iinfo('int64').max)
+    last = np.full(len(facilities), np.iinfo('int64').min)
+    np.minimum.at(first, codes[has_value], ordinals[has_value])
+    np.maximum.at(last, codes[has_value], ordinals[has_value])
+    lengths = np.where(first <= last, last - first + 1, 0)
+    grid_facility = np.repeat(np.arange(len(facilities)), lengths)
+    starts = np.concatenate([[0], np.cumsum(lengths)[:-1]])
+    grid_month = first[grid_facility] + np.arange(lengths.sum()) - np.repeat(starts, lengths)
+
+    index = pd.MultiIndex.from_arrays([codes, ordinals], names=['_facility', '_month'])
+    if index.has_duplicates:
+        duplicated = index.duplicated(keep='last')
+        logger.warning("Keeping the last of %d duplicated facility-months", int(duplicated.sum()))
+        df, index, codes = df[~duplicated], index[~duplicated], codes[~duplicated]
+    grid = pd.MultiIndex.from_arrays([grid_facility, grid_month], names=['_facility', '_month'])
+    full = index.union(grid, sort=True)
+
+    completed = df.set_axis(index).reindex(full)
+    facility = full.get_level_values('_facility').to_numpy()
+    month = full.get_level_values('_month').to_numpy()
+    added = ~full.isin(index)
+    expected = (month >= first[facility]) & (month <= last[facility])
+
+    # Admin names and facility name of the new rows, from the facility's first row
+    first_row = np.full(len(facilities), len(df), dtype='int64')
+    np.minimum.at(first_row, codes, np.arange(len(df)))
+    for col in ['hf_uid'] + [col for col in FACILITY_COLUMNS if col in df.columns]:
+        values = df[col].to_numpy()[first_row][facility]
+        completed[col] = np.where(added, values, completed[col].to_numpy())
+
+    periods = periods_from_ordinals(month)
+    if 'year' in completed.columns:
+        completed['year'] = (month // 12 + 1970).astype(df['year'].dtype)
+    if 'month' in completed.columns:
+        completed['month'] = (month % 12 + 1).astype(df['month'].dtype)
+    if 'period' in completed.columns:
+        completed['period'] = periods if isinstance(df['period'].dtype, pd.PeriodDtype) else periods.strftime('%Y-%m')
+    if 'Date' in completed.columns:
+        completed['Date'] = periods.strftime('%Y-%m')
+    if 'periodname' in completed.columns:
+        completed['periodname'] = [f'{MONTH_NAMES[m % 12]} {m // 12 + 1970}' for m in month]
+    return completed.reset_index(drop=True), expected
+
+
+def impute_missing_months(df, method='seasonal_median', columns=IMPUTE_COLUMNS, limit=FFILL_LIMIT):
+    """Add the missing months of every facility and fill the indicator gaps.
+
+    ``method`` is one of ``IMPUTATION_METHODS``; ``limit`` is the longest
+    run of missing months ``linear`` and ``ffill`` fill (None for no limit).
+    The result has one row per facility and month, sorted, with the
+    ``imputed`` bitmask column.
+    """
+    if method not in IMPUTATION_METHODS:
+        raise ValueError(f"Unknown imputation method '{method}', expected one of {IMPUTATION_METHODS}")
+    columns = [col for col in columns if col in df.columns and col in IMPUTE_COLUMNS]
+    if not columns:
+        raise KeyError(f"None of the columns to impute were found: {IMPUTE_COLUMNS}")
+
+    # Previously imputed values are gaps again
+    if FLAG_COLUMN in df.columns:
+        df = df.copy()
+        df[columns] = reported_values(df, columns)
+        df = df.drop(columns=FLAG_COLUMN)
+
+    completed, expected = complete_months(df, columns)
+    panel = FacilityMonthPanel(completed)
+    flags = np.zeros(len(completed), dtype='uint8')
+    values = completed[columns].to_numpy(dtype='float64', na_value=np.nan)
+    for j, column in enumerate(columns):
+        filled = panel.gather(fill_values(panel.to_matrix(values[:, j]), panel, method, limit))
+        imputed = expected & np.isnan(values[:, j]) & ~np.isnan(filled)
+        completed[column] = np.where(imputed, filled, values[:, j])
+        flags |= np.where(imputed, np.uint8(1 << IMPUTE_COLUMNS.index(column)), np.uint8(0))
+    completed[FLAG_COLUMN] = flags
+    logger.info("Added %d missing months, imputed %d values", int(len(completed) - len(df)),
+                int(sum(imputed_mask(completed, col).sum() for col in columns)))
+    return completed
@@ -0,0 +1,168 @@
+"""Derived malaria indicators computed from the renamed data elements (page 06).
+
+The indicators are defined declaratively in ``indicators.json``: each entry
+names its inputs (data elements or other indicators) and an operation:
+
+* ``{"sum": [...]}`` - row sum; NaN when every input is missing
+  (``"min_count": 0`` gives 0 instead, like a plain ``DataFrame.sum``).
+* ``{"positive_difference": [a, b]}`` - ``max(a - b, 0)`` with missing
+  values counted as 0 (``"fill_missing": false`` keeps them missing).
+
+:class:`IndicatorEngine` orders the definitions by their dependencies and
+folds every sum that only depends on data elements or other such sums into
+one coefficient matrix, so all of them are computed with a single matrix
+product over the source columns whatever the number of indicators. The
+remaining indicators are evaluated afterwards, in dependency order.
+"""
+import json
+import os
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+SPEC_PATH = os.path.join(os.path.dirname(__file__), 'indicators.json')
+
+# Columns kept in the key_variables extract used by the outlier pages
+KEY_VARIABLES = ['adm1', 'adm2', 'adm3', 'hf', 'hf_uid', 'year', 'month',
+                 'Date', 'period', 'allout', 'susp', 'test', 'conf', 'maltreat',
+                 'pres', 'maladm', 'maldth']
+
+OPERATIONS = ['sum', 'positive_difference']
+
+
+def load_spec(path=SPEC_PATH):
+    with open(path) as f:
+        return json.load(f)
+
+
+def _operation(name, definition):
+    ops = [op for op in OPERATIONS if op in definition]
+    if len(ops) != 1:
+        raise ValueError(f"Indicator '{name}' must define exactly one of {OPERATIONS}")
+    op = ops[0]
+    inputs = list(definition[op])
+    if op == 'positive_difference' and len(inputs) != 2:
+        raise ValueError(f"Indicator '{name}': positive_difference takes exactly two inputs")
+    return op, inputs
+
+
+def _dependencies(name, inputs, spec):
+    # An indicator may read the source column it replaces
+    return [i for i in inputs if i in spec and i != name]
+
+
+def dependency_order(spec):
+    """Indicator names sorted so that every indicator follows its inputs."""
+    order = []
+    state = {}
+
+    def visit(name, path):
+        if state.get(name) == 'done':
+            return
+        if state.get(name) == 'visiting':
+            raise ValueError(f"Circular indicator definition: {' -> '.join(path + [name])}")
+        state[name] = 'visiting'
+        _, inputs = _operation(name, spec[name])
+        for dep in _dependencies(name, inputs, spec):
+            visit(dep, path + [name])
+        state[name] = 'done'
+        order.append(name)
+
+    for name in spec:
+        visit(name, [])
+    return order
+
+
+class IndicatorEngine:
+    """Compiled form of an indicator spec (see the module docstring)."""
+
+    def __init__(self, spec=None):
+        self.spec = load_spec() if spec is None else spec
+        self.order = dependency_order(self.spec)
+
+        # Sums over data elements and other NaN-propagating sums flatten to
+        # source-column coefficients
+        expansions = {}
+        for name in self.order:
+            op, inputs = _operation(name, self.spec[name])
+            if op != 'sum':
+                continue
+            coefficients = Counter()
+            linear = True
+            for i in inputs:
+                if i in self.spec and i != name:
+                    if i not in expansions or self.spec[i].get('min_count', 1) != 1:
+                        linear = False
+                        break
+                    coefficients.update(expansions[i])
+                else:
+                    coefficients[i] += 1
+            if linear:
+                expansions[name] = coefficients
+
+        self.linear = [name for name in self.order if name in expansions]
+        self.nonlinear = [name for name in self.order if name not in expansions]
+        self.sources = list(dict.fromkeys(col for name in self.linear for col in expansions[name]))
+        source_index = {col: k for k, col in enumerate(self.sources)}
+        self.coefficients = np.zeros((len(self.sources), len(self.linear)))
+        for j, name in enumerate(self.linear):
+            for col, weight in expansions[name].items():
+                self.coefficients[source_index[col], j] = weight
+        self.min_count = np.array([self.spec[name].get('min_count', 1) for name in self.linear])
+
+    def required_columns(self):
+        """Source columns the spec reads from the data."""
+        columns = list(self.sources)
+        for name in self.nonlinear:
+            _, inputs = _operation(name, self.spec[name])
+            columns += [i for i in inputs if i not in self.spec or i == name]
+        return list(dict.fromkeys(columns))
+
+    def compute(self, df):
+        """Return a frame with one column per indicator, in spec order."""
+        missing = [col for col in self.required_columns() if col not in df.columns]
+        if missing:
+            raise KeyError(f"Columns not found for the indicators: {missing}")
+
+        values = {}
+        if self.linear:
+            X = df[self.sources].to_numpy(dtype='float64', na_value=np.nan)
+            present = ~np.isnan(X)
+            sums = np.where(present, X, 0.0) @ self.coefficients
+            counts = present.astype('float64') @ (self.coefficients != 0)
+            sums[(counts == 0) & (self.min_count > 0)] = np.nan
+            for j, name in enumerate(self.linear):
+                values[name] = sums[:, j]
+
+        def column(i, name):
+            if i in values and i != name:
+                return values[i]
+            return df[i].to_numpy(dtype='float64', na_value=np.nan)
+
+        for name in self.nonlinear:
+            definition = self.spec[name]
+            op, inputs = _operation(name, definition)
+            arrays = np.column_stack([column(i, name) for i in inputs])
+            if op == 'sum':
+                result = np.nansum(arrays, axis=1)
+                if definition.get('min_count', 1) > 0:
+                    result[np.isnan(arrays).all(axis=1)] = np.nan
+            else:
+                if definition.get('fill_missing', True):
+                    arrays = np.nan_to_num(arrays, nan=0.0)
+                result = np.maximum(arrays[:, 0] - arrays[:, 1], 0)
+            values[name] = result
+
+        return pd.DataFrame({name: values[name] for name in self.spec}, index=df.index)
+
+    def apply(self, df):
+        """Add (or overwrite) the indicator columns on ``df``."""
+        result = self.compute(df)
+        df[list(result.columns)] = result
+        return df
+
+
+def create_variables(df, spec=None):
+    """Add the aggregated indicators (allout, susp, test, conf, ...) to ``df``."""
+    return IndicatorEngine(spec).apply(df)
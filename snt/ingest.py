@@ -0,0 +1,261 @@
+"""Reading and combining DHIS2 routine data exports (page 04)."""
+import csv
+import io
+import logging
+import os
+from concurrent.futures import FIRST_EXCEPTION, ProcessPoolExecutor, wait
+
+import pandas as pd
+import pyarrow as pa
+
+from snt.periods import parse_periodname
+
+logger = logging.getLogger(__name__)
+
+# Rows (or CSV lines) inspected when looking for the header row
+HEADER_SNIFF_ROWS = 50
+CSV_SNIFF_BYTES = 64 * 1024
+
+
+class ColumnMismatchError(ValueError):
+    """An export does not have the same columns as the first file."""
+
+
+def file_name(file):
+    # Uploaded files carry a name, CLI inputs are plain paths
+    return os.path.basename(getattr(file, 'name', None) or str(file))
+
+
+def _rewind(file):
+    if hasattr(file, 'seek'):
+        file.seek(0)
+
+
+def _sniff_csv(file):
+    """Find the header line and delimiter of a CSV from its first bytes."""
+    if hasattr(file, 'read'):
+        sample = file.read(CSV_SNIFF_BYTES)
+        _rewind(file)
+    else:
+        with open(file, 'rb') as f:
+            sample = f.read(CSV_SNIFF_BYTES)
+    if isinstance(sample, bytes):
+        sample = sample.decode('utf-8', errors='replace')
+
+    try:
+        sep = csv.Sniffer().sniff(sample, delimiters=',;\t').delimiter
+    except csv.Error:
+        sep = ','
+
+    lines = sample.splitlines()
+    for i, line in enumerate(lines[:HEADER_SNIFF_ROWS]):
+        if line.replace(sep, '').strip(' "\''):
+            return i, sep
+    return None, sep
+
+
+def _sniff_excel(file, engine):
+    """Find the header row of a sheet by peeking at its first rows only."""
+    peek = pd.read_excel(file, header=None, nrows=HEADER_SNIFF_ROWS, engine=engine)
+    _rewind(file)
+    non_empty = peek.notna().any(axis=1).to_numpy()
+    if not non_empty.any():
+        return None
+    return int(non_empty.argmax())
+
+
+def batch_dtypes(df):
+    """Dtypes to reuse when reading the other exports of a batch.
+
+    Numeric columns are read as float64 directly, so later files skip type
+    inference for them; text columns are left to the parser.
+    """
+    return {col: 'float64' for col in df.columns if pd.api.types.is_numeric_dtype(df[col])}
+
+
+def read_file(file, dtypes=None):
+    """Read one export, using the first non-empty row as the header.
+
+    Only the first rows are inspected to locate the header, then the file
+    is read once starting there. ``dtypes`` (see :func:`batch_dtypes`) are
+    applied when given; a file that does not fit them is re-read with
+    inferred types.
+    """
+    name = file_name(file)
+    file_type = name.split('.')[-1].lower()
+
+    if file_type == 'csv':
+        first_data_row, sep = _sniff_csv(file)
+        read = lambda dtype: pd.read_csv(file, skiprows=first_data_row, sep=sep, dtype=dtype)
+    elif file_type in ['xlsx', 'xls']:
+        engine = 'openpyxl' if file_type == 'xlsx' else 'xlrd'
+        first_data_row = _sniff_excel(file, engine)
+        read = lambda dtype: pd.read_excel(file, skiprows=first_data_row, dtype=dtype, engine=engine)
+    else:
+        raise ValueError(f"Unsupported file type: {file_type}")
+
+    if first_data_row is None:
+        raise ValueError(f"No data found in {name}")
+
+    try:
+        df = read(dtypes)
+    except (ValueError, TypeError):
+        if not dtypes:
+            raise
+        _rewind(file)
+        df = read(None)
+
+    # Remove any remaining unnamed columns
+    unnamed_cols = [col for col in df.columns if pd.isna(col) or 'Unnamed' in str(col)]
+    if unnamed_cols:
+        logger.info("Removing %d unnamed columns from %s", len(unnamed_cols), name)
+        df = df.drop(columns=unnamed_cols)
+
+    logger.info("Processed %s - found headers at row %d", name, first_data_row + 1)
+    return df
+
+
+def add_period_columns(df):
+    """Turn ``periodname`` ('January 2023') into month, year, Date and period."""
+    if 'periodname' not in df.columns:
+        raise ValueError(f"Missing required column: 'periodname'. Available columns: {list(df.columns)}")
+
+    periods = parse_periodname(df['periodname'])
+    for col in ['month', 'year', 'Date', 'period']:
+        df[col] = periods[col]
+
+    # Only drop columns if they exist
+    columns_to_drop = [col for col in ['periodname', 'orgunitlevel5'] if col in df.columns]
+    if columns_to_drop:
+        df = df.drop(columns=columns_to_drop)
+    return df
+
+
+def to_arrow_table(df):
+    """Convert ``df`` to an Arrow table, storing mixed object columns as text."""
+    try:
+        return pa.Table.from_pandas(df, preserve_index=False)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        df = df.copy()
+        df.columns = [str(col) for col in df.columns]
+        for col in [col for col in df.columns if df[col].dtype == object]:
+            df[col] = df[col].astype('string')
+        return pa.Table.from_pandas(df, preserve_index=False)
+
+
+def _file_source(file):
+    # Uploaded files are shipped to the workers as (name, bytes), paths as-is
+    if hasattr(file, 'getvalue'):
+        return file_name(file), file.getvalue()
+    return file_name(file), file
+
+
+def _check_columns(df, reference_columns, name):
+    if list(df.columns) != reference_columns:
+        col_diff = set(df.columns).symmetric_difference(set(reference_columns))
+        raise ColumnMismatchError(f"Column mismatch in {name}. Mismatched columns: {col_diff}")
+
+
+def _read_file_worker(name, source, reference_columns, dtypes):
+    """Process-pool task: read one export, check its columns, return Arrow."""
+    if isinstance(source, bytes):
+        source = io.BytesIO(source)
+        source.name = name
+    df = read_file(source, dtypes)
+    _check_columns(df, reference_columns, name)
+    return to_arrow_table(df)
+
+
+class ColumnAccumulator:
+    """Collects per-file Arrow tables and stacks them in file order at the end.
+
+    Tables arrive in completion order; only the compact Arrow buffers are
+    kept, never the intermediate DataFrames.
+    """
+
+    def __init__(self):
+        self.tables = {}
+
+    def add(self, index, table):
+        self.tables[index] = table
+
+    def to_pandas(self):
+        tables = [self.tables[i] for i in sorted(self.tables)]
+        self.tables = {}
+        try:
+            combined = pa.concat_tables(tables, promote_options='permissive')
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            # Same column holds numbers in one file and text in another
+            return pd.concat([table.to_pandas() for table in tables], ignore_index=True)
+        return combined.to_pandas()
+
+
+def combine_files_parallel(files, workers=None):
+    """Read exports in a process pool and stack them through a ColumnAccumulator.
+
+    The first file is read up front to fix the reference columns; every other
+    file is validated inside its worker, so a mismatching export fails before
+    its data is shipped back.
+    """
+    reference_df = read_file(files[0])
+    reference_columns = list(reference_df.columns)
+    dtypes = batch_dtypes(reference_df)
+    accumulator = ColumnAccumulator()
+    accumulator.add(0, to_arrow_table(reference_df))
+    del reference_df
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {}
+        for index, file in enumerate(files[1:], start=1):
+            name, source = _file_source(file)
+            futures[executor.submit(_read_file_worker, name, source, reference_columns, dtypes)] = (index, name)
+
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_EXCEPTION)
+            for future in done:
+                index, name = futures[future]
+                try:
+                    table = future.result()
+                except ColumnMismatchError:
+                    for other in pending:
+                        other.cancel()
+                    raise
+                except Exception as e:
+                    logger.error("Error reading file %s: %s", name, e)
+                    continue
+                accumulator.add(index, table)
+
+    return accumulator.to_pandas()
+
+
+def validate_and_combine_files(files, workers=1):
+    """Read every export, check they share the first file's columns and stack them.
+
+    With ``workers`` > 1 (or None for one per core) the files are parsed in a
+    process pool, see :func:`combine_files_parallel`.
+    """
+    if not files:
+        return None
+
+    if workers != 1 and len(files) > 1:
+        return add_period_columns(combine_files_parallel(files, workers))
+
+    dfs = []
+    reference_df = read_file(files[0])
+    reference_columns = list(reference_df.columns)
+    dtypes = batch_dtypes(reference_df)
+    dfs.append(reference_df)
+
+    for file in files[1:]:
+        try:
+            df = read_file(file, dtypes)
+        except Exception as e:
+            # Unreadable exports are skipped, as the upload page always did
+            logger.error("Error reading file %s: %s", file_name(file), e)
+            continue
+        _check_columns(df, reference_columns, file_name(file))
+        dfs.append(df)
+
+    combined_df = pd.concat(dfs, ignore_index=True)
+    return add_period_columns(combined_df)
@@ -0,0 +1,266 @@
+"""Before/after outlier plots (pages 08 and 09) and their bulk export.
+
+:func:`draw_scatter` and :func:`draw_box` draw one facility-year on a
+two-panel figure from :func:`new_figure`; the pages show a single selection
+with them. The scatter plot draws the fences page 07 stored with the data
+(``<column>_lower_bound`` / ``_upper_bound``) and marks the points its
+``<column>_category`` flags, so the plots agree with whichever detection
+method produced the file (see :func:`stored_fences`). :func:`export_outlier_plots` renders every flagged
+``(hf_uid, year, indicator)`` combination of a :class:`FacilityYearIndex`
+into a ZIP of PNGs or a multi-page PDF.
+
+The export sends each combination's three small arrays (month, original,
+winsorized) to a process pool. Every worker draws on headless Agg figures
+it creates once and clears between plots, instead of building a new figure
+per plot, and the PNGs are written into the archive as they come back, so
+memory stays flat whatever the number of plots.
+"""
+import io
+import warnings
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from matplotlib.backends.backend_pdf import PdfPages
+from matplotlib.figure import Figure
+from matplotlib.image import imread
+from matplotlib.lines import Line2D
+
+PLOT_KINDS = ['scatter', 'box']
+EXPORT_FORMATS = ['zip', 'pdf']
+FIGSIZE = (15, 6)
+
+# Plots handed to a worker at a time
+CHUNK_SIZE = 16
+
+SCATTER_TITLE = "Outlier Detection and Correction"
+BOX_TITLE = "Outlier Detection and Correction Using Box Plots"
+
+# Figures of the current process, reused by render_plot()
+_figures = {}
+
+
+# Margins of the export figures, in place of a tight layout per plot
+# (the scatter plot keeps room for its legend on the right)
+EXPORT_MARGINS = {
+    'scatter': dict(left=0.06, right=0.84, bottom=0.1, top=0.85, wspace=0.08),
+    'box': dict(left=0.06, right=0.98, bottom=0.1, top=0.85, wspace=0.08),
+}
+
+
+def new_figure(margins=None):
+    """Two side-by-side panels sharing the y axis, not tied to pyplot.
+
+    With ``margins`` (``subplots_adjust`` arguments) the layout is fixed
+    once and the draw functions should be called with ``tight=False``.
+    """
+    fig = Figure(figsize=FIGSIZE)
+    fig.subplots(1, 2, sharey=True)
+    if margins:
+        fig.subplots_adjust(**margins)
+    return fig
+
+
+def _reset(fig):
+    for ax in fig.axes:
+        ax.clear()
+    for legend in list(fig.legends):
+        legend.remove()
+
+
+def stored_fences(frame, column):
+    """``lower``, ``upper`` and ``outlier`` arrays of ``column`` stored in ``frame``.
+
+    Empty when ``frame`` has no stored bounds and category for ``column``
+    (:func:`draw_scatter` then falls back to 1.5 x IQR fences).
+    """
+    names = [f'{column}_lower_bound', f'{column}_upper_bound', f'{column}_category']
+    if not all(name in frame.columns for name in names):
+        return {}
+    return {'lower': frame[names[0]].to_numpy(dtype='float64', na_value=np.nan),
+            'upper': frame[names[1]].to_numpy(dtype='float64', na_value=np.nan),
+            'outlier': (frame[names[2]] == 'Outlier').to_numpy()}
+
+
+def _draw_fence(ax, month, fence, color):
+    """A fence as a horizontal line, or a step per month where it varies (rolling or seasonal methods)."""
+    fence = np.broadcast_to(np.asarray(fence, dtype='float64'), np.shape(month))
+    finite = fence[np.isfinite(fence)]
+    if finite.size == 0:
+        return
+    if finite.min() == finite.max():
+        ax.axhline(finite[0], color=color, linestyle='--')
+    else:
+        order = np.argsort(np.asarray(month), kind='stable')
+        ax.step(np.asarray(month)[order], fence[order], where='mid', color=color, linestyle='--')
+
+
+def iqr_bounds(values):
+    """1.5 x IQR fences of ``values``, ignoring missing values."""
+    with warnings.catch_warnings():
+        # All-missing slices give NaN fences, as Series.quantile does
+        warnings.simplefilter('ignore', RuntimeWarning)
+        q1, q3 = np.nanquantile(values, [0.25, 0.75])
+    iqr = q3 - q1
+    return q1 - 1.5 * iqr, q3 + 1.5 * iqr
+
+
+def draw_scatter(fig, month, original, winsorized, column, lower=None, upper=None, outlier=None,
+                 title=SCATTER_TITLE, tight=True):
+    """Monthly values before and after winsorization, with the outlier fences.
+
+    ``lower``, ``upper`` (per month or scalars) and ``outlier`` are the
+    stored fences and flags (see :func:`stored_fences`); the outliers are
+    red in both panels, so the corrected months stand out after correction.
+    Without them the fences are the 1.5 x IQR of the original values.
+    """
+    _reset(fig)
+    fig.suptitle(title, fontsize=16)
+    original = np.asarray(original, dtype='float64')
+    if lower is None or upper is None:
+        lower, upper = iqr_bounds(original)
+    if outlier is None:
+        outlier = (original < lower) | (original > upper)
+    colors = np.where(np.asarray(outlier, dtype=bool), 'red', 'blue')
+    panels = [(original, "Outlier Detection Before Correction"),
+              (winsorized, "Outlier Detection After Correction Using Winsorisation Method")]
+    for ax, (values, panel_title) in zip(fig.axes, panels):
+        ax.scatter(month, np.asarray(values, dtype='float64'), c=colors, alpha=0.7)
+        _draw_fence(ax, month, lower, 'green')
+        _draw_fence(ax, month, upper, 'red')
+        ax.set_title(panel_title)
+        ax.set_xlabel('Month')
+        ax.set_ylabel(column)
+
+    handles = [
+        Line2D([0], [0], marker='o', color='w', markerfacecolor='red', markersize=10, label='Outliers'),
+        Line2D([0], [0], marker='o', color='w', markerfacecolor='blue', markersize=10, label='Non-Outliers'),
+        Line2D([0], [0], color='green', linestyle='--', linewidth=2, label='Lower Bound'),
+        Line2D([0], [0], color='red', linestyle='--', linewidth=2, label='Upper Bound')
+    ]
+    fig.legend(handles=handles, loc='center left', bbox_to_anchor=(0.85, 0.5), fontsize=10)
+    if tight:
+        fig.tight_layout(rect=[0, 0, 0.85, 1])
+    return fig
+
+
+def draw_box(fig, original, winsorized, column, title=BOX_TITLE, tight=True):
+    """Box plots of the values before and after winsorization."""
+    _reset(fig)
+    fig.suptitle(title, fontsize=16)
+    panels = [(original, f"Box Plot for {column} (Original)"),
+              (winsorized, f"Box Plot for {column}_winsorized (Winsorized)")]
+    for ax, (values, panel_title) in zip(fig.axes, panels):
+        ax.boxplot(values, patch_artist=True, notch=False,
+                   boxprops=dict(facecolor="lightblue", edgecolor="black", linewidth=1.5))
+        ax.set_title(panel_title)
+        ax.set_ylabel(column)
+        ax.tick_params(axis='y', which='both', labelsize=10)
+    if tight:
+        fig.tight_layout()
+    return fig
+
+
+def flagged_groups(index, column):
+    """Facility-year group numbers of ``index`` with at least one outlier in ``column``."""
+    outlier = (index.frame[f'{column}_category'] == 'Outlier').to_numpy()
+    row_group = np.repeat(np.arange(len(index.offsets) - 1), np.diff(index.offsets))
+    return np.unique(row_group[outlier])
+
+
+def plot_tasks(index, columns=None, kinds=PLOT_KINDS):
+    """Render tasks for every flagged combination, ordered by facility, year and indicator.
+
+    ``columns`` defaults to every indicator with a ``_category`` and a
+    ``_winsorized`` column.
+    """
+    frame = index.frame
+    if columns is None:
+        columns = [col[:-len('_category')] for col in frame.columns if col.endswith('_category')]
+    columns = [col for col in columns
+               if f'{col}_category' in frame.columns and f'{col}_winsorized' in frame.columns]
+    if not columns:
+        raise ValueError("No indicator with '_category' and '_winsorized' columns to export")
+
+    original = {col: frame[col].to_numpy(dtype='float64', na_value=np.nan) for col in columns}
+    winsorized = {col: frame[f'{col}_winsorized'].to_numpy(dtype='float64', na_value=np.nan) for col in columns}
+    fences = {col: stored_fences(frame, col) for col in columns}
+    names = frame['hf'].to_numpy() if 'hf' in frame.columns else None
+    month = frame['month'].to_numpy()
+    n_years = len(index.years)
+
+    flagged = sorted((group, j) for j, col in enumerate(columns) for group in flagged_groups(index, col))
+    for group, j in flagged:
+        column = columns[j]
+        rows = slice(index.offsets[group], index.offsets[group + 1])
+        hf_uid, year = index.facilities[group // n_years], index.years[group % n_years]
+        label = f"{names[rows.start]} ({hf_uid}), {year}" if names is not None else f"{hf_uid}, {year}"
+        for kind in kinds:
+            yield {'name': f'{hf_uid}/{year}_{column}_{kind}.png', 'kind': kind, 'label': label,
+                   'column': column, 'month': month[rows], 'original': original[column][rows],
+                   'winsorized': winsorized[column][rows],
+                   'fences': {name: values[rows] for name, values in fences[column].items()}}
+
+
+def render_plot(task, dpi=100):
+    """Draw one task on this process's reusable figure and return ``(name, png bytes)``."""
+    kind = task['kind']
+    if kind not in PLOT_KINDS:
+        raise ValueError(f"Unknown plot kind '{kind}', expected one of {PLOT_KINDS}")
+    if kind not in _figures:
+        _figures[kind] = new_figure(EXPORT_MARGINS[kind])
+    fig = _figures[kind]
+    if kind == 'scatter':
+        draw_scatter(fig, task['month'], task['original'], task['winsorized'], task['column'],
+                     **task.get('fences', {}), title=f"{SCATTER_TITLE} - {task['label']}", tight=False)
+    else:
+        draw_box(fig, task['original'], task['winsorized'], task['column'],
+                 title=f"{BOX_TITLE} - {task['label']}", tight=False)
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format='png', dpi=dpi)
+    return task['name'], buffer.getvalue()
+
+
+def export_outlier_plots(index, output, columns=None, kinds=PLOT_KINDS, fmt='zip',
+                         workers=None, progress=None, dpi=100):
+    """Write the plots of every flagged combination to ``output`` and return their number.
+
+    ``output`` is a path or binary file object, ``fmt`` is ``'zip'`` (one PNG
+    per plot, in a folder per facility) or ``'pdf'`` (one page per plot).
+    ``workers`` processes render the plots (None for one per core, 1 to
+    render in this process). ``progress(done, total)`` is called after each
+    plot.
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format '{fmt}', expected one of {EXPORT_FORMATS}")
+    tasks = list(plot_tasks(index, columns, kinds))
+    total = len(tasks)
+
+    executor = ProcessPoolExecutor(max_workers=workers) if workers != 1 and total > 1 else None
+    try:
+        if executor is None:
+            results = (render_plot(task, dpi) for task in tasks)
+        else:
+            results = executor.map(render_plot, tasks, [dpi] * total, chunksize=CHUNK_SIZE)
+
+        if fmt == 'zip':
+            # PNGs are already compressed
+            with zipfile.ZipFile(output, 'w', zipfile.ZIP_STORED) as archive:
+                for done, (name, png) in enumerate(results, start=1):
+                    archive.writestr(name, png)
+                    if progress:
+                        progress(done, total)
+        else:
+            # One reused page showing each PNG pixel for pixel
+            page = Figure(figsize=FIGSIZE, dpi=dpi)
+            with PdfPages(output) as pdf:
+                for done, (name, png) in enumerate(results, start=1):
+                    page.images.clear()
+                    page.figimage(imread(io.BytesIO(png), format='png'))
+                    pdf.savefig(page)
+                    if progress:
+                        progress(done, total)
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+    return total
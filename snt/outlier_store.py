@@ -0,0 +1,181 @@
+"""Persisted outlier results with incremental recomputation.
+
+A monthly refresh appends one period to the key variables, yet a full
+outlier run recomputes every facility-year. :class:`OutlierStore` keeps the
+previous result together with a fingerprint (row count and an
+order-independent hash of the inputs) of every ``(hf_uid, year)`` group.
+On :meth:`OutlierStore.update` only the groups whose fingerprint changed are
+recomputed (whole facilities for methods whose fences span years, see
+``scope`` in :func:`snt.outliers.outlier_method`) and patched into the
+stored result.
+
+Each dataset has its own store directory under ``STORE_ROOT``, named by
+the user (:func:`store_path`), so next month's export of the same dataset
+finds this month's result whatever session uploads it, and different
+datasets never overwrite each other. Only the ``MAX_STORES`` most recently
+updated stores are kept. The files are written to temporary names and moved
+into place with ``os.replace``, ``store.json`` last, and ``update`` holds a
+lock file for the whole read-compute-write, so a store never pairs the
+fingerprints of one run with the result or settings of another.
+"""
+import json
+import logging
+import os
+import re
+import shutil
+
+import pandas as pd
+import pyarrow.parquet as pq
+
+from snt.cache import PIPELINE_DIR, file_lock
+from snt.ingest import to_arrow_table
+from snt.outliers import (GROUP_KEYS, ID_COLUMNS, OUTLIER_COLUMNS, OUTLIER_METHODS,
+                          process_outliers, usable_outlier_columns)
+
+logger = logging.getLogger(__name__)
+
+STORE_ROOT = os.environ.get('SNT_OUTLIER_STORE', os.path.join(PIPELINE_DIR, 'outlier_store'))
+STORE_FILES = ['outliers.parquet', 'fingerprints.parquet', 'store.json']
+MAX_STORES = int(os.environ.get('SNT_OUTLIER_STORES', '16'))
+
+
+def store_path(dataset, root=STORE_ROOT):
+    """Store directory of the dataset named ``dataset``."""
+    name = re.sub(r'[^A-Za-z0-9_.-]+', '_', str(dataset).strip()).strip('._')
+    if not name:
+        raise ValueError("The dataset name must contain letters or digits")
+    return os.path.join(root, name)
+
+
+def evict_stores(root=STORE_ROOT, max_stores=MAX_STORES, keep=None):
+    """Delete the least recently updated stores under ``root`` beyond ``max_stores``.
+
+    ``keep`` (a store directory) is never deleted.
+    """
+    if not os.path.isdir(root):
+        return
+    stores = []
+    for entry in os.scandir(root):
+        meta_path = os.path.join(entry.path, STORE_FILES[-1])
+        # Only directories that hold a store
+        if not entry.is_dir() or not os.path.exists(os.path.join(entry.path, 'store.lock')):
+            continue
+        if os.path.abspath(entry.path) != os.path.abspath(keep or ''):
+            # A store without store.json was interrupted and is the oldest of all
+            stores.append((os.path.getmtime(meta_path) if os.path.exists(meta_path) else 0, entry.path))
+    excess = len(stores) + (keep is not None) - max_stores
+    for _, path in sorted(stores)[:max(excess, 0)]:
+        with file_lock(os.path.join(path, 'store.lock')):
+            for name in STORE_FILES:
+                if os.path.exists(os.path.join(path, name)):
+                    os.remove(os.path.join(path, name))
+        shutil.rmtree(path, ignore_errors=True)
+        logger.info("Removed outlier store %s", path)
+
+
+def group_fingerprints(df, columns):
+    """Row count and summed row hash of every ``(hf_uid, year)`` group."""
+    hashed = [col for col in ID_COLUMNS if col in df.columns] + list(columns)
+    row_hash = pd.util.hash_pandas_object(df[hashed], index=False).to_numpy()
+    fingerprints = (pd.DataFrame({'hash': row_hash}, index=pd.MultiIndex.from_frame(df[GROUP_KEYS]))
+                    .groupby(level=GROUP_KEYS)['hash'].agg(['size', 'sum']))
+    fingerprints.columns = ['rows', 'hash']
+    return fingerprints
+
+
+class OutlierStore:
+    """Directory holding the last outlier result and its group fingerprints."""
+
+    def __init__(self, path):
+        self.path = path
+        self.lock_path = os.path.join(path, 'store.lock')
+        # Group counts of the latest update(), for reporting
+        self.last_update = None
+
+    def _files(self):
+        return [os.path.join(self.path, name) for name in STORE_FILES]
+
+    def exists(self):
+        return all(os.path.exists(p) for p in self._files())
+
+    def load(self):
+        return pd.read_parquet(self._files()[0])
+
+    def _load_state(self):
+        _, fingerprint_path, meta_path = self._files()
+        with open(meta_path) as f:
+            meta = json.load(f)
+        fingerprints = pd.read_parquet(fingerprint_path).set_index(GROUP_KEYS)
+        return meta, fingerprints
+
+    def save(self, result, fingerprints, meta):
+        """Write the store, each file through a temporary name and ``store.json`` last."""
+        os.makedirs(self.path, exist_ok=True)
+        result_path, fingerprint_path, meta_path = self._files()
+        suffix = f'.{os.getpid()}.tmp'
+        # Without its store.json the directory reads as missing while it is rewritten
+        if os.path.exists(meta_path):
+            os.remove(meta_path)
+        pq.write_table(to_arrow_table(result), result_path + suffix)
+        os.replace(result_path + suffix, result_path)
+        pq.write_table(to_arrow_table(fingerprints.reset_index()), fingerprint_path + suffix)
+        os.replace(fingerprint_path + suffix, fingerprint_path)
+        with open(meta_path + suffix, 'w') as f:
+            json.dump(meta, f)
+        os.replace(meta_path + suffix, meta_path)
+
+    def update(self, df, columns=OUTLIER_COLUMNS, method='iqr', **params):
+        """Bring the stored result up to date with ``df`` and return it.
+
+        Falls back to a full run when there is no previous result or when it
+        was produced with other columns, method or parameters.
+        """
+        os.makedirs(self.path, exist_ok=True)
+        with file_lock(self.lock_path):
+            return self._update(df, columns, method, params)
+
+    def _update(self, df, columns, method, params):
+        columns = usable_outlier_columns(df, columns)
+        df = df.dropna(subset=GROUP_KEYS)
+        fingerprints = group_fingerprints(df, columns)
+        meta = {'columns': columns, 'method': method, 'params': params}
+
+        previous = None
+        if self.exists():
+            stored_meta, stored_fingerprints = self._load_state()
+            if stored_meta == meta:
+                previous = self.load()
+            else:
+                logger.info("Outlier settings changed, recomputing everything")
+
+        if previous is None:
+            result = process_outliers(df, columns, method=method, **params)
+            self.save(result, fingerprints, meta)
+            self.last_update = {'groups': len(fingerprints), 'recomputed': len(fingerprints)}
+            return result
+
+        # Groups that are new, changed or gone since the stored run
+        joined = fingerprints.join(stored_fingerprints, how='outer', rsuffix='_stored')
+        dirty = (joined['rows'] != joined['rows_stored']) | (joined['hash'] != joined['hash_stored'])
+        dirty_groups = joined.index[dirty.to_numpy()]
+
+        if OUTLIER_METHODS[method].scope == 'facility':
+            dirty_facilities = dirty_groups.get_level_values('hf_uid').unique()
+            is_dirty = lambda frame: frame['hf_uid'].isin(dirty_facilities).to_numpy()
+        else:
+            is_dirty = lambda frame: pd.MultiIndex.from_frame(frame[GROUP_KEYS]).isin(dirty_groups)
+
+        recompute = df[is_dirty(df)]
+        keep = previous[~is_dirty(previous)]
+        logger.info("Recomputing %d of %d facility-years", int(dirty.sum()), len(fingerprints))
+
+        parts = [keep]
+        if not recompute.empty:
+            parts.append(process_outliers(recompute, columns, method=method, **params))
+        result = (pd.concat(parts, ignore_index=True)
+                  .sort_values(GROUP_KEYS, kind='stable')
+                  .reset_index(drop=True))
+
+        self.save(result, fingerprints, meta)
+        self.last_update = {'groups': len(fingerprints), 'recomputed': int(dirty.sum())}
+        return result
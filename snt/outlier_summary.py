@@ -0,0 +1,109 @@
+"""Outlier counts by indicator, year, admin unit and category (page 12).
+
+:class:`OutlierSummaryCube` turns the ``*_category`` columns of an outlier
+result into one dense count array of shape
+``(indicator, year, admin unit, category)``. Years and admin units
+(distinct adm1/adm2/adm3 combinations) are factorized once, the category
+columns are converted to integer codes and every indicator's cells are
+counted in a single ``np.bincount``. The summary table, the per-year chart
+data and the per-adm1/adm2/adm3 breakdowns are then sums over axes of that
+array, with no further pass over the rows.
+"""
+import numpy as np
+import pandas as pd
+
+from snt.outliers import CATEGORIES
+
+ADMIN_LEVELS = ['adm1', 'adm2', 'adm3']
+
+
+def category_columns(df, suffix='_category'):
+    """Columns ending in ``suffix`` that hold at least one outlier category."""
+    return [col for col in df.columns if col.endswith(suffix) and df[col].isin(CATEGORIES).any()]
+
+
+class OutlierSummaryCube:
+    """Counts of ``CATEGORIES`` for every ``columns`` x year x admin unit.
+
+    Rows with a missing year or admin name are counted under a missing
+    label, so the totals include them; values that are neither category
+    are not counted.
+    """
+
+    def __init__(self, df, columns=None):
+        self.rows = len(df)
+        self.indicators = list(category_columns(df) if columns is None else columns)
+        self.levels = [level for level in ADMIN_LEVELS if level in df.columns]
+
+        if 'year' in df.columns:
+            year_codes, years = pd.factorize(df['year'], sort=True, use_na_sentinel=False)
+        else:
+            year_codes, years = np.zeros(len(df), dtype='int64'), pd.Index([np.nan])
+        self.years = pd.Index(years)
+
+        if self.levels:
+            unit_codes, units = pd.MultiIndex.from_frame(df[self.levels]).factorize()
+            self.units = units.to_frame(index=False)
+            self.units.columns = self.levels
+        else:
+            unit_codes, self.units = np.zeros(len(df), dtype='int64'), pd.DataFrame(index=[0])
+
+        n_cells = len(self.years) * len(self.units) * len(CATEGORIES)
+        cell = (year_codes.astype('int64') * len(self.units) + unit_codes) * len(CATEGORIES)
+        flat = []
+        for i, column in enumerate(self.indicators):
+            codes = pd.Categorical(df[column], categories=CATEGORIES).codes
+            counted = codes >= 0
+            flat.append(i * n_cells + cell[counted] + codes[counted])
+        counts = np.bincount(np.concatenate(flat) if flat else np.empty(0, dtype='int64'),
+                             minlength=len(self.indicators) * n_cells)
+        self.counts = counts.reshape(len(self.indicators), len(self.years), len(self.units), len(CATEGORIES))
+
+    def _unit_mask(self, level, value):
+        if level is None:
+            return slice(None)
+        return (self.units[level] == value).to_numpy()
+
+    def summary(self, level=None, value=None):
+        """Outlier and non-outlier totals and percentages per indicator.
+
+        ``level``/``value`` (e.g. ``'adm1', 'Bo'``) restrict the counts to
+        one admin area.
+        """
+        totals = self.counts[:, :, self._unit_mask(level, value)].sum(axis=(1, 2))
+        outliers = totals[:, CATEGORIES.index('Outlier')]
+        non_outliers = totals[:, CATEGORIES.index('Non-Outlier')]
+        records = outliers + non_outliers
+        with np.errstate(invalid='ignore', divide='ignore'):
+            outlier_share = outliers / records * 100
+            non_outlier_share = non_outliers / records * 100
+        return pd.DataFrame({
+            'Total Outliers': outliers,
+            'Total Non-Outliers': non_outliers,
+            'Total Records': records,
+            'Outlier Percentage': [f"{p:.2f}%" for p in outlier_share],
+            'Non-Outlier Percentage': [f"{p:.2f}%" for p in non_outlier_share],
+        }, index=self.indicators)
+
+    def by_year(self, indicator, level=None, value=None):
+        """Year x category counts of one indicator (years with data only)."""
+        counts = self.counts[self.indicators.index(indicator)][:, self._unit_mask(level, value)].sum(axis=1)
+        frame = pd.DataFrame(counts, index=self.years, columns=CATEGORIES)
+        frame.index.name = 'year'
+        return frame[(counts.sum(axis=1) > 0) & self.years.notna()]
+
+    def by_level(self, level, within=None, value=None):
+        """Long table of counts per indicator, year and ``level`` area.
+
+        ``within``/``value`` restrict it to the areas inside one admin area.
+        """
+        if level not in self.levels:
+            raise KeyError(f"Column '{level}' not found for the outlier summary")
+        mask = self._unit_mask(within, value)
+        area_codes, areas = pd.factorize(self.units[level][mask], sort=True, use_na_sentinel=False)
+        # Sum admin units into their areas along the unit axis
+        summed = np.zeros(self.counts.shape[:2] + (len(areas), len(CATEGORIES)), dtype=self.counts.dtype)
+        np.add.at(summed, (slice(None), slice(None), area_codes), self.counts[:, :, mask])
+        index = pd.MultiIndex.from_product([self.indicators, self.years, areas], names=['indicator', 'year', level])
+        frame = pd.DataFrame(summed.reshape(-1, len(CATEGORIES)), index=index, columns=CATEGORIES)
+        return frame[frame.sum(axis=1) > 0].reset_index()
@@ -0,0 +1,206 @@
+"""Outlier detection and winsorization of the routine indicators (page 07).
+
+The default method checks every indicator against the 1.5 x IQR fences of
+its own ``(hf_uid, year)`` group. :func:`process_outliers` computes Q1/Q3
+for all groups and all indicators in one grouped quantile call, broadcasts
+the fences back to the rows through the group codes and builds the bounds,
+category and winsorized columns as whole arrays, so there is no Python loop
+over groups and no merging of per-indicator results.
+
+Other methods are registered in ``OUTLIER_METHODS`` and return the same
+row-aligned ``(lower, upper)`` fences, so they share the rest of the
+engine. The robust ones work on the facility x month matrix
+(:class:`snt.panel.FacilityMonthPanel`) with reshapes and strided windows:
+
+* ``mad`` - median +/- threshold x scaled MAD per facility-year.
+* ``hampel`` - rolling median/MAD over a centred window of each facility's
+  full monthly series, so short years borrow strength from their neighbours.
+* ``seasonal`` - median/MAD of the same calendar month across all years of
+  the facility.
+"""
+import warnings
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+from snt.imputation import FLAG_COLUMN, reported_values
+from snt.panel import FacilityMonthPanel
+
+OUTLIER_COLUMNS = ['allout', 'susp', 'test', 'conf', 'maltreat', 'pres', 'maladm', 'maldth']
+ID_COLUMNS = ['adm1', 'adm2', 'adm3', 'hf', 'hf_uid', 'year', 'month', 'period', 'date', FLAG_COLUMN]
+GROUP_KEYS = ['hf_uid', 'year']
+CATEGORIES = ['Non-Outlier', 'Outlier']
+
+# Scales the MAD to the standard deviation of normally distributed data
+MAD_SCALE = 1.4826
+
+OUTLIER_METHODS = {}
+
+
+def outlier_method(name, scope='facility-year'):
+    """Register ``func(df, columns, **params) -> (lower, upper)`` as a method.
+
+    ``scope`` says which rows a value's fences depend on: its own
+    ``'facility-year'`` group, or the whole ``'facility'`` series. It tells
+    incremental runs (:mod:`snt.outlier_store`) what to recompute.
+    """
+    def register(func):
+        func.scope = scope
+        OUTLIER_METHODS[name] = func
+        return func
+    return register
+
+
+# Function to detect outliers using Scatterplot with Q1 and Q3 lines
+def detect_outliers_scatterplot(df, col):
+    Q1 = df[col].quantile(0.25)
+    Q3 = df[col].quantile(0.75)
+    IQR = Q3 - Q1
+    lower_bound = Q1 - 1.5 * IQR
+    upper_bound = Q3 + 1.5 * IQR
+    return lower_bound, upper_bound
+
+
+# Function to apply winsorization to a column
+def winsorize_series(series, lower_bound, upper_bound):
+    return series.clip(lower=lower_bound, upper=upper_bound)
+
+
+def usable_outlier_columns(df, columns=OUTLIER_COLUMNS):
+    """Return the columns that exist in ``df`` and are not entirely missing."""
+    return [col for col in columns if col in df.columns and not df[col].isnull().all()]
+
+
+def iqr_fences(df, columns, group_keys=GROUP_KEYS, multiplier=1.5):
+    """Per-group lower and upper fences for ``columns``.
+
+    Returns ``(codes, lower, upper)``: the group number of every row and two
+    ``(n_groups, n_columns)`` arrays, rows of ``df`` with a missing key get
+    code -1.
+    """
+    grouped = df.groupby(group_keys)
+    codes = grouped.ngroup().to_numpy()
+    quartiles = grouped[columns].quantile([0.25, 0.75])
+    q1 = quartiles.xs(0.25, level=-1).to_numpy(dtype='float64')
+    q3 = quartiles.xs(0.75, level=-1).to_numpy(dtype='float64')
+    iqr = q3 - q1
+    return codes, q1 - multiplier * iqr, q3 + multiplier * iqr
+
+
+@outlier_method('iqr')
+def iqr_bounds(df, columns, multiplier=1.5):
+    codes, lower, upper = iqr_fences(df, columns, multiplier=multiplier)
+    return lower[codes], upper[codes]
+
+
+def _median_mad(windows, axis):
+    # All-missing windows legitimately give NaN fences
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        median = np.nanmedian(windows, axis=axis, keepdims=True)
+        mad = np.nanmedian(np.abs(windows - median), axis=axis, keepdims=True) * MAD_SCALE
+    return median, mad
+
+
+def _panel_bounds(df, columns, fences):
+    """Apply ``fences(matrix) -> (lower, upper)`` to each column's facility x month matrix."""
+    panel = FacilityMonthPanel(df)
+    values = df[columns].to_numpy(dtype='float64', na_value=np.nan)
+    lower = np.empty_like(values)
+    upper = np.empty_like(values)
+    for j in range(len(columns)):
+        matrix_lower, matrix_upper = fences(panel, panel.to_matrix(values[:, j]))
+        lower[:, j] = panel.gather(matrix_lower)
+        upper[:, j] = panel.gather(matrix_upper)
+    return lower, upper
+
+
+@outlier_method('mad')
+def mad_bounds(df, columns, threshold=3.0):
+    def fences(panel, matrix):
+        years = panel.by_year(matrix)
+        median, mad = _median_mad(years, axis=2)
+        lower = np.broadcast_to(median - threshold * mad, years.shape).reshape(matrix.shape)
+        upper = np.broadcast_to(median + threshold * mad, years.shape).reshape(matrix.shape)
+        return lower, upper
+    return _panel_bounds(df, columns, fences)
+
+
+@outlier_method('hampel', scope='facility')
+def hampel_bounds(df, columns, window=3, threshold=3.0):
+    """``window`` months on each side of the month being checked."""
+    def fences(panel, matrix):
+        padded = np.pad(matrix, ((0, 0), (window, window)), constant_values=np.nan)
+        windows = sliding_window_view(padded, 2 * window + 1, axis=1)
+        median, mad = _median_mad(windows, axis=2)
+        return (median - threshold * mad)[..., 0], (median + threshold * mad)[..., 0]
+    return _panel_bounds(df, columns, fences)
+
+
+@outlier_method('seasonal', scope='facility')
+def seasonal_bounds(df, columns, threshold=3.0):
+    def fences(panel, matrix):
+        years = panel.by_year(matrix)
+        median, mad = _median_mad(years, axis=1)
+        lower = np.broadcast_to(median - threshold * mad, years.shape).reshape(matrix.shape)
+        upper = np.broadcast_to(median + threshold * mad, years.shape).reshape(matrix.shape)
+        return lower, upper
+    return _panel_bounds(df, columns, fences)
+
+
+def winsorize_block(values, lower, upper):
+    """Categories and winsorized values of ``values`` against row-aligned fences.
+
+    Missing fences (an all-missing group) flag nothing and clip nothing,
+    like ``Series.clip`` with a NaN bound.
+    """
+    below = values < lower
+    above = values > upper
+    winsorized = np.where(below, lower, np.where(above, upper, values))
+    return below | above, winsorized
+
+
+def build_outlier_frame(df, columns, outlier, lower, upper, winsorized):
+    """Assemble the wide result: id columns, then per indicator the value,
+    category, bounds and winsorized value (the layout page 07 exports)."""
+    data = {col: df[col].to_numpy() for col in ID_COLUMNS if col in df.columns}
+    for j, column in enumerate(columns):
+        data[column] = df[column].to_numpy()
+        data[f'{column}_category'] = pd.Categorical.from_codes(outlier[:, j].astype('int8'), CATEGORIES)
+        data[f'{column}_lower_bound'] = lower[:, j]
+        data[f'{column}_upper_bound'] = upper[:, j]
+        data[f'{column}_winsorized'] = winsorized[:, j]
+    return pd.DataFrame(data, index=df.index)
+
+
+def process_outliers(df, columns=OUTLIER_COLUMNS, method='iqr', **params):
+    """Winsorize every usable indicator in one vectorized pass.
+
+    ``method`` names an entry of ``OUTLIER_METHODS`` and ``params`` are
+    passed to it. Rows are returned grouped by facility-year (sorted by
+    ``hf_uid`` and ``year``); rows with a missing ``hf_uid`` or ``year`` are
+    dropped. On imputed data (see :mod:`snt.imputation`) the fences come
+    from the reported values only; imputed values are still checked against
+    them.
+    """
+    if method not in OUTLIER_METHODS:
+        raise ValueError(f"Unknown outlier method '{method}', expected one of {list(OUTLIER_METHODS)}")
+    columns = usable_outlier_columns(df, columns)
+    if not columns:
+        return None
+
+    df = df.dropna(subset=GROUP_KEYS).sort_values(GROUP_KEYS, kind='stable')
+    fence_df = df
+    if FLAG_COLUMN in df.columns:
+        fence_df = df.copy()
+        fence_df[columns] = reported_values(df, columns)
+    lower, upper = OUTLIER_METHODS[method](fence_df, columns, **params)
+    values = df[columns].to_numpy(dtype='float64', na_value=np.nan)
+    outlier, winsorized = winsorize_block(values, lower, upper)
+    return build_outlier_frame(df, columns, outlier, lower, upper, winsorized).reset_index(drop=True)
+
+
+def process_column_winsorization(df, column):
+    """Outlier result for a single indicator."""
+    return process_outliers(df, [column])
@@ -0,0 +1,56 @@
+"""Facility x month grid view of the long routine data tables.
+
+The routine data is stored long (one row per facility and month). Several
+computations are simpler and much faster on a dense ``(facility, month)``
+matrix: rolling windows over a facility's series, same-month comparisons
+across years, reporting completeness. :class:`FacilityMonthPanel` records
+where each row sits in that grid so values can be scattered into a matrix
+and results gathered back to the rows with plain NumPy indexing.
+"""
+import numpy as np
+import pandas as pd
+
+from snt.periods import periods_from_ordinals, row_ordinals
+
+
+class FacilityMonthPanel:
+    """Positions of the rows of ``df`` in a facility x month matrix.
+
+    Months run from January of the first year to December of the last one,
+    so the matrix can be reshaped to ``(facility, year, 12)``. Facilities are
+    sorted by ``facility_col``. If a facility has several rows for the same
+    month, the last one wins in :meth:`to_matrix`.
+    """
+
+    def __init__(self, df, facility_col='hf_uid'):
+        self.row_facility, self.facilities = pd.factorize(df[facility_col], sort=True)
+        ordinals = row_ordinals(df)
+        self.start = int(ordinals.min()) // 12 * 12
+        self.n_years = int(ordinals.max()) // 12 - self.start // 12 + 1
+        self.row_month = np.asarray(ordinals - self.start, dtype='int64')
+
+    @property
+    def shape(self):
+        return len(self.facilities), self.n_years * 12
+
+    @property
+    def first_year(self):
+        return 1970 + self.start // 12
+
+    @property
+    def periods(self):
+        """Monthly Periods labelling the matrix columns."""
+        return periods_from_ordinals(np.arange(self.start, self.start + self.shape[1]))
+
+    def to_matrix(self, values, fill=np.nan, dtype='float64'):
+        matrix = np.full(self.shape, fill, dtype=dtype)
+        matrix[self.row_facility, self.row_month] = values
+        return matrix
+
+    def by_year(self, matrix):
+        """View of a panel matrix as ``(facility, year, calendar month)``."""
+        return matrix.reshape(matrix.shape[0], self.n_years, 12)
+
+    def gather(self, matrix):
+        """Value of ``matrix`` at every row's facility and month."""
+        return matrix[self.row_facility, self.row_month]
@@ -0,0 +1,81 @@
+"""Monthly period dimension for the routine data.
+
+DHIS2 exports carry the reporting month as text ('January 2023'). It is
+parsed once, at ingest, into compact ``year`` (int16), ``month`` (int8) and
+``period`` (pandas monthly Period) columns, plus the ``Date`` label
+('2023-01') the pages already display. Only the distinct period names are
+parsed and the result is broadcast back to the rows through categorical
+codes, so the cost does not grow with the number of facilities.
+"""
+import numpy as np
+import pandas as pd
+
+MONTH_NAMES = ['January', 'February', 'March', 'April', 'May', 'June', 'July',
+               'August', 'September', 'October', 'November', 'December']
+MONTH_NUMBERS = {name: number for number, name in enumerate(MONTH_NAMES, start=1)}
+
+PERIOD_DTYPE = pd.PeriodDtype('M')
+
+
+def period_ordinals(year, month):
+    """Monthly Period ordinals (months since January 1970) for year/month arrays."""
+    return (np.asarray(year, dtype='int64') - 1970) * 12 + np.asarray(month, dtype='int64') - 1
+
+
+def periods_from_ordinals(ordinals):
+    return pd.arrays.PeriodArray(np.asarray(ordinals, dtype='int64'), dtype=PERIOD_DTYPE)
+
+
+def parse_periodname(periodname):
+    """Parse DHIS2 period names into a frame of year, month, period and Date.
+
+    Raises ValueError listing the names that are not '<Month> <year>'.
+    """
+    codes, names = pd.factorize(periodname)
+    if (codes < 0).any():
+        raise ValueError("Missing values in 'periodname'")
+
+    parts = pd.Series(names, dtype=object).str.strip().str.split(' ', n=1, expand=True)
+    month = parts[0].map(MONTH_NUMBERS)
+    year = pd.to_numeric(parts[1], errors='coerce')
+    bad = month.isna() | year.isna()
+    if bad.any():
+        raise ValueError(f"Unrecognised period names (expected values like 'January 2023'): {list(names[bad.to_numpy()][:10])}")
+
+    year = year.to_numpy(dtype='int16')
+    month = month.to_numpy(dtype='int8')
+    ordinals = period_ordinals(year, month)
+    labels = np.array([f'{y}-{m:02d}' for y, m in zip(year, month)], dtype=object)
+
+    return pd.DataFrame({
+        'year': year.take(codes),
+        'month': month.take(codes),
+        'period': periods_from_ordinals(ordinals.take(codes)),
+        'Date': labels.take(codes),
+    }, index=periodname.index)
+
+
+def add_period_dimension(df):
+    """Make sure ``df`` has a monthly ``period`` column.
+
+    For frames that went through a CSV (where ``period`` is text or missing)
+    it is rebuilt from the distinct ``period`` labels or, failing that, from
+    the integer ``year`` and ``month`` columns, without per-row string work.
+    """
+    if 'period' in df.columns and isinstance(df['period'].dtype, pd.PeriodDtype):
+        return df
+
+    if 'period' in df.columns:
+        codes, labels = pd.factorize(df['period'])
+        periods = pd.PeriodIndex(labels, freq='M')
+        df['period'] = pd.Categorical.from_codes(codes, periods).astype(PERIOD_DTYPE)
+    else:
+        df['period'] = periods_from_ordinals(period_ordinals(df['year'], df['month']))
+    return df
+
+
+def row_ordinals(df):
+    """Monthly Period ordinal of every row, from ``period`` or ``year``/``month``."""
+    if 'period' in df.columns and isinstance(df['period'].dtype, pd.PeriodDtype):
+        return df['period'].array.asi8
+    return period_ordinals(df['year'], df['month'])
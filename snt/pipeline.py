@@ -0,0 +1,162 @@
+"""Headless runner for the routine data pages 04 -> 05 -> 06 -> 07.
+
+Chains the same functions the upload pages use, in memory, and writes one
+Parquet checkpoint per stage so a failed or partial run can be resumed
+without re-reading the raw exports::
+
+    python -m snt.pipeline exports/*.xlsx --checkpoint-dir snt_run --output outlier_corrected_data.csv
+"""
+import argparse
+import logging
+import os
+
+import pandas as pd
+import pyarrow.parquet as pq
+
+from snt.cache import PIPELINE_DIR
+from snt.facilities import REGISTRY_PATH, create_hfid, rename_columns
+from snt.imputation import IMPUTATION_METHODS, impute_missing_months
+from snt.indicators import KEY_VARIABLES, create_variables, load_spec
+from snt.ingest import to_arrow_table, validate_and_combine_files
+from snt.outlier_store import OutlierStore
+from snt.outliers import OUTLIER_METHODS, process_outliers
+from snt.rollup import RollupStore
+
+logger = logging.getLogger(__name__)
+
+STAGES = ['combined', 'renamed', 'computed', 'outliers']
+
+# Rows per Parquet row group, small enough for SQL filters (snt.sql) to skip groups
+ROW_GROUP_SIZE = 65536
+
+
+def checkpoint_path(checkpoint_dir, stage):
+    return os.path.join(checkpoint_dir, f'{STAGES.index(stage) + 1:02d}_{stage}.parquet')
+
+
+def write_checkpoint(df, path):
+    """Write ``df`` to Parquet, turning mixed object columns into strings."""
+    pq.write_table(to_arrow_table(df), path, row_group_size=ROW_GROUP_SIZE)
+
+
+def read_checkpoint(path):
+    return pd.read_parquet(path)
+
+
+def _combine(df, options):
+    return validate_and_combine_files(options['files'], workers=options['workers'])
+
+
+def _rename(df, options):
+    return create_hfid(rename_columns(df), registry_path=options['registry'])
+
+
+def _compute(df, options):
+    spec = load_spec(options['indicators']) if options['indicators'] else None
+    return create_variables(df, spec)
+
+
+def _outliers(df, options):
+    df = df[[col for col in KEY_VARIABLES if col in df.columns]]
+    if options['impute']:
+        df = impute_missing_months(df, method=options['impute'])
+    if options['outlier_store']:
+        return OutlierStore(options['outlier_store']).update(df, method=options['outlier_method'])
+    return process_outliers(df, method=options['outlier_method'])
+
+
+STAGE_FUNCTIONS = {
+    'combined': _combine,
+    'renamed': _rename,
+    'computed': _compute,
+    'outliers': _outliers,
+}
+
+
+def run_pipeline(files=None, checkpoint_dir=None, resume=False, workers=1,
+                 registry_path=REGISTRY_PATH, indicators_path=None, outlier_method='iqr',
+                 incremental=False, impute=None):
+    """Run every stage and return a dict of stage name -> DataFrame.
+
+    With ``resume`` the latest existing checkpoint in ``checkpoint_dir`` is
+    loaded and only the stages after it are recomputed. ``workers`` is
+    passed to :func:`snt.ingest.validate_and_combine_files` and
+    ``registry_path`` to :func:`snt.facilities.create_hfid`.
+    ``indicators_path`` replaces the default indicator spec and
+    ``outlier_method`` picks an entry of ``snt.outliers.OUTLIER_METHODS``.
+    With ``incremental`` (requires ``checkpoint_dir``) the outlier stage
+    keeps an :class:`snt.outlier_store.OutlierStore` next to the checkpoints
+    and only recomputes the facility-years whose data changed.
+    ``impute`` (an entry of ``snt.imputation.IMPUTATION_METHODS``) fills the
+    missing months of the key variables before the outlier stage.
+    With a ``checkpoint_dir`` the computed key variables are also rolled up
+    into a :class:`snt.rollup.RollupStore` under ``<checkpoint_dir>/rollup``
+    (only new or changed months are aggregated again).
+    """
+    if incremental and not checkpoint_dir:
+        raise ValueError("Incremental outlier runs need a checkpoint directory")
+
+    start = 0
+    df = None
+    results = {}
+    if resume and checkpoint_dir:
+        for i in reversed(range(len(STAGES))):
+            path = checkpoint_path(checkpoint_dir, STAGES[i])
+            if os.path.exists(path):
+                logger.info("Resuming from %s", path)
+                df = read_checkpoint(path)
+                results[STAGES[i]] = df
+                start = i + 1
+                break
+
+    if start == 0 and not files:
+        raise ValueError("No input files given and no checkpoint to resume from")
+
+    if checkpoint_dir:
+        os.makedirs(checkpoint_dir, exist_ok=True)
+
+    options = {'files': files, 'workers': workers, 'registry': registry_path,
+               'indicators': indicators_path, 'outlier_method': outlier_method, 'impute': impute,
+               'outlier_store': os.path.join(checkpoint_dir, 'outlier_store') if incremental else None}
+    for stage in STAGES[start:]:
+        logger.info("Running stage %s", stage)
+        df = STAGE_FUNCTIONS[stage](df, options)
+        if df is None:
+            raise ValueError(f"Stage '{stage}' produced no data")
+        results[stage] = df
+        if checkpoint_dir:
+            write_checkpoint(df, checkpoint_path(checkpoint_dir, stage))
+
+    if checkpoint_dir and 'computed' in results:
+        RollupStore(os.path.join(checkpoint_dir, 'rollup')).update(results['computed'])
+
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the routine malaria data pipeline (pages 04-07) in one go.")
+    parser.add_argument('files', nargs='*', help="DHIS2 export files (.xlsx, .xls or .csv)")
+    parser.add_argument('--checkpoint-dir', default=PIPELINE_DIR, help="directory for the per-stage Parquet checkpoints")
+    parser.add_argument('--resume', action='store_true', help="continue from the latest checkpoint instead of re-reading the files")
+    parser.add_argument('--workers', type=int, default=0, help="processes used to read the exports (0 = one per core)")
+    parser.add_argument('--registry', default=REGISTRY_PATH, help="facility ID registry file (CSV)")
+    parser.add_argument('--indicators', help="indicator spec (JSON) to use instead of snt/indicators.json")
+    parser.add_argument('--outlier-method', default='iqr', choices=sorted(OUTLIER_METHODS), help="outlier detection method")
+    parser.add_argument('--impute', choices=IMPUTATION_METHODS, help="fill the missing months of the key variables before outlier detection")
+    parser.add_argument('--incremental', action='store_true', help="only recompute outliers for facility-years whose data changed since the last run")
+    parser.add_argument('--output', help="also write the outlier corrected data to this CSV file")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(levelname)s %(message)s')
+    results = run_pipeline(args.files, checkpoint_dir=args.checkpoint_dir, resume=args.resume,
+                           workers=args.workers or None, registry_path=args.registry,
+                           indicators_path=args.indicators, outlier_method=args.outlier_method,
+                           incremental=args.incremental, impute=args.impute)
+    final_df = results['outliers']
+    if args.output:
+        final_df.to_csv(args.output, index=False)
+    logger.info("Done: %d rows, %d columns", len(final_df), len(final_df.columns))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""Parsing of the KoboToolbox QR payloads of the school-based distribution (SBD) forms.
+
+Each submission carries the scanned school QR code as ``Key: value`` lines::
+
+    District: Bo
+    Chiefdom: Bumpeh
+    PHU name: Bumpeh CHC
+    Community name: Bumpeh
+    Name of school: R C Primary School
+
+:func:`parse_qr_payloads` factorizes the column (schools are scanned many
+times, so there are far fewer distinct payloads than submissions), runs one
+compiled pattern with a group per key over the distinct payloads with
+``str.extract`` and broadcasts the fields back to the rows through the codes. The result
+has one categorical column per field, aligned with the input.
+"""
+import re
+
+import numpy as np
+import pandas as pd
+
+QR_COLUMN = 'Scan QR code'
+
+# Payload key -> output column, in output order
+QR_FIELDS = {
+    'District': 'District',
+    'Chiefdom': 'Chiefdom',
+    'PHU name': 'PHU Name',
+    'Community name': 'Community Name',
+    'Name of school': 'School Name',
+}
+
+
+def payload_pattern(keys):
+    """One compiled pattern with a named group per key of ``keys``.
+
+    Each group is an optional lookahead from the start of the payload that
+    finds the first line starting with ``Key:``, so the keys can come in
+    any order and a missing key leaves only its own group empty. The value
+    is the rest of the line, so an empty value does not swallow the next
+    line.
+    """
+    return re.compile(''.join(rf'(?=(?:[^\n]*\n)*?{re.escape(key)}:[ \t]*(?P<field{i}>[^\n]*))?'
+                              for i, key in enumerate(keys)))
+
+
+QR_PATTERN = payload_pattern(QR_FIELDS)
+
+
+def parse_qr_payloads(payloads, fields=QR_FIELDS):
+    """One categorical column per entry of ``fields`` parsed from ``payloads``.
+
+    A field is missing where its key is absent or its value blank. The
+    index is the one of ``payloads``.
+    """
+    codes, uniques = pd.factorize(payloads)
+    pattern = QR_PATTERN if fields is QR_FIELDS else payload_pattern(fields)
+    table = pd.Series(uniques, dtype=object).astype(str).str.extract(pattern)
+
+    parsed = {}
+    for i, column in enumerate(fields.values()):
+        values = table[f'field{i}'].str.strip()
+        values = pd.Categorical(values.where(values != '').astype(object))
+        # Code -1 (missing payload) picks the appended -1
+        parsed[column] = pd.Categorical.from_codes(np.append(values.codes, -1)[codes], values.categories)
+    return pd.DataFrame(parsed, index=payloads.index)
+
+
+def extract_qr_fields(df, column=QR_COLUMN):
+    """``df`` with ``column`` replaced by the parsed QR fields (placed first)."""
+    return parse_qr_payloads(df[column]).join(df.drop(columns=column))
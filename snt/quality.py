@@ -0,0 +1,212 @@
+"""Consistency checks on the computed indicators (page 06).
+
+The rules are defined declaratively in ``quality_rules.json``; each entry
+has a ``description`` and one check:
+
+* ``{"compare": [a, op, b]}`` - ``a op b`` must hold (op is one of
+  ``<``, ``<=``, ``>``, ``>=``, ``==``), e.g. ``conf <= test``.
+* ``{"non_negative": [...]}`` - none of the columns is below zero.
+* ``{"jump": col, "factor": f}`` - a facility's ``col`` does not go from 0
+  in one month to more than ``f`` times its median in the next.
+
+:class:`QualityRules` compiles every rule to NumPy expressions over the
+whole table: the columns are read once into a float matrix and the jump
+rules run on a facility x month matrix (see :class:`snt.panel.FacilityMonthPanel`).
+A rule is only checked on the rows where its inputs are present. The result
+is a pair of bitsets per row (bit ``i`` is rule ``i``): the rules checked
+and the rules violated, from which :class:`QualityReport` derives the
+per-rule counts and a score per facility.
+"""
+import json
+import logging
+import operator
+import os
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from snt.panel import FacilityMonthPanel
+
+logger = logging.getLogger(__name__)
+
+RULES_PATH = os.path.join(os.path.dirname(__file__), 'quality_rules.json')
+
+CHECKS = ['compare', 'non_negative', 'jump']
+COMPARISONS = {'<': operator.lt, '<=': operator.le, '>': operator.gt, '>=': operator.ge, '==': operator.eq}
+
+ID_COLUMNS = ['adm1', 'adm2', 'adm3', 'hf', 'hf_uid', 'year', 'month']
+# Columns placing a row in the facility x month matrix, needed by the jump rules
+PANEL_COLUMNS = ['hf_uid', 'year', 'month']
+
+
+def load_rules(path=RULES_PATH):
+    with open(path) as f:
+        return json.load(f)
+
+
+def _check(name, definition):
+    checks = [check for check in CHECKS if check in definition]
+    if len(checks) != 1:
+        raise ValueError(f"Rule '{name}' must define exactly one of {CHECKS}")
+    check = checks[0]
+    if check == 'compare':
+        args = definition['compare']
+        if len(args) != 3 or args[1] not in COMPARISONS:
+            raise ValueError(f"Rule '{name}': compare takes [column, operator, column] "
+                             f"with an operator in {list(COMPARISONS)}")
+        columns = [args[0], args[2]]
+    elif check == 'non_negative':
+        columns = list(definition['non_negative'])
+    else:
+        columns = [definition['jump']]
+    return check, columns
+
+
+def _bitset_dtype(n_rules):
+    for dtype in ['uint8', 'uint16', 'uint32', 'uint64']:
+        if n_rules <= np.iinfo(dtype).bits:
+            return np.dtype(dtype)
+    raise ValueError(f"At most 64 rules can be checked at once, got {n_rules}")
+
+
+class QualityRules:
+    """Compiled form of a rule spec (see the module docstring)."""
+
+    def __init__(self, spec=None):
+        self.spec = load_rules() if spec is None else spec
+        self.checks = {name: _check(name, definition) for name, definition in self.spec.items()}
+        _bitset_dtype(len(self.spec))
+
+    def evaluate(self, df):
+        """Check every rule whose columns are in ``df`` and return a :class:`QualityReport`."""
+        rules = [name for name, (check, columns) in self.checks.items()
+                 if all(col in df.columns for col in columns + (PANEL_COLUMNS if check == 'jump' else []))]
+        skipped = [name for name in self.spec if name not in rules]
+        if skipped:
+            logger.info("Skipping rules with missing columns: %s", skipped)
+
+        columns = list(dict.fromkeys(col for name in rules for col in self.checks[name][1]))
+        X = df[columns].to_numpy(dtype='float64', na_value=np.nan)
+        position = {col: k for k, col in enumerate(columns)}
+
+        panel = None
+        if any(self.checks[name][0] == 'jump' for name in rules):
+            placed = df[PANEL_COLUMNS].notna().all(axis=1).to_numpy()
+            panel = (FacilityMonthPanel(df[placed]), placed) if placed.any() else None
+
+        dtype = _bitset_dtype(len(rules))
+        checked = np.zeros(len(df), dtype=dtype)
+        violated = np.zeros(len(df), dtype=dtype)
+        for bit, name in enumerate(rules):
+            check, rule_columns = self.checks[name]
+            values = X[:, [position[col] for col in rule_columns]]
+            if check == 'compare':
+                present = ~np.isnan(values).any(axis=1)
+                op = COMPARISONS[self.spec[name]['compare'][1]]
+                bad = present & ~op(values[:, 0], values[:, 1])
+            elif check == 'non_negative':
+                present = ~np.isnan(values).all(axis=1)
+                bad = (values < 0).any(axis=1)
+            else:
+                present, bad = self._jump(values[:, 0], panel, self.spec[name].get('factor', 10))
+            flag = dtype.type(1) << dtype.type(bit)
+            checked |= np.where(present, flag, 0).astype(dtype)
+            violated |= np.where(bad, flag, 0).astype(dtype)
+
+        return QualityReport(df, rules, [self.spec[name].get('description', name) for name in rules],
+                             checked, violated, skipped)
+
+    @staticmethod
+    def _jump(values, panel, factor):
+        """Rows whose value exceeds ``factor`` x the facility median right after a 0 month."""
+        present = np.zeros(len(values), dtype=bool)
+        bad = np.zeros(len(values), dtype=bool)
+        if panel is None:
+            return present, bad
+        panel, placed = panel
+        matrix = panel.to_matrix(values[placed])
+        with warnings.catch_warnings():
+            # Facilities that never reported have no median
+            warnings.simplefilter('ignore', RuntimeWarning)
+            median = np.nanmedian(matrix, axis=1)
+        previous = np.full_like(matrix, np.nan)
+        previous[:, 1:] = matrix[:, :-1]
+        checkable = ~np.isnan(matrix) & ~np.isnan(previous)
+        jump = checkable & (previous == 0) & (median[:, None] > 0) & (matrix > factor * median[:, None])
+        present[placed] = panel.gather(checkable)
+        bad[placed] = panel.gather(jump)
+        return present, bad
+
+
+class QualityReport:
+    """Checked and violated rule bitsets of every row of the evaluated table.
+
+    Bit ``i`` of ``checked``/``violated`` stands for ``rules[i]``; rules
+    listed in ``skipped`` had columns missing from the data.
+    """
+
+    def __init__(self, df, rules, descriptions, checked, violated, skipped):
+        self.rules = rules
+        self.descriptions = descriptions
+        self.checked = checked
+        self.violated = violated
+        self.skipped = skipped
+        self.ids = df[[col for col in ID_COLUMNS if col in df.columns]].reset_index(drop=True)
+
+    def _bits(self, bitset, bit):
+        return (bitset >> bitset.dtype.type(bit)) & 1 == 1
+
+    def rule_mask(self, rule):
+        """Rows violating ``rule``."""
+        return self._bits(self.violated, self.rules.index(rule))
+
+    def rule_summary(self):
+        """Rows checked and violated per rule."""
+        checked = [int(self._bits(self.checked, bit).sum()) for bit in range(len(self.rules))]
+        violated = [int(self._bits(self.violated, bit).sum()) for bit in range(len(self.rules))]
+        table = pd.DataFrame({'rule': self.rules, 'description': self.descriptions,
+                              'checked': checked, 'violations': violated})
+        with np.errstate(invalid='ignore', divide='ignore'):
+            table['violation_rate'] = np.round(table['violations'] / table['checked'] * 100, 2)
+        return table
+
+    def violations(self):
+        """Rows violating at least one rule, with their IDs, bitset and violated rule names."""
+        rows = np.flatnonzero(self.violated)
+        table = self.ids.iloc[rows].reset_index(drop=True)
+        table['violated_rules'] = self.violated[rows]
+        names = np.array(self.rules, dtype=object)
+        bits = np.column_stack([self._bits(self.violated[rows], bit) for bit in range(len(self.rules))]) \
+            if self.rules else np.zeros((len(rows), 0), dtype=bool)
+        table['rules'] = [', '.join(names[row]) for row in bits]
+        return table
+
+    def facility_scores(self):
+        """Checks, violations and score (% of checks passed) per facility, lowest score first."""
+        if 'hf_uid' not in self.ids.columns:
+            raise KeyError("Column 'hf_uid' not found for the facility scores")
+        placed = self.ids['hf_uid'].notna().to_numpy()
+        codes, facilities = pd.factorize(self.ids['hf_uid'][placed], sort=True)
+        checks = np.zeros(len(facilities), dtype='int64')
+        table = pd.DataFrame({'hf_uid': facilities})
+        for bit, rule in enumerate(self.rules):
+            checks += np.bincount(codes, weights=self._bits(self.checked[placed], bit), minlength=len(facilities)).astype('int64')
+            table[rule] = np.bincount(codes, weights=self._bits(self.violated[placed], bit),
+                                      minlength=len(facilities)).astype('int64')
+        table.insert(1, 'checks', checks)
+        table.insert(2, 'violations', table[self.rules].sum(axis=1))
+        with np.errstate(invalid='ignore', divide='ignore'):
+            table.insert(3, 'score', np.round(100 * (1 - table['violations'] / table['checks']), 2))
+
+        names = [col for col in ['adm1', 'adm2', 'adm3', 'hf'] if col in self.ids.columns]
+        if names:
+            first = self.ids[placed].drop_duplicates('hf_uid').set_index('hf_uid')[names]
+            table = table.join(first, on='hf_uid')
+            table = table[['hf_uid'] + names + [col for col in table.columns if col not in names and col != 'hf_uid']]
+        return table.sort_values(['score', 'hf_uid'], kind='stable').reset_index(drop=True)
+
+
+def check_quality(df, spec=None):
+    """Evaluate the data-quality rules (default ``quality_rules.json``) on ``df``."""
+    return QualityRules(spec).evaluate(df)
@@ -0,0 +1,177 @@
+"""Facility x month reporting status and reporting rates.
+
+A facility counts as reporting in a month when its key indicators add up
+to more than ``REPORTING_THRESHOLD``. :class:`ReportingMatrix` evaluates
+that once for the whole country and scatters it into a ``uint8``
+facility x month array (see :class:`snt.panel.FacilityMonthPanel`), with
+the months nobody reported for dropped. Facilities are ordered by region
+and, within a region, by number of months reported, and ``offsets`` marks
+where each region's rows start. A region's heatmap is then a slice of the
+array that can go straight to ``imshow``, and other pages can read
+reporting counts from the same matrix.
+
+:func:`reporting_rates` derives reporting rates (reports received /
+facilities expected to report) straight from the key variables. A facility
+is expected to report from its first active month (see
+:mod:`snt.activity`) to the last month in the data; it has reported a month
+when one of the ``reported`` indicators is present and not imputed (see
+:mod:`snt.imputation`). The default, ``conf`` alone, gives the
+confirmed-case reporting rate the pages show (the ``conf_rr_<year>``
+columns of the shipped workbooks, formerly ``report_conf``), which is the
+completeness of the indicator the incidence estimates are built on.
+Pass ``reported=REPORTING_VARIABLES`` to count a month as reported when any
+key indicator was submitted, the rule :mod:`snt.activity` uses. Both are facility x month matrices, summed per
+admin area with one ``np.add.reduceat`` over the facilities sorted by
+area, and per year by reshaping the months.
+"""
+import numpy as np
+import pandas as pd
+
+from snt.imputation import reported_values
+from snt.panel import FacilityMonthPanel
+
+REPORTING_VARIABLES = ['allout', 'susp', 'test', 'conf', 'maltreat']
+REPORTING_THRESHOLD = 1
+
+ADMIN_LEVELS = ['adm1', 'adm2', 'adm3']
+GRAINS = ['month', 'year']
+
+
+def reporting_status(df, columns=REPORTING_VARIABLES, threshold=REPORTING_THRESHOLD):
+    """1 for the rows whose ``columns`` sum to more than ``threshold``, else 0.
+
+    Imputed values (see :mod:`snt.imputation`) do not count as reported.
+    """
+    values = reported_values(df, columns)
+    return (np.nansum(values, axis=1) > threshold).astype('uint8')
+
+
+class ReportingMatrix:
+    """Reporting status of every facility (rows) in every month (columns).
+
+    ``group_col`` names the column the facilities are grouped by (the
+    region of a facility is the one of its first row).
+    """
+
+    def __init__(self, df, columns=REPORTING_VARIABLES, group_col='adm1',
+                 threshold=REPORTING_THRESHOLD):
+        # Rows that cannot be placed in the grid
+        df = df.dropna(subset=[col for col in ['hf_uid', 'period', 'year', 'month'] if col in df.columns])
+        panel = FacilityMonthPanel(df)
+        status = reporting_status(df, columns, threshold)
+
+        # Only the months that appear in the data
+        months = np.unique(panel.row_month)
+        full = panel.to_matrix(status, fill=0, dtype='uint8')[:, months]
+        self.periods = panel.periods[months]
+        self.labels = self.periods.strftime('%Y-%m')
+
+        # Region of each facility, regions in order of appearance
+        row_group, groups = pd.factorize(df[group_col], use_na_sentinel=False)
+        first_row = np.full(len(panel.facilities), len(df), dtype='int64')
+        np.minimum.at(first_row, panel.row_facility, np.arange(len(df)))
+        group_codes = row_group[first_row]
+        self.groups = pd.Index(groups)
+
+        reports = full.sum(axis=1, dtype='int64')
+        # Region first, most reported first, then by facility ID
+        order = np.lexsort((np.arange(len(reports)), -reports, group_codes))
+        self.matrix = full[order]
+        self.facilities = panel.facilities[order]
+        self.reports = reports[order]
+        counts = np.bincount(group_codes, minlength=len(self.groups))
+        # Rows of group g are matrix[offsets[g]:offsets[g + 1]]
+        self.offsets = np.concatenate([[0], np.cumsum(counts)])
+
+    @property
+    def shape(self):
+        return self.matrix.shape
+
+    def block(self, group):
+        """Rows of the facilities in ``group``."""
+        g = self.groups.get_loc(group)
+        return self.matrix[self.offsets[g]:self.offsets[g + 1]]
+
+    def group_facilities(self, group):
+        g = self.groups.get_loc(group)
+        return self.facilities[self.offsets[g]:self.offsets[g + 1]]
+
+    def packed(self):
+        """Bit-packed copy of the matrix (8 months per byte), for storage."""
+        return np.packbits(self.matrix, axis=1)
+
+
+def _facility_groups(df, panel, columns):
+    """Group number of every panel facility (by its first row) and the group labels."""
+    if not columns:
+        return np.zeros(len(panel.facilities), dtype='int64'), pd.DataFrame(index=[0])
+    row_group, groups = pd.MultiIndex.from_frame(df[columns]).factorize()
+    first_row = np.full(len(panel.facilities), len(df), dtype='int64')
+    np.minimum.at(first_row, panel.row_facility, np.arange(len(df)))
+    labels = groups.to_frame(index=False)
+    labels.columns = columns
+    return row_group[first_row], labels
+
+
+def reporting_rates(df, level='adm3', grain='month', reported='conf', activity_columns=REPORTING_VARIABLES):
+    """Reports, expected reports and reporting rate (%) per ``level`` area and ``grain``.
+
+    ``level`` is adm1, adm2, adm3 or None for the whole country; the result
+    carries the higher admin levels too (adm1 and adm2 for adm3). ``grain``
+    is ``'month'`` (a ``period`` column) or ``'year'``. The rate is missing
+    where no facility was expected to report. ``reported`` is one indicator
+    or a list of them (any present counts as a report).
+    """
+    if grain not in GRAINS:
+        raise ValueError(f"Unknown grain '{grain}', expected one of {GRAINS}")
+    if level is not None and level not in ADMIN_LEVELS:
+        raise ValueError(f"Unknown admin level '{level}', expected one of {ADMIN_LEVELS}")
+    columns = [] if level is None else [col for col in ADMIN_LEVELS[:ADMIN_LEVELS.index(level) + 1] if col in df.columns]
+    if level is not None and level not in columns:
+        raise KeyError(f"Column '{level}' not found for the reporting rates")
+
+    df = df.dropna(subset=[col for col in ['hf_uid', 'period', 'year', 'month'] if col in df.columns])
+    panel = FacilityMonthPanel(df)
+    n_months = panel.shape[1]
+
+    # Reported: one of the indicators is present; active: any key indicator above zero
+    reported = [reported] if isinstance(reported, str) else list(reported)
+    submitted = ~np.isnan(reported_values(df, reported))
+    reports = panel.to_matrix(submitted.any(axis=1), fill=False, dtype=bool)
+    values = reported_values(df, activity_columns)
+    active = panel.to_matrix((values > 0).any(axis=1), fill=False, dtype=bool)
+    first_active = np.where(active.any(axis=1), active.argmax(axis=1), n_months)
+    last_month = int(panel.row_month.max())
+    month = np.arange(n_months)
+    expected = (month >= first_active[:, None]) & (month <= last_month)
+
+    group_codes, labels = _facility_groups(df, panel, columns)
+    order = np.argsort(group_codes, kind='stable')
+    counts = np.bincount(group_codes, minlength=len(labels))
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    present = counts > 0
+    area_reports = np.add.reduceat((reports & expected)[order].astype('int64'), starts[present], axis=0)
+    area_expected = np.add.reduceat(expected[order].astype('int64'), starts[present], axis=0)
+    labels = labels[present].reset_index(drop=True)
+
+    # Months within the data only
+    first_month = int(panel.row_month.min())
+    if grain == 'year':
+        area_reports = panel.by_year(area_reports).sum(axis=2)
+        area_expected = panel.by_year(area_expected).sum(axis=2)
+        keys = pd.DataFrame({'year': np.arange(panel.first_year, panel.first_year + panel.n_years)})
+    else:
+        area_reports = area_reports[:, first_month:last_month + 1]
+        area_expected = area_expected[:, first_month:last_month + 1]
+        keys = pd.DataFrame({'period': panel.periods[first_month:last_month + 1]})
+
+    n_areas, n_keys = area_reports.shape
+    result = pd.concat([labels.iloc[np.repeat(np.arange(n_areas), n_keys)].reset_index(drop=True),
+                        keys.iloc[np.tile(np.arange(n_keys), n_areas)].reset_index(drop=True)], axis=1)
+    result = result.loc[:, [col for col in result.columns if col in columns or col in keys.columns]]
+    result['reports'] = area_reports.ravel()
+    result['expected'] = area_expected.ravel()
+    with np.errstate(invalid='ignore', divide='ignore'):
+        rate = np.where(result['expected'] > 0, result['reports'] / result['expected'] * 100, np.nan)
+    result['reporting_rate'] = np.round(rate, 2)
+    return result
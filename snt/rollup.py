@@ -0,0 +1,289 @@
+"""Pre-aggregated key variables over the admin hierarchy and months.
+
+:class:`RollupCube` holds the sum and the number of reported values of
+every indicator for each month at every level of the hierarchy: country,
+adm1, adm2, adm3 and facility (``hf_uid``). The facility level is one
+groupby over the rows; each higher level is summed from the level below,
+so the rows are only read once. The table is sorted by level and
+``offsets`` marks where each level starts, so the data behind a chart at
+any level and period is a slice of a small table instead of a groupby
+over the full dataset.
+
+:class:`RollupStore` keeps the cube on disk as one Parquet file per month
+(every level of that month in one columnar file), with a fingerprint (row
+count and an order-independent hash) of the rows behind each month. On
+:meth:`RollupStore.update` only the months that are new or whose rows
+changed are aggregated again, so appending a period costs one month of
+work. The months listed in ``rollup.json`` are the ones that can be read:
+the changed months are taken off the list before their files are
+rewritten (each through a temporary name and ``os.replace``) and put back
+once they are in place, all under a lock file, so an interrupted update
+leaves a cube with fewer months, never a half-written one.
+
+The pages read the cube the pipeline keeps under ``STORE_PATH``, or the one
+of an upload (:func:`cube_for_file`); :meth:`RollupCube.facility_months`
+gives its facility level in the layout of the key variables, for the
+reporting rates.
+"""
+import json
+import logging
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from snt.cache import PIPELINE_DIR, derived_from_upload, file_lock
+from snt.imputation import reported_values
+from snt.ingest import to_arrow_table
+
+logger = logging.getLogger(__name__)
+
+STORE_PATH = os.environ.get('SNT_ROLLUP_STORE', os.path.join(PIPELINE_DIR, 'rollup'))
+
+ROLLUP_INDICATORS = ['allout', 'susp', 'test', 'conf', 'maltreat', 'pres', 'maladm', 'maldth']
+ADMIN_COLUMNS = ['adm1', 'adm2', 'adm3', 'hf_uid']
+# Coarsest first; each level is keyed by the admin columns up to its own
+LEVELS = ['national', 'adm1', 'adm2', 'adm3', 'hf_uid']
+TIME_COLUMNS = ['year', 'month']
+
+
+def level_keys(level):
+    """Admin columns identifying an area of ``level``."""
+    if level not in LEVELS:
+        raise ValueError(f"Unknown level '{level}', expected one of {LEVELS}")
+    return ADMIN_COLUMNS[:LEVELS.index(level)]
+
+
+def _prepare(df, indicators):
+    missing = [col for col in ADMIN_COLUMNS + TIME_COLUMNS if col not in df.columns]
+    if missing:
+        raise KeyError(f"Columns not found for the rollup: {missing}")
+    indicators = [col for col in indicators if col in df.columns]
+    return df.dropna(subset=['hf_uid'] + TIME_COLUMNS), indicators
+
+
+def aggregate(df, indicators=ROLLUP_INDICATORS):
+    """Rollup rows of every level for the rows of ``df``, sorted by level and month.
+
+    Each indicator gives a sum column (named after it) and a ``<indicator>_n``
+    count of the reported values (present and not imputed, see
+    :mod:`snt.imputation`); ``rows`` counts the rows.
+    """
+    df, indicators = _prepare(df, indicators)
+    values = df[indicators].to_numpy(dtype='float64', na_value=np.nan)
+    reported = ~np.isnan(reported_values(df, indicators))
+    frame = pd.DataFrame({col: df[col].to_numpy() for col in ADMIN_COLUMNS})
+    frame['year'] = df['year'].to_numpy(dtype='int64')
+    frame['month'] = df['month'].to_numpy(dtype='int64')
+    frame['rows'] = 1
+    for i, col in enumerate(indicators):
+        frame[col] = np.nan_to_num(values[:, i])
+        frame[f'{col}_n'] = reported[:, i]
+
+    measures = ['rows'] + [name for col in indicators for name in (col, f'{col}_n')]
+    parts = []
+    current = frame
+    # Finest level first, each one summed from the previous one
+    for level in reversed(LEVELS):
+        keys = level_keys(level)
+        current = current.groupby(keys + TIME_COLUMNS, dropna=False, sort=True)[measures].sum().reset_index()
+        part = current.copy()
+        part.insert(0, 'level', level)
+        parts.append(part)
+
+    table = pd.concat(parts[::-1], ignore_index=True)
+    for col in ADMIN_COLUMNS:
+        # Missing above the area's own level
+        table[col] = table[col].astype(object).where(table[col].notna(), None)
+    for col in measures:
+        if col == 'rows' or col.endswith('_n'):
+            table[col] = table[col].astype('int64')
+    return table[['level'] + ADMIN_COLUMNS + TIME_COLUMNS + measures]
+
+
+class RollupCube:
+    """Rollup table of every level, with the row range of each level.
+
+    ``table`` rows are sorted by level (``LEVELS`` order), month and area;
+    the rows of a level are ``table.iloc[offsets[i]:offsets[i + 1]]``.
+    """
+
+    def __init__(self, table):
+        codes = pd.Categorical(table['level'], categories=LEVELS).codes
+        if (codes < 0).any():
+            raise ValueError(f"Unknown levels in the rollup table: {sorted(set(table['level'][codes < 0]))}")
+        order = np.lexsort(tuple(table[col].to_numpy() for col in ['month', 'year']) + (codes,))
+        self.table = table.iloc[order].reset_index(drop=True)
+        self.offsets = np.concatenate([[0], np.cumsum(np.bincount(codes, minlength=len(LEVELS)))])
+        self.indicators = [col for col in ROLLUP_INDICATORS if col in table.columns]
+
+    @classmethod
+    def from_frame(cls, df, indicators=ROLLUP_INDICATORS):
+        return cls(aggregate(df, indicators))
+
+    def level(self, level):
+        """Rows of one level, one per area and month."""
+        level_keys(level)
+        i = LEVELS.index(level)
+        return self.table.iloc[self.offsets[i]:self.offsets[i + 1]]
+
+    @property
+    def periods(self):
+        """(year, month) pairs in the cube, in order."""
+        national = self.level('national')
+        return list(zip(national['year'].tolist(), national['month'].tolist()))
+
+    def slice(self, level='national', year=None, month=None, grain='month', **areas):
+        """Indicator totals of ``level`` areas, per month or per year.
+
+        ``year`` and ``month`` (single values or lists) restrict the
+        periods; ``areas`` (e.g. ``adm1='Bo'``) restrict the areas to those
+        inside a higher-level area. With ``grain='year'`` the months are
+        summed into years.
+        """
+        rows = self.level(level)
+        mask = np.ones(len(rows), dtype=bool)
+        for col, value in [('year', year), ('month', month)] + list(areas.items()):
+            if value is None:
+                continue
+            if col not in level_keys(level) + TIME_COLUMNS:
+                raise KeyError(f"Column '{col}' is not a key of the '{level}' level")
+            values = value if isinstance(value, (list, tuple, set, np.ndarray, pd.Index)) else [value]
+            mask &= rows[col].isin(values).to_numpy()
+        rows = rows[mask]
+
+        keys = level_keys(level)
+        rows = rows.drop(columns=['level'] + ADMIN_COLUMNS[len(keys):])
+        if grain == 'year':
+            rows = rows.drop(columns='month').groupby(keys + ['year'], dropna=False, sort=True).sum().reset_index()
+        elif grain != 'month':
+            raise ValueError(f"Unknown grain '{grain}', expected 'month' or 'year'")
+        return rows.reset_index(drop=True)
+
+    def facility_months(self, **areas):
+        """Facility level as key variables rows, one per facility and month.
+
+        Each indicator is the facility's total where a value was reported
+        that month and missing otherwise, which is what
+        :func:`snt.reporting.reporting_rates` reads.
+        """
+        rows = self.slice('hf_uid', **areas)
+        for col in self.indicators:
+            rows[col] = rows[col].where(rows[f'{col}_n'].to_numpy() > 0)
+        return rows.drop(columns=['rows'] + [f'{col}_n' for col in self.indicators])
+
+
+def cube_for_file(file):
+    """:class:`RollupCube` of a dataset file or upload, built once per content."""
+    return derived_from_upload(file, 'rollup_cube', RollupCube.from_frame)
+
+
+def period_keys(years, months):
+    """``year * 100 + month`` of every row, the integer form of a 'YYYY-MM' label."""
+    return np.asarray(years, dtype='int64') * 100 + np.asarray(months, dtype='int64')
+
+
+def period_labels(keys):
+    """'YYYY-MM' labels of ``period_keys`` values."""
+    keys = np.asarray(keys, dtype='int64')
+    return np.char.add(np.char.add((keys // 100).astype(str), '-'), np.char.zfill((keys % 100).astype(str), 2))
+
+
+def period_fingerprints(df, indicators=ROLLUP_INDICATORS):
+    """Row count and summed row hash of every (year, month), keyed by 'YYYY-MM'."""
+    df, indicators = _prepare(df, indicators)
+    row_hash = pd.util.hash_pandas_object(df[ADMIN_COLUMNS + TIME_COLUMNS + indicators], index=False).to_numpy()
+    grouped = (pd.Series(row_hash, index=period_keys(df['year'], df['month']))
+               .groupby(level=0).agg(['size', 'sum']))
+    return dict(zip(period_labels(grouped.index).tolist(),
+                    np.column_stack([grouped['size'], grouped['sum']]).tolist()))
+
+
+class RollupStore:
+    """Directory with one Parquet rollup file per month and their fingerprints."""
+
+    def __init__(self, path=STORE_PATH):
+        self.path = path
+        self.meta_path = os.path.join(path, 'rollup.json')
+        self.lock_path = os.path.join(path, 'rollup.lock')
+        # Month counts of the latest update(), for reporting
+        self.last_update = None
+
+    def period_path(self, period):
+        return os.path.join(self.path, f'{period}.parquet')
+
+    def exists(self):
+        return os.path.exists(self.meta_path)
+
+    def _load_meta(self):
+        with open(self.meta_path) as f:
+            return json.load(f)
+
+    def _write(self, path, write):
+        tmp = f'{path}.{os.getpid()}.tmp'
+        write(tmp)
+        os.replace(tmp, path)
+
+    def _save_meta(self, indicators, periods):
+        def write(tmp):
+            with open(tmp, 'w') as f:
+                json.dump({'indicators': indicators, 'periods': periods}, f)
+        self._write(self.meta_path, write)
+
+    def load(self):
+        meta = self._load_meta()
+        tables = [pq.read_table(self.period_path(period)) for period in sorted(meta['periods'])]
+        if not tables:
+            return RollupCube(aggregate(pd.DataFrame(columns=ADMIN_COLUMNS + TIME_COLUMNS), meta['indicators']))
+        return RollupCube(pa.concat_tables(tables, promote_options='permissive').to_pandas())
+
+    def update(self, df, indicators=ROLLUP_INDICATORS):
+        """Bring the stored months up to date with ``df`` and return the cube.
+
+        Months are rebuilt when new or changed; everything is rebuilt when
+        the indicators differ from the stored ones.
+        """
+        os.makedirs(self.path, exist_ok=True)
+        with file_lock(self.lock_path):
+            self._update(df, indicators)
+            return self.load()
+
+    def _update(self, df, indicators):
+        indicators = [col for col in indicators if col in df.columns]
+        fingerprints = period_fingerprints(df, indicators)
+
+        stored = {}
+        if self.exists():
+            meta = self._load_meta()
+            if meta['indicators'] == indicators:
+                stored = meta['periods']
+            else:
+                logger.info("Rollup indicators changed, rebuilding every month")
+
+        dirty = [period for period, fingerprint in fingerprints.items() if stored.get(period) != fingerprint]
+        logger.info("Aggregating %d of %d months", len(dirty), len(fingerprints))
+
+        # Only the months that stay as they are remain readable meanwhile
+        unchanged = {period: fingerprints[period] for period in fingerprints if period not in dirty}
+        self._save_meta(indicators, unchanged)
+
+        if dirty:
+            df, _ = _prepare(df, indicators)
+            row_keys = period_keys(df['year'], df['month'])
+            dirty_keys = np.array([int(period.replace('-', '')) for period in dirty], dtype='int64')
+            table = aggregate(df[np.isin(row_keys, dirty_keys)], indicators)
+            table_keys = period_keys(table['year'], table['month'])
+            for key, part in table.groupby(table_keys, sort=False):
+                self._write(self.period_path(period_labels([key])[0]),
+                            lambda tmp: pq.write_table(to_arrow_table(part), tmp))
+
+        for period in set(stored) - set(fingerprints):
+            try:
+                os.remove(self.period_path(period))
+            except FileNotFoundError:
+                pass
+
+        self._save_meta(indicators, fingerprints)
+        self.last_update = {'months': len(fingerprints), 'rebuilt': len(dirty)}
@@ -0,0 +1,165 @@
+"""District maps of the SBD schools, rendered for every district in a process pool.
+
+The SBD page used to draw two hardcoded districts (BO and BOMBALI) inline
+with pyplot. :func:`render_district_maps` renders the chiefdom map of every
+district of the shapefile with its school points and ``S1``, ``S2``, ...
+labels. Each map is one task of a ``ProcessPoolExecutor``. The workers draw
+on plain :class:`matplotlib.figure.Figure` objects (Agg canvas, no pyplot
+state) and return PNG bytes. The results are yielded as they finish, so
+the page can advance its progress bar and fill the ZIP and the report while
+the other maps render. A map that fails to render is logged and comes back
+as ``None``, so one bad district does not stop the others.
+
+Districts are matched to the ``District`` of the QR payload case-insensitively
+("Bo" in the forms, "BO" in the shapefile). Finished maps are kept in memory
+(the last ``MAX_MAPS``), keyed by the shapefile version, district, points and
+dpi, so reruns of the page with the same data do not render them again.
+"""
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from io import BytesIO
+
+import numpy as np
+
+from snt.basemap import SHAPEFILE, base_map, load_boundaries
+from snt.school_locations import LATITUDE, LONGITUDE
+
+logger = logging.getLogger(__name__)
+
+DPI = 300
+FIGSIZE = (14, 8)
+# Map units around the schools when they reach past the district
+POINT_MARGIN = 0.05
+
+MAX_MAPS = 32
+
+_maps = OrderedDict()
+_lock = threading.Lock()
+
+
+def district_points(df, districts):
+    """``district -> (longitudes, latitudes)`` of the schools of each of ``districts``.
+
+    Without the coordinate columns of :mod:`snt.school_locations` every
+    district gets no points.
+    """
+    if LATITUDE not in df.columns or LONGITUDE not in df.columns:
+        return {district: (np.empty(0), np.empty(0)) for district in districts}
+    names = df['District'].astype('string').str.upper().str.strip().to_numpy(dtype=object, na_value=None)
+    lons = df[LONGITUDE].to_numpy(dtype='float64')
+    lats = df[LATITUDE].to_numpy(dtype='float64')
+    valid = ~(np.isnan(lons) | np.isnan(lats))
+
+    points = {}
+    for district in districts:
+        rows = valid & (names == str(district).upper().strip())
+        points[district] = (lons[rows], lats[rows])
+    return points
+
+
+def render_district_map(district, lons, lats, dpi=DPI, path=SHAPEFILE):
+    """PNG bytes of the chiefdom map of ``district`` with the schools at ``lons``, ``lats``."""
+    from matplotlib.figure import Figure
+
+    basemap = base_map('sbd_district', district=district, aspect=1.0, path=path)
+    fig = Figure(figsize=FIGSIZE)
+    ax = fig.subplots()
+    basemap.draw(ax)
+
+    title = f'{district} District - Chiefdoms: {int(basemap.mask.sum())}'
+    if len(lons):
+        ax.scatter(lons, lats, c='red', s=150, alpha=1.0, edgecolors='white', linewidth=3, zorder=100,
+                   label=f'Schools ({len(lons)})', marker='o')
+        for i, (lon, lat) in enumerate(zip(lons, lats)):
+            ax.annotate(f'S{i + 1}', (lon, lat), xytext=(5, 5), textcoords='offset points', fontsize=10,
+                        fontweight='bold', color='red',
+                        bbox=dict(boxstyle='round,pad=0.2', facecolor='white', alpha=0.8))
+        # Keep the district in view and reach out to every school
+        x0, x1, y0, y1 = basemap.extent
+        ax.set_xlim(min(x0, lons.min() - POINT_MARGIN), max(x1, lons.max() + POINT_MARGIN))
+        ax.set_ylim(min(y0, lats.min() - POINT_MARGIN), max(y1, lats.max() + POINT_MARGIN))
+        ax.legend(fontsize=12, loc='best')
+        title += f' | GPS Points: {len(lons)}'
+
+    ax.set_title(title, fontsize=16, fontweight='bold')
+    ax.set_xlabel('Longitude', fontsize=12)
+    ax.set_ylabel('Latitude', fontsize=12)
+    ax.grid(True, alpha=0.3, linestyle='--')
+    fig.tight_layout()
+
+    buffer = BytesIO()
+    fig.savefig(buffer, format='png', dpi=dpi, bbox_inches='tight', facecolor='white', edgecolor='none')
+    return buffer.getvalue()
+
+
+def _map_key(boundaries, district, lons, lats, dpi):
+    digest = hashlib.blake2b(lons.tobytes(), digest_size=16)
+    digest.update(lats.tobytes())
+    return (boundaries.key, district, dpi, digest.hexdigest())
+
+
+def _remember(key, png):
+    with _lock:
+        _maps[key] = png
+        _maps.move_to_end(key)
+        while len(_maps) > MAX_MAPS:
+            _maps.popitem(last=False)
+
+
+def render_district_maps(df, districts=None, workers=None, dpi=DPI, path=SHAPEFILE):
+    """Yield ``(district, png bytes)`` for the map of each district as it finishes.
+
+    ``districts`` defaults to every district of the shapefile. With
+    ``workers`` > 1 (or None for one per core) the maps render in a process
+    pool and come in completion order; with ``workers=1`` they render one
+    after the other in the calling process. Maps already rendered for the
+    same points are yielded first, from memory. A district whose map fails
+    to render is yielded with ``None`` and the error is logged.
+    """
+    boundaries = load_boundaries(path)
+    if districts is None:
+        districts = list(boundaries.districts.index)
+    points = district_points(df, districts)
+
+    tasks = {}
+    for district in districts:
+        lons, lats = points[district]
+        key = _map_key(boundaries, district, lons, lats, dpi)
+        with _lock:
+            png = _maps.get(key)
+        if png is None:
+            tasks[district] = key
+        else:
+            yield district, png
+
+    if not tasks:
+        return
+    logger.info("Rendering %d district maps with %s workers", len(tasks), workers or 'all')
+    if workers == 1 or len(tasks) == 1:
+        for district, key in tasks.items():
+            try:
+                png = render_district_map(district, *points[district], dpi, path)
+            except Exception:
+                logger.exception("Could not render the map of %s", district)
+                yield district, None
+                continue
+            _remember(key, png)
+            yield district, png
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(render_district_map, district, *points[district], dpi, path): district
+                   for district in tasks}
+        for future in as_completed(futures):
+            district = futures[future]
+            try:
+                png = future.result()
+            except Exception:
+                logger.exception("Could not render the map of %s", district)
+                yield district, None
+                continue
+            _remember(tasks[district], png)
+            yield district, png
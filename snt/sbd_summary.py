@@ -0,0 +1,158 @@
+"""Enrollment and ITN totals of the school-based distribution (SBD) forms.
+
+Each school record has per-class counts (boys, girls, enrollments and ITNs
+distributed, classes 1-5) in separate columns. :class:`SBDRollup` melts
+those columns once into a float matrix with a ``(measure, class)`` column
+index, sums it in one groupby over (District, Chiefdom) and derives the
+district subtotals and the overall total from that small table, so every
+chart, table and the Word report of the SBD page reads the same numbers.
+
+The derived totals follow the page's definitions: ``enrollment`` is boys +
+girls, ``coverage`` is ITNs per 100 enrolled and ``gender_ratio`` girls per
+100 boys (0 where the denominator is 0). Missing counts count as 0.
+"""
+import numpy as np
+import pandas as pd
+
+# Measure -> column template of its per-class counts
+CLASS_MEASURES = {
+    'boys': 'Number of boys in class {}',
+    'girls': 'Number of girls in class {}',
+    'enrollments': 'Number of enrollments in class {}',
+    'itn': 'Number of ITN distributed to class {}',
+}
+CLASSES = [1, 2, 3, 4, 5]
+AREA_COLUMNS = ['District', 'Chiefdom']
+LEVELS = ['overall', 'district', 'chiefdom']
+
+
+def class_columns(df):
+    """``(measure, class)`` -> column of ``df`` for the per-class counts present."""
+    return {(measure, number): template.format(number)
+            for number in CLASSES for measure, template in CLASS_MEASURES.items()
+            if template.format(number) in df.columns}
+
+
+def melt_classes(df):
+    """Per-class counts of ``df`` as floats with a ``(measure, class)`` column index."""
+    columns = class_columns(df)
+    values = df[list(columns.values())].to_numpy(dtype='float64', na_value=np.nan)
+    index = pd.MultiIndex.from_tuples(list(columns), names=['measure', 'class'])
+    return pd.DataFrame(np.nan_to_num(values), index=df.index, columns=index)
+
+
+def _totals(counts, schools):
+    """Summary columns of a table of summed per-class counts."""
+    measures = counts.columns.get_level_values('measure')
+    table = pd.DataFrame({'schools': schools}, index=counts.index)
+    for measure in ['boys', 'girls', 'itn']:
+        table[measure] = counts.loc[:, measures == measure].sum(axis=1)
+    table['enrollment'] = table['boys'] + table['girls']
+    with np.errstate(invalid='ignore', divide='ignore'):
+        table['coverage'] = np.where(table['enrollment'] > 0, table['itn'] / table['enrollment'] * 100, 0.0)
+        table['gender_ratio'] = np.where(table['boys'] > 0, table['girls'] / table['boys'] * 100, 0.0)
+    return table[['schools', 'boys', 'girls', 'enrollment', 'itn', 'coverage', 'gender_ratio']]
+
+
+class SBDRollup:
+    """Per-class and total counts of the SBD records overall, per district and per chiefdom.
+
+    Districts come in order of first appearance in the data, chiefdoms in
+    order of first appearance within their district. Records without a
+    district (chiefdom) only count in the overall (district) totals.
+    """
+
+    def __init__(self, df):
+        missing = [col for col in AREA_COLUMNS if col not in df.columns]
+        if missing:
+            raise KeyError(f"Columns not found for the SBD summary: {missing}")
+        grouped = melt_classes(df).groupby([df[col] for col in AREA_COLUMNS], dropna=False,
+                                           observed=True, sort=False)
+        chiefdoms = grouped.sum()
+        schools = grouped.size()
+
+        districts = chiefdoms.groupby(level='District', dropna=False, sort=False).sum()
+        district_schools = schools.groupby(level='District', dropna=False, sort=False).sum()
+        # Chiefdoms grouped under their district, keeping the order of appearance
+        rank = pd.Index(districts.index).get_indexer(chiefdoms.index.get_level_values('District'))
+        order = np.argsort(rank, kind='stable')
+
+        self.counts = {
+            'overall': districts.sum().to_frame().T,
+            'district': districts,
+            'chiefdom': chiefdoms.iloc[order],
+        }
+        self.schools = {
+            'overall': pd.Series([len(df)]),
+            'district': district_schools,
+            'chiefdom': schools.iloc[order],
+        }
+        self.total_districts = len(df['District'].dropna().unique())
+        self.total_chiefdoms = len(df['Chiefdom'].dropna().unique())
+
+    def _areas(self, level):
+        """Rows of ``level`` with a known area."""
+        if level not in LEVELS:
+            raise ValueError(f"Unknown level '{level}', expected one of {LEVELS}")
+        if level == 'overall':
+            return np.ones(1, dtype=bool)
+        index = self.counts[level].index
+        keys = AREA_COLUMNS[:LEVELS.index(level)]
+        return np.logical_and.reduce([pd.notna(index.get_level_values(col)) for col in keys])
+
+    def table(self, level):
+        """Schools, boys, girls, enrollment, ITNs, coverage and gender ratio of each area of ``level``."""
+        known = self._areas(level)
+        table = _totals(self.counts[level], self.schools[level].to_numpy())[known]
+        if level == 'overall':
+            return table.reset_index(drop=True)
+        if level == 'district':
+            table.insert(1, 'chiefdoms', self._chiefdoms_per_district(table.index))
+        table = table.reset_index()
+        table.columns = [col.lower() if col in AREA_COLUMNS else col for col in table.columns]
+        return table
+
+    def _chiefdoms_per_district(self, districts):
+        chiefdoms = self.counts['chiefdom'].index[self._areas('chiefdom')]
+        per_district = pd.Series(chiefdoms.get_level_values('District')).value_counts()
+        return per_district.reindex(districts, fill_value=0).to_numpy()
+
+    def class_table(self, level):
+        """Summed per-class counts of each area of ``level``, named like the form columns.
+
+        Columns follow the form order (enrollments, boys, girls per class);
+        ``Total Enrollment`` sums the enrollments columns.
+        """
+        if level == 'overall':
+            raise ValueError("The class table is per district or chiefdom")
+        known = self._areas(level)
+        counts = self.counts[level][known]
+        columns = [(measure, number) for number in CLASSES for measure in ['enrollments', 'boys', 'girls']
+                   if (measure, number) in counts.columns]
+        table = counts[columns].set_axis([CLASS_MEASURES[measure].format(number) for measure, number in columns],
+                                         axis=1)
+        table['Total Enrollment'] = counts.loc[:, counts.columns.get_level_values('measure') == 'enrollments'].sum(axis=1)
+        return table.reset_index()
+
+    def overall(self):
+        """Overall totals, keyed like the page's summary metrics."""
+        totals = self.table('overall').iloc[0]
+        return {
+            'total_schools': int(totals['schools']),
+            'total_districts': self.total_districts,
+            'total_chiefdoms': self.total_chiefdoms,
+            'total_boys': totals['boys'],
+            'total_girls': totals['girls'],
+            'total_enrollment': totals['enrollment'],
+            'total_itn': totals['itn'],
+            'coverage': totals['coverage'],
+            'gender_ratio': totals['gender_ratio'],
+        }
+
+    def summaries(self):
+        """Overall totals and the district and chiefdom rows as records."""
+        return {
+            'overall': self.overall(),
+            'district': self.table('district').to_dict('records'),
+            'chiefdom': self.table('chiefdom').to_dict('records'),
+        }
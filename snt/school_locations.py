@@ -0,0 +1,142 @@
+"""School coordinates of the SBD records and their check against the chiefdom boundaries.
+
+The forms store the school's position as a ``"lat,lon"`` string in the
+``GPS Location`` column. :func:`parse_gps` splits and converts the whole
+column with vectorized string operations; coordinates that do not parse or
+fall outside Sierra Leone are left missing.
+
+:func:`locate_schools` then looks up the chiefdom polygon containing each
+point with the spatial index of the chiefdom boundaries (one bulk
+``sindex.query`` for all the points) and compares it with the chiefdom
+claimed in the school's QR payload. The payload and shapefile spell the
+names differently ("Gbendembu Chiefdom" vs "GBENDEMBU"), so both are
+compared by district and :func:`chiefdom_key`, with ``CHIEFDOM_ALIASES``
+for the spellings that differ beyond case and suffixes.
+
+The result is computed once per dataset and shared by every map of the page.
+"""
+import logging
+import re
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+GPS_COLUMN = 'GPS Location'
+LATITUDE = 'Latitude'
+LONGITUDE = 'Longitude'
+GPS_CHIEFDOM = 'GPS Chiefdom'
+MISMATCH_COLUMN = 'GPS Mismatch'
+
+# Shapefile columns of the district and chiefdom names
+DISTRICT_FIELD = 'FIRST_DNAM'
+CHIEFDOM_FIELD = 'FIRST_CHIE'
+
+# (lat_min, lat_max, lon_min, lon_max) of valid coordinates
+SIERRA_LEONE_BOUNDS = (6.0, 11.0, -14.0, -10.0)
+
+# Payload spelling -> shapefile spelling, both as chiefdom keys
+CHIEFDOM_ALIASES = {
+    'BUMPEH': 'BUMPE NGAO',
+    'BARGBO': 'BAGBO',
+    'BAOMA': 'BOAMA',
+    'BOMBALI SERRY': 'BOMBALI SIARI',
+    'MAGBAIMBA NDOHAHUN': 'MAGBAIMBA NDORWAHUN',
+    'MAKARIE': 'MAKARI',
+}
+
+GPS_PATTERN = re.compile(r'^\s*([^,]+?)\s*,\s*([^,]+?)\s*$')
+
+
+def parse_gps(values, bounds=SIERRA_LEONE_BOUNDS):
+    """``Latitude`` and ``Longitude`` float columns parsed from ``"lat,lon"`` strings.
+
+    Values that are not two numbers separated by a comma, or that fall
+    outside ``bounds``, are NaN.
+    """
+    parts = values.astype('string').str.extract(GPS_PATTERN)
+    lat = pd.to_numeric(parts[0], errors='coerce').to_numpy(dtype='float64', na_value=np.nan)
+    lon = pd.to_numeric(parts[1], errors='coerce').to_numpy(dtype='float64', na_value=np.nan)
+
+    lat_min, lat_max, lon_min, lon_max = bounds
+    valid = (lat >= lat_min) & (lat <= lat_max) & (lon >= lon_min) & (lon <= lon_max)
+    dropped = int((values.notna().to_numpy() & ~valid).sum())
+    if dropped:
+        logger.info("Dropped %d GPS values that do not parse or fall outside %s", dropped, bounds)
+    return pd.DataFrame({LATITUDE: np.where(valid, lat, np.nan), LONGITUDE: np.where(valid, lon, np.nan)},
+                        index=values.index)
+
+
+def chiefdom_key(names):
+    """Comparable form of chiefdom names: upper case, without a "Chiefdom" suffix,
+    parenthesized parts or punctuation, and with the known aliases applied."""
+    keys = (names.astype('string').str.upper()
+            .str.replace(r'\(.*?\)', ' ', regex=True)
+            .str.replace(r'\bCHIEFDOM\b', ' ', regex=True)
+            .str.replace(r"[^A-Z ]", '', regex=True)
+            .str.split().str.join(' '))
+    return keys.replace(CHIEFDOM_ALIASES)
+
+
+def area_keys(districts, chiefdoms):
+    """``DISTRICT|CHIEFDOM`` keys of district and chiefdom names (None where either is missing)."""
+    keys = districts.astype('string').str.upper().str.strip() + '|' + chiefdom_key(chiefdoms)
+    return keys.to_numpy(dtype=object, na_value=None)
+
+
+def locate_schools(df, chiefdoms, gps_column=GPS_COLUMN):
+    """Coordinates, containing chiefdom and mismatch flag of every row of ``df``.
+
+    ``chiefdoms`` is the chiefdom GeoDataFrame (``Chiefdom 2021.shp``).
+    ``GPS Mismatch`` is True where the point lies outside the chiefdom
+    claimed in the QR payload, False where it lies inside, and missing
+    where there is no valid point or the claimed chiefdom is not in the
+    shapefile.
+    """
+    import geopandas as gpd
+
+    coords = parse_gps(df[gps_column])
+    lat = coords[LATITUDE].to_numpy()
+    lon = coords[LONGITUDE].to_numpy()
+    valid = ~np.isnan(lat)
+
+    # Chiefdom names repeat across districts (KOYA), so the keys include the district
+    polygon_keys = area_keys(chiefdoms[DISTRICT_FIELD], chiefdoms[CHIEFDOM_FIELD])
+    claimed = area_keys(df['District'], df['Chiefdom'])
+    known = pd.Series(claimed).isin(set(polygon_keys) - {None}).to_numpy()
+
+    points = gpd.GeoSeries(gpd.points_from_xy(lon[valid], lat[valid]), crs='EPSG:4326')
+    if chiefdoms.crs is not None:
+        points = points.to_crs(chiefdoms.crs)
+    # Pairs of (point, polygon) with the point inside or on the polygon
+    point_idx, polygon_idx = chiefdoms.sindex.query(points.values, predicate='intersects')
+    rows = np.flatnonzero(valid)[point_idx]
+
+    located = np.full(len(df), None, dtype=object)
+    # First containing polygon per point; a point on a shared border has two
+    first = np.unique(rows, return_index=True)[1]
+    located[rows[first]] = chiefdoms[CHIEFDOM_FIELD].to_numpy()[polygon_idx[first]]
+    inside_claimed = np.zeros(len(df), dtype=bool)
+    inside_claimed[rows[polygon_keys[polygon_idx] == claimed[rows]]] = True
+
+    checked = valid & known
+    mismatch = pd.array(np.where(checked, ~inside_claimed, False), dtype='boolean')
+    mismatch[~checked] = pd.NA
+    logger.info("Checked %d school locations against their chiefdom, %d outside it",
+                int(checked.sum()), int((checked & ~inside_claimed).sum()))
+
+    coords[GPS_CHIEFDOM] = located
+    coords[MISMATCH_COLUMN] = mismatch
+    return coords
+
+
+def add_school_locations(df, chiefdoms=None, gps_column=GPS_COLUMN):
+    """``df`` with the location columns of :func:`locate_schools` appended.
+
+    Without ``chiefdoms`` only the coordinates are added.
+    """
+    if gps_column not in df.columns:
+        raise KeyError(f"Column '{gps_column}' not found")
+    locations = parse_gps(df[gps_column]) if chiefdoms is None else locate_schools(df, chiefdoms, gps_column)
+    return df.drop(columns=[col for col in locations.columns if col in df.columns]).join(locations)
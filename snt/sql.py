@@ -0,0 +1,120 @@
+"""Ad hoc SQL over the pipeline's Parquet outputs.
+
+:class:`SQLEngine` opens an in-process DuckDB database and defines one view
+per pipeline checkpoint found in a checkpoint directory (``combined``,
+``renamed``, ``computed``, ``outliers``, see :mod:`snt.pipeline`) and one
+over the monthly rollup files (``rollup``, see :mod:`snt.rollup`). The
+views read the Parquet files directly, so DuckDB only scans the columns a
+query uses and skips the row groups its filters rule out; nothing is
+loaded into pandas until the (usually small) result is fetched::
+
+    from snt.sql import SQLEngine
+    engine = SQLEngine('snt_pipeline')
+    engine.query("SELECT adm1, year, sum(conf) AS conf FROM computed GROUP BY ALL ORDER BY ALL")
+
+Only single read-only statements (SELECT, or a query starting with WITH)
+are run. Once the views exist, the connection may only read files inside
+the checkpoint directory (``allowed_directories`` with external access
+off) and its configuration is locked, so table functions such as
+``read_csv`` cannot reach other files. DuckDB is imported when an engine is
+created, so the rest of :mod:`snt` works without it.
+"""
+import glob
+import os
+
+from snt.cache import PIPELINE_DIR
+from snt.pipeline import STAGES, checkpoint_path
+
+# Rows returned by query() unless a limit is given
+MAX_ROWS = 100_000
+
+
+def _duckdb():
+    try:
+        import duckdb
+    except ImportError as e:
+        raise ImportError("The SQL layer needs DuckDB: pip install duckdb") from e
+    return duckdb
+
+
+def _quote(path):
+    return "'" + path.replace("'", "''") + "'"
+
+
+class SQLEngine:
+    """DuckDB connection with a view per pipeline output in ``checkpoint_dir``."""
+
+    def __init__(self, checkpoint_dir=PIPELINE_DIR, threads=None):
+        duckdb = _duckdb()
+        self.checkpoint_dir = os.path.abspath(checkpoint_dir)
+        self.connection = duckdb.connect(':memory:')
+        if threads:
+            self.connection.execute(f"SET threads = {int(threads)}")
+
+        # View name -> Parquet path or glob
+        self.sources = {}
+        for stage in STAGES:
+            path = checkpoint_path(self.checkpoint_dir, stage)
+            if os.path.exists(path):
+                self.sources[stage] = path
+        rollup = os.path.join(self.checkpoint_dir, 'rollup', '*.parquet')
+        if glob.glob(rollup):
+            self.sources['rollup'] = rollup
+        if not self.sources:
+            raise FileNotFoundError(f"No pipeline outputs found in '{checkpoint_dir}'")
+
+        for name, path in self.sources.items():
+            # union_by_name: rollup months written with other indicators still line up
+            self.connection.execute(
+                f"CREATE VIEW {name} AS SELECT * FROM read_parquet({_quote(path)}, union_by_name = true)")
+
+        # Queries may read the checkpoints and nothing else, and cannot undo that
+        self.connection.execute(f"SET allowed_directories = [{_quote(self.checkpoint_dir + os.sep)}]")
+        self.connection.execute("SET enable_external_access = false")
+        self.connection.execute("SET lock_configuration = true")
+
+    @property
+    def tables(self):
+        return list(self.sources)
+
+    def schema(self, table):
+        """Column names and types of one view."""
+        if table not in self.sources:
+            raise KeyError(f"Unknown table '{table}', expected one of {self.tables}")
+        return self.connection.sql(f"DESCRIBE {table}").df()[['column_name', 'column_type']]
+
+    def _relation(self, sql, params=None):
+        duckdb = _duckdb()
+        statements = self.connection.extract_statements(sql)
+        if len(statements) != 1:
+            raise ValueError("Expected exactly one SQL statement")
+        if statements[0].type != duckdb.StatementType.SELECT:
+            raise ValueError("Only SELECT queries can be run")
+        return self.connection.sql(sql, params=params)
+
+    def query(self, sql, params=None, limit=MAX_ROWS):
+        """Run one SELECT and return at most ``limit`` rows as a DataFrame.
+
+        ``params`` fills ``?`` or ``$name`` placeholders. ``limit=None``
+        returns every row.
+        """
+        relation = self._relation(sql, params)
+        if limit is not None:
+            relation = relation.limit(limit)
+        return relation.df()
+
+    def explain(self, sql, params=None):
+        """DuckDB's physical plan for ``sql`` (shows the pushed-down projections and filters)."""
+        return self._relation(sql, params).explain()
+
+    def close(self):
+        self.connection.close()
+
+
+def query(sql, checkpoint_dir=PIPELINE_DIR, params=None, limit=MAX_ROWS):
+    """Run one SELECT over the outputs in ``checkpoint_dir`` (see :class:`SQLEngine`)."""
+    engine = SQLEngine(checkpoint_dir)
+    try:
+        return engine.query(sql, params=params, limit=limit)
+    finally:
+        engine.close()